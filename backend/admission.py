@@ -0,0 +1,261 @@
+"""Admission control: a priority-aware concurrency limit and per-client rate limits.
+
+Each worker runs at most ``max_concurrency`` requests at a time. That is
+well below what would exhaust the Mongo connection pool, so a spike queues
+here instead of on the pool, where everything would slow down together.
+Requests beyond the limit wait in one bounded FIFO queue per priority
+class, and a freed slot always goes to the most important waiter. Each
+class may only occupy a share of the slots, so order writes keep headroom
+even when catalog browsing fills its own share. A request that finds its
+queue full, or waits longer than its class's budget, gets an immediate
+``503`` with ``Retry-After`` rather than a slow answer.
+
+Independently, every client can have a token bucket. Going past its rate
+gets a ``429`` with the time until the next token in ``Retry-After``. A client
+is its address as seen by the server. Behind a proxy or ingress every request
+comes from the proxy, so name a ``client_header`` the proxy sets instead
+(e.g. ``X-Forwarded-For``): its last entry, the address the proxy saw, is the
+client. Only do so when every request passes through that proxy, as clients
+can send the header themselves.
+
+A slot is held until the response has been sent, streamed bodies included.
+Long-lived event streams are exempt from the limit.
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from metrics import RouteResolver
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+# Not subject to the concurrency limit (streams, metrics scrapes, diagnostics)
+EXEMPT = "exempt"
+
+
+class Policy(NamedTuple):
+    max_queue: int
+    # Longest a request may wait for a slot, in seconds
+    queue_budget: float
+    # Fraction of the slots the class may occupy
+    share: float
+    retry_after: int
+
+
+# In priority order: a freed slot goes to the first class with a waiter that may take it
+DEFAULT_POLICIES: Dict[str, Policy] = {
+    CRITICAL: Policy(max_queue=256, queue_budget=2.0, share=1.0, retry_after=1),
+    NORMAL: Policy(max_queue=128, queue_budget=1.0, share=0.9, retry_after=2),
+    LOW: Policy(max_queue=64, queue_budget=0.5, share=0.7, retry_after=5),
+}
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    """Concurrency slots handed out by priority class, with bounded, time-limited queues."""
+
+    def __init__(self, max_concurrency: int, policies: Optional[Dict[str, Policy]] = None):
+        self.max_concurrency = max_concurrency
+        self.policies = policies or DEFAULT_POLICIES
+        self.priorities = list(self.policies)
+        self._limits = {cls: max(1, math.floor(max_concurrency * p.share)) for cls, p in self.policies.items()}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {cls: deque() for cls in self.policies}
+        self.in_flight = 0
+        self.admitted = dict.fromkeys(self.policies, 0)
+        self.queued = dict.fromkeys(self.policies, 0)
+        self.rejected: Dict[Tuple[str, str], int] = {}
+
+    def _may_run(self, cls: str) -> bool:
+        return self.in_flight < self._limits[cls]
+
+    def _ahead(self, cls: str) -> bool:
+        """Whether requests of this or a more important class are already waiting."""
+        for priority in self.priorities:
+            if self._queues[priority]:
+                return True
+            if priority == cls:
+                return False
+        return False
+
+    def _reject(self, cls: str, reason: str) -> Overloaded:
+        self.rejected[(cls, reason)] = self.rejected.get((cls, reason), 0) + 1
+        return Overloaded(self.policies[cls].retry_after, reason)
+
+    async def acquire(self, cls: str) -> None:
+        """Take a slot, waiting for one if needed; raises Overloaded when the request should be shed."""
+        if not self._ahead(cls) and self._may_run(cls):
+            self.in_flight += 1
+            self.admitted[cls] += 1
+            return
+        policy, queue = self.policies[cls], self._queues[cls]
+        if len(queue) >= policy.max_queue:
+            raise self._reject(cls, "queue full")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        queue.append(waiter)
+        self.queued[cls] += 1
+        timer = loop.call_later(policy.queue_budget, self._expire, cls, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The client went away while queued, or right after being granted a slot
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._discard(cls, waiter)
+            raise
+        finally:
+            timer.cancel()
+        self.admitted[cls] += 1
+
+    def _expire(self, cls: str, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            self._discard(cls, waiter)
+            waiter.set_exception(self._reject(cls, "queue timeout"))
+
+    def _discard(self, cls: str, waiter: asyncio.Future) -> None:
+        try:
+            self._queues[cls].remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        for cls in self.priorities:
+            queue = self._queues[cls]
+            while queue and self._may_run(cls):
+                waiter = queue.popleft()
+                if not waiter.done():
+                    self.in_flight += 1
+                    waiter.set_result(None)
+            if queue:
+                # Keep lower classes from overtaking a class that is waiting for a slot
+                return
+
+    def stats(self) -> dict:
+        return {
+            "maxConcurrency": self.max_concurrency,
+            "inFlight": self.in_flight,
+            "classes": {
+                cls: {
+                    "slots": self._limits[cls],
+                    "waiting": len(self._queues[cls]),
+                    "admitted": self.admitted[cls],
+                    "queued": self.queued[cls],
+                    "rejected": {reason: n for (c, reason), n in self.rejected.items() if c == cls},
+                }
+                for cls in self.priorities
+            },
+        }
+
+
+class TokenBuckets:
+    """Per-client token buckets refilled at ``rate`` tokens per second up to ``burst``.
+
+    At most ``max_clients`` buckets are kept. The least recently seen client's
+    bucket is dropped first, and that client starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 100_000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.limited = 0
+
+    def take(self, client: str, now: Optional[float] = None) -> float:
+        """Spend a token; returns 0 if there was one, else the seconds until there is."""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [self.burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        self.limited += 1
+        return (1 - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "clients": len(self._buckets), "limited": self.limited}
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying the rate limit, then the concurrency limit, per route class.
+
+    ``priorities`` maps ``"METHOD /route/{template}"`` to a class; other routes
+    are ``default``. Routes in ``unmetered`` skip the rate limit. Clients are
+    told apart by ``client_header`` if given, else by their address.
+    """
+
+    def __init__(
+        self, app, router, controller: Optional[AdmissionController], rate_limiter: Optional[TokenBuckets] = None,
+        priorities: Optional[Dict[str, str]] = None, default: str = NORMAL, unmetered: Iterable[str] = (),
+        client_header: Optional[str] = None,
+    ):
+        self.app = app
+        self.router = router
+        self.controller = controller
+        self.rate_limiter = rate_limiter
+        self.priorities = priorities or {}
+        self.default = default
+        self.unmetered = frozenset(unmetered)
+        self.client_header = client_header.lower().encode("latin-1") if client_header else None
+        self._resolver: Optional[RouteResolver] = None
+
+    def _client(self, scope) -> str:
+        if self.client_header is not None:
+            for name, value in scope["headers"]:
+                if name == self.client_header:
+                    # The proxy appends the address it saw; earlier entries come from the client
+                    return value.decode("latin-1").rsplit(",", 1)[-1].strip()
+        client = scope.get("client")
+        return client[0] if client else ""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        if self._resolver is None:
+            self._resolver = RouteResolver(self.router.routes)
+        route = f"{scope['method']} {self._resolver.resolve(scope)}"
+
+        if self.rate_limiter is not None and route not in self.unmetered:
+            wait = self.rate_limiter.take(self._client(scope))
+            if wait:
+                await self._refuse(scope, receive, send, 429, "Too many requests", math.ceil(wait))
+                return
+
+        cls = self.priorities.get(route, self.default)
+        if self.controller is None or cls == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.controller.acquire(cls)
+        except Overloaded as e:
+            await self._refuse(scope, receive, send, 503, f"Server busy ({e.reason}), retry later", e.retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    @staticmethod
+    async def _refuse(scope, receive, send, status: int, detail: str, retry_after: int) -> None:
+        response = JSONResponse({"detail": detail}, status_code=status, headers={"Retry-After": str(retry_after)})
+        await response(scope, receive, send)
@@ -0,0 +1,219 @@
+"""Table availability computed from the reservations collection.
+
+A day is divided into fixed slots (15 minutes by default). Each table's
+bookings for one restaurant and day are stored as an int bitmask, one bit per
+slot. Checking whether a table is free for an interval is a single AND,
+whatever the number of bookings that day. Answering for a whole floor plan
+costs O(tables).
+
+Day schedules are loaded from Mongo on first use and cached. New reservations
+made by this process are applied to the cached schedule incrementally.
+Reservations made by other workers are picked up once the schedule's TTL
+expires. Conflicts are not prevented here; see the booking module for that.
+
+A booking that runs past midnight occupies the first slots of the next day
+as well, and counts in that day's schedule. Bookings are shorter than a day
+(the API caps them at 12 hours), so a day's schedule is built from its own
+reservations and the previous day's.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+SLOT_MINUTES = 15
+MINUTES_PER_DAY = 24 * 60
+SLOTS_PER_DAY = MINUTES_PER_DAY // SLOT_MINUTES
+
+
+def parse_time(value: str) -> int:
+    """Minutes since midnight for an "HH:MM" string; raises ValueError."""
+    hours, _, minutes = value.partition(":")
+    total = int(hours) * 60 + int(minutes)
+    if not (0 <= int(minutes) < 60 and 0 <= total < MINUTES_PER_DAY):
+        raise ValueError(f"Invalid time: {value!r}")
+    return total
+
+
+def normalize_time(value: str) -> str:
+    """Canonical "HH:MM" form of a time, e.g. "7:05" becomes "07:05"; raises ValueError."""
+    minutes = parse_time(value)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def normalize_date(value: str) -> str:
+    """Canonical "YYYY-MM-DD" form of a date, e.g. "2026-1-7" becomes "2026-01-07"; raises ValueError."""
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+
+def slot_range(start_time: str, duration: int) -> Tuple[int, int]:
+    """Half-open ``[first, last)`` slot range covered by a booking.
+
+    Bookings running past midnight keep counting slots past the end of the
+    day; ``day_slots`` splits them by day.
+    """
+    if duration <= 0:
+        raise ValueError("Duration must be positive")
+    start = parse_time(start_time)
+    first = start // SLOT_MINUTES
+    last = -(-(start + duration) // SLOT_MINUTES)
+    return first, last
+
+
+def shift_date(date: str, days: int) -> str:
+    """The "YYYY-MM-DD" date ``days`` after ``date``; raises ValueError."""
+    return (datetime.strptime(date, "%Y-%m-%d") + timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def day_slots(date: str, start_time: str, duration: int) -> List[Tuple[str, int, int]]:
+    """``(date, first, last)`` slot ranges of a booking, one per day it covers.
+
+    Slots past midnight roll over onto the next date. Raises ValueError for an
+    invalid time or duration, or an invalid date when the booking crosses midnight.
+    """
+    first, last = slot_range(start_time, duration)
+    days = [(date, first, min(last, SLOTS_PER_DAY))]
+    while last > SLOTS_PER_DAY:
+        date, last = shift_date(date, 1), last - SLOTS_PER_DAY
+        days.append((date, 0, min(last, SLOTS_PER_DAY)))
+    return days
+
+
+def day_masks(date: str, start_time: str, duration: int) -> List[Tuple[str, int]]:
+    return [(day, slot_mask(first, last)) for day, first, last in day_slots(date, start_time, duration)]
+
+
+def slot_mask(first: int, last: int) -> int:
+    return ((1 << (last - first)) - 1) << first
+
+
+def interval_mask(start_time: str, duration: int) -> int:
+    return slot_mask(*slot_range(start_time, duration))
+
+
+class DaySchedule:
+    """Booked slots of one restaurant on one day, as a bitmask per table."""
+
+    __slots__ = ("booked", "loaded_at")
+
+    def __init__(self):
+        self.booked: Dict[str, int] = {}
+        self.loaded_at = time.monotonic()
+
+    def book(self, tables: Iterable[str], mask: int) -> None:
+        for table in tables:
+            self.booked[table] = self.booked.get(table, 0) | mask
+
+    def is_free(self, table: str, mask: int) -> bool:
+        return not self.booked.get(table, 0) & mask
+
+    def free_tables(self, tables: Iterable[str], mask: int) -> List[str]:
+        booked = self.booked
+        return [t for t in tables if not booked.get(t, 0) & mask]
+
+
+# (restaurantId, dates) -> reservation documents on those dates with date, time, duration and selectedTables
+ReservationLoader = Callable[[str, List[str]], Awaitable[List[dict]]]
+
+
+def reservation_tables(reservation: dict) -> List[str]:
+    return [t["tableNumber"] for t in reservation.get("selectedTables", [])]
+
+
+class AvailabilityEngine:
+    """Cached per-restaurant, per-day schedules answering "which tables are free?"."""
+
+    def __init__(self, loader: ReservationLoader, ttl_seconds: float = 30.0, max_days: int = 4096):
+        self.loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.max_days = max_days
+        self._schedules: "OrderedDict[Tuple[str, str], DaySchedule]" = OrderedDict()
+        self._loading: Dict[Tuple[str, str], asyncio.Future] = {}
+        # Bookings recorded while their day was loading, replayed onto the loaded schedule
+        self._pending: Dict[Tuple[str, str], List[Tuple[List[str], int]]] = {}
+
+    async def schedule(self, restaurant_id: str, date: str) -> DaySchedule:
+        """The day's schedule, loaded on a miss.
+
+        Concurrent misses for the same day share a single load. The load runs
+        as its own task, so a caller that is cancelled (a client disconnecting)
+        does not cancel it for the others.
+        """
+        key = (restaurant_id, date)
+        schedule = self._schedules.get(key)
+        if schedule is not None and time.monotonic() - schedule.loaded_at < self.ttl_seconds:
+            self._schedules.move_to_end(key)
+            return schedule
+
+        pending = self._loading.get(key)
+        if pending is None:
+            self._pending[key] = []
+            pending = self._loading[key] = asyncio.ensure_future(self._load(key))
+            pending.add_done_callback(self._loaded)
+        return await asyncio.shield(pending)
+
+    async def _load(self, key: Tuple[str, str]) -> DaySchedule:
+        restaurant_id, date = key
+        try:
+            try:
+                dates = [shift_date(date, -1), date]
+            except ValueError:
+                dates = [date]
+            schedule = DaySchedule()
+            for reservation in await self.loader(restaurant_id, dates):
+                try:
+                    masks = day_masks(reservation["date"], reservation["time"], reservation["duration"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                for day, mask in masks:
+                    if day == date:
+                        schedule.book(reservation_tables(reservation), mask)
+            for tables, mask in self._pending[key]:
+                schedule.book(tables, mask)
+        finally:
+            del self._loading[key]
+            del self._pending[key]
+
+        self._schedules[key] = schedule
+        self._schedules.move_to_end(key)
+        while len(self._schedules) > self.max_days:
+            self._schedules.popitem(last=False)
+        return schedule
+
+    @staticmethod
+    def _loaded(task: asyncio.Task) -> None:
+        # Retrieved here so that a failed load nobody waits for anymore is not logged
+        if not task.cancelled():
+            task.exception()
+
+    def record(self, restaurant_id: str, date: str, start_time: str, duration: int, tables: Iterable[str]) -> None:
+        """Apply a new reservation to the cached schedules of the days it covers, if any."""
+        tables = list(tables)
+        for day, mask in day_masks(date, start_time, duration):
+            key = (restaurant_id, day)
+            if key in self._pending:
+                self._pending[key].append((tables, mask))
+            schedule = self._schedules.get(key)
+            if schedule is not None:
+                schedule.book(tables, mask)
+
+    def invalidate(self, restaurant_id: str, date: Optional[str] = None) -> None:
+        """Drop cached schedules, e.g. after a cancellation."""
+        for key in list(self._schedules):
+            if key[0] == restaurant_id and date in (None, key[1]):
+                del self._schedules[key]
+
+    def invalidate_booking(self, restaurant_id: str, date: str, start_time: str, duration: int) -> None:
+        """Drop the cached schedules of the days a booking covers."""
+        for day, _ in day_masks(date, start_time, duration):
+            self.invalidate(restaurant_id, day)
+
+    async def free_tables(
+        self, restaurant_id: str, date: str, start_time: str, duration: int, tables: Iterable[str]
+    ) -> Set[str]:
+        free = list(tables)
+        for day, mask in day_masks(date, start_time, duration):
+            schedule = await self.schedule(restaurant_id, day)
+            free = schedule.free_tables(free, mask)
+        return set(free)
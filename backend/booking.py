@@ -0,0 +1,88 @@
+"""Atomic table booking through per-(table, slot) claim documents.
+
+A reservation claims every availability slot of every table it books. Each
+claim's ``_id`` is ``restaurantId:date:table:slot``, with the date in its
+canonical form (two spellings of a day must not make two claims) and the slots of a
+booking that runs past midnight claimed under the next date, so the collection's
+unique ``_id`` index rejects a second claim on the same table and slot. No
+lock is taken on the restaurant. Bookings for different tables or times never
+contend, and a conflicting booking fails on its first clashing claim.
+
+Claims are inserted in one ordered ``insert_many`` in a canonical (table, slot)
+order. Competing requests therefore meet on the same first key, and at least
+one of them always succeeds.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from pymongo.errors import BulkWriteError
+
+from availability import day_slots, normalize_date
+
+DUPLICATE_KEY = 11000
+# Claims are kept for a while after their day, then removed by the TTL index
+CLAIM_RETENTION = timedelta(days=2)
+
+
+class TableConflict(Exception):
+    """Some of the requested tables are already booked for the interval."""
+
+    def __init__(self, tables: List[str]):
+        super().__init__(f"Tables already booked: {', '.join(tables)}")
+        self.tables = tables
+
+
+def claim_id(restaurant_id: str, date: str, table: str, slot: int) -> str:
+    return f"{restaurant_id}:{date}:{table}:{slot}"
+
+
+def claim_documents(
+    reservation_id, restaurant_id: str, date: str, tables: Iterable[str], start_time: str, duration: int
+) -> List[dict]:
+    """Claims of a booking; raises ValueError for an invalid date, time or duration."""
+    days = day_slots(normalize_date(date), start_time, duration)
+    return [
+        {
+            "_id": claim_id(restaurant_id, day, table, slot),
+            "reservationId": reservation_id,
+            "restaurantId": restaurant_id,
+            "date": day,
+            "tableNumber": table,
+            "slot": slot,
+            "expiresAt": claim_expiry(day),
+        }
+        for table in sorted(set(tables))
+        for day, first, last in days
+        for slot in range(first, last)
+    ]
+
+
+def claim_expiry(date: str) -> datetime:
+    """When the claims of ``date`` may be removed; raises ValueError for an invalid date."""
+    return datetime.strptime(date, "%Y-%m-%d") + CLAIM_RETENTION
+
+
+async def ensure_claim_indexes(collection) -> None:
+    await collection.create_index("reservationId")
+    await collection.create_index("expiresAt", expireAfterSeconds=0)
+
+
+async def claim_tables(
+    collection, reservation_id, restaurant_id: str, date: str, tables: Iterable[str], start_time: str, duration: int
+) -> None:
+    """Claim the tables for the interval, or raise TableConflict having claimed nothing."""
+    docs = claim_documents(reservation_id, restaurant_id, date, tables, start_time, duration)
+    if not docs:
+        return
+    try:
+        await collection.insert_many(docs, ordered=True)
+    except BulkWriteError as exc:
+        await release_claims(collection, reservation_id)
+        errors = exc.details.get("writeErrors", [])
+        if not errors or any(e.get("code") != DUPLICATE_KEY for e in errors):
+            raise
+        raise TableConflict([docs[errors[0]["index"]]["tableNumber"]])
+
+
+async def release_claims(collection, reservation_id) -> None:
+    await collection.delete_many({"reservationId": reservation_id})
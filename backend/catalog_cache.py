@@ -0,0 +1,147 @@
+"""In-process cache for read-mostly catalog data (restaurants, menus, floor plans).
+
+Entries are stored under a catalog version. Any catalog write calls
+``bump_version``, which drops every entry at once. Entries also expire
+after a TTL. That bounds staleness in other workers when the write happened
+in a different process and no change stream is available to tell them.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from compression import MINIMUM_SIZE, compress
+from fast_json import dumps as serialize
+
+
+class CachedResponse:
+    """Pre-serialized JSON body together with its strong ETag.
+
+    Compressed variants are produced on first request for each encoding and kept
+    with the body. They live exactly as long as the cache entry does, so they
+    are dropped with it when the catalog version changes.
+    """
+
+    __slots__ = ("body", "etag", "_encoded")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self._encoded: Dict[str, bytes] = {}
+
+    def __len__(self) -> int:
+        return len(self.body)
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        """The body in ``encoding`` (None for identity), compressed at most once."""
+        if encoding is None or len(self.body) < MINIMUM_SIZE:
+            return self.body
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress(self.body, encoding)
+        return body
+
+    def encoded_etag(self, encoding: Optional[str]) -> str:
+        """Distinct strong ETag per representation (RFC 9110 8.8.3)."""
+        if encoding is None or len(self.body) < MINIMUM_SIZE:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+class CatalogCache:
+    """Size-bounded LRU/TTL cache with single-flight loading and versioned invalidation."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def bump_version(self) -> int:
+        """Invalidate everything cached so far; call after any catalog write."""
+        self.version += 1
+        self._entries.clear()
+        return self.version
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Cached value for ``key``, calling ``loader`` once on a miss.
+
+        Concurrent misses for the same key share a single load. The load runs
+        as its own task, so a caller that is cancelled (a client disconnecting)
+        does not cancel it for the others. A value loaded while the version was
+        bumped is returned to its callers but not cached.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        pending = self._loading.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load(key, loader, self.version))
+            self._loading[key] = pending
+            pending.add_done_callback(lambda task: self._loaded(key, task))
+        return await asyncio.shield(pending)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], version: int) -> Any:
+        value = await loader()
+        if version == self.version:
+            self.set(key, value)
+        return value
+
+    def _loaded(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._loading.get(key) is task:
+            del self._loading[key]
+        # Retrieved here so that a failed load nobody waits for anymore is not logged
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "version": self.version,
+            "entries": len(self._entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
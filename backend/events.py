@@ -0,0 +1,180 @@
+"""In-process pub/sub hub pushing status changes to Server-Sent Events subscribers.
+
+Publishers call ``publish(topic, event, data)`` with topics such as
+``order:<id>``. An event is encoded to SSE bytes once, then handed to every
+subscriber of its topic with a non-blocking ``put_nowait``. Fan-out costs one
+queue append per subscriber. Idle subscribers hold only a small queue and a
+suspended generator: no task or timer of their own. A single hub-wide ticker
+wakes them to send heartbeats, which keep proxies from closing idle
+connections.
+
+Event ids are ``<epoch>-<sequence>``. The epoch is fixed for the life of the
+hub, and recent events are kept in a ring buffer. A client reconnecting with
+``Last-Event-ID`` is replayed what it missed on its topics. When that is no
+longer possible (an id from another worker or a restart, or one older than
+the buffer), the client receives a ``reset`` event and should refetch its
+state. A subscriber that stops reading and fills its queue is disconnected
+the same way, instead of buffering without bound.
+
+The hub only sees events published by its own process. When the API runs
+several workers, a client must reconnect to the same worker or rely on the
+``reset`` refetch.
+"""
+import asyncio
+import itertools
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fast_json import dumps
+
+HEARTBEAT_SECONDS = 15.0
+# Subscribers sent a heartbeat before other tasks get the loop back
+HEARTBEAT_SLICE = 500
+HISTORY_SIZE = 10000
+QUEUE_SIZE = 64
+MAX_TOPICS = 100
+# Clients wait this long before reconnecting after the stream ends
+RETRY_MS = 3000
+
+HEARTBEAT = b": ping\n\n"
+_CLOSE = object()
+
+
+class Subscription:
+    __slots__ = ("topics", "queue")
+
+    def __init__(self, topics: Set[str], queue_size: int):
+        self.topics = topics
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+
+
+def _frame(event_id: Optional[str], event: str, data: dict) -> bytes:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + dumps(data) + b"\n\n"
+
+
+class EventHub:
+    """Topic-based fan-out to SSE subscribers, with replay of recent events."""
+
+    def __init__(self, history_size: int = HISTORY_SIZE, queue_size: int = QUEUE_SIZE):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.queue_size = queue_size
+        self._sequence = itertools.count(1)
+        self._last_sequence = 0
+        self._history: Deque[Tuple[int, str, bytes]] = deque(maxlen=history_size)
+        self._topics: Dict[str, Set[Subscription]] = {}
+        self._subscriptions: Set[Subscription] = set()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.last_heartbeat_ms = 0.0
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def publish(self, topic: str, event: str, data: dict) -> str:
+        """Send an event to the topic's subscribers; returns its id."""
+        sequence = next(self._sequence)
+        self._last_sequence = sequence
+        event_id = f"{self.epoch}-{sequence}"
+        frame = _frame(event_id, event, data)
+        self._history.append((sequence, topic, frame))
+        self.published += 1
+        for subscription in list(self._topics.get(topic, ())):
+            self._offer(subscription, frame)
+        return event_id
+
+    def _offer(self, subscription: Subscription, frame) -> None:
+        try:
+            subscription.queue.put_nowait(frame)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            # A reader this far behind resumes from history or resets
+            self.dropped += 1
+            self._unsubscribe(subscription)
+            subscription.queue.get_nowait()
+            subscription.queue.put_nowait(_CLOSE)
+
+    def _subscribe(self, topics: Set[str]) -> Subscription:
+        subscription = Subscription(topics, self.queue_size)
+        self._subscriptions.add(subscription)
+        for topic in topics:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._topics[topic]
+
+    def replay(self, topics: Set[str], last_event_id: Optional[str]) -> Optional[List[bytes]]:
+        """Frames on ``topics`` after ``last_event_id``; None if they can no longer be replayed."""
+        if not last_event_id:
+            return []
+        epoch, _, sequence = last_event_id.partition("-")
+        try:
+            after = int(sequence)
+        except ValueError:
+            return None
+        if epoch != self.epoch or after > self._last_sequence:
+            return None
+        oldest = self._history[0][0] if self._history else self._last_sequence + 1
+        if after < oldest - 1:
+            return None
+        return [frame for sequence, topic, frame in self._history if sequence > after and topic in topics]
+
+    async def stream(self, topics: Iterable[str], last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """SSE frames for a subscriber until it disconnects (or falls too far behind)."""
+        topics = set(topics)
+        # Subscribe and compute the replay together: later events arrive through the queue only
+        subscription = self._subscribe(topics)
+        missed = self.replay(topics, last_event_id)
+        try:
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            if missed is None:
+                yield _frame(None, "reset", {"reason": "history unavailable"})
+            else:
+                for frame in missed:
+                    yield frame
+            while True:
+                frame = await subscription.queue.get()
+                if frame is _CLOSE:
+                    yield _frame(None, "reset", {"reason": "subscriber too slow"})
+                    return
+                yield frame
+        finally:
+            self._unsubscribe(subscription)
+
+    async def heartbeat(self) -> None:
+        """Queue a heartbeat for every subscriber, yielding to the loop between slices."""
+        subscriptions = list(self._subscriptions)
+        for start in range(0, len(subscriptions), HEARTBEAT_SLICE):
+            for subscription in subscriptions[start:start + HEARTBEAT_SLICE]:
+                if subscription in self._subscriptions:
+                    self._offer(subscription, HEARTBEAT)
+            await asyncio.sleep(0)
+
+    async def run_heartbeats(self, interval: float = HEARTBEAT_SECONDS) -> None:
+        """Send every subscriber a heartbeat each ``interval`` seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            started = time.perf_counter()
+            await self.heartbeat()
+            self.last_heartbeat_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscriptions),
+            "topics": len(self._topics),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "history": len(self._history),
+            "lastHeartbeatMs": round(self.last_heartbeat_ms, 3),
+        }
@@ -0,0 +1,110 @@
+"""Streaming export of order and reservation history as NDJSON or CSV.
+
+Documents are read from a Motor cursor in server-side batches and encoded one
+batch at a time into a single chunk that is written to the response. Only one
+batch is ever held in memory, whatever the size of the export. The export runs
+oldest first on the ``(createdAt, _id)`` keyset index, so ``since``/``until``
+are index range bounds and the order is stable. Bounds with a timezone are
+converted to the naive UTC that ``createdAt`` is stored in.
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, List, Optional, Sequence
+
+from fast_json import api_document, dumps
+
+EXPORT_SORT = [("createdAt", 1), ("_id", 1)]
+DEFAULT_EXPORT_BATCH = 1000
+MAX_EXPORT_BATCH = 10000
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+ORDER_COLUMNS = (
+    "id", "createdAt", "restaurantId", "restaurantName", "orderType", "status",
+    "totalPrice", "deliveryAddress", "pickupTime", "items",
+)
+RESERVATION_COLUMNS = (
+    "id", "createdAt", "restaurantId", "restaurantName", "date", "time", "duration", "people",
+    "status", "totalCapacity", "totalPrice", "selectedTables", "preOrderedFood",
+)
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """``value`` as a naive UTC datetime; naive values are taken to be UTC already."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def export_filter(since: Optional[datetime] = None, until: Optional[datetime] = None) -> dict:
+    """Query for documents created in ``[since, until)``."""
+    since, until = naive_utc(since), naive_utc(until)
+    created = {}
+    if since is not None:
+        created["$gte"] = since
+    if until is not None:
+        created["$lt"] = until
+    return {"createdAt": created} if created else {}
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        # Nested items stay machine-readable inside a single cell
+        return dumps(value).decode()
+    return value
+
+
+async def _batches(docs: AsyncIterable[dict], batch_size: int) -> AsyncIterator[List[dict]]:
+    batch = []
+    async for doc in docs:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def ndjson_chunks(docs: AsyncIterable[dict], batch_size: int = DEFAULT_EXPORT_BATCH) -> AsyncIterator[bytes]:
+    """One JSON document per line, a chunk per batch."""
+    async for batch in _batches(docs, batch_size):
+        yield b"".join(dumps(api_document(doc)) + b"\n" for doc in batch)
+
+
+async def csv_chunks(
+    docs: AsyncIterable[dict], columns: Sequence[str], batch_size: int = DEFAULT_EXPORT_BATCH
+) -> AsyncIterator[bytes]:
+    """A header row, then one row per document, a chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in _batches(docs, batch_size):
+        for doc in batch:
+            row = api_document(doc)
+            writer.writerow([_cell(row.get(column)) for column in columns])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():  # header only: nothing matched
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def export_chunks(
+    collection, query: dict, projection: dict, fmt: str, columns: Sequence[str], batch_size: int
+) -> AsyncIterator[bytes]:
+    """Encoded chunks of every matching document; the cursor is closed even if the client goes away."""
+    cursor = collection.find(query, projection).sort(EXPORT_SORT).batch_size(batch_size)
+    try:
+        if fmt == "csv":
+            chunks = csv_chunks(cursor, columns, batch_size)
+        else:
+            chunks = ndjson_chunks(cursor, batch_size)
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await cursor.close()
@@ -0,0 +1,105 @@
+"""Fast path from stored BSON documents straight to JSON bytes.
+
+Everything in the database was written from validated models, so read
+endpoints skip building pydantic models from documents and skip a second
+validation and serialization pass through ``response_model``. Documents are
+projected to the model's fields, the ``_id`` is renamed to a string ``id``,
+fields missing from older documents get the model's defaults (as
+``response_model`` validation gave them), and orjson encodes the result. It
+handles ``datetime`` natively and ``ObjectId`` through ``default``.
+``response_model`` still documents the schema in OpenAPI.
+"""
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+import orjson
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import Response
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default)
+
+
+def model_projection(model: Type[BaseModel], *extra: str) -> dict:
+    """Mongo projection loading exactly the fields of an API model."""
+    projection = {field: 1 for field in model.model_fields if field != "id"}
+    projection.update({field: 1 for field in extra})
+    return projection
+
+
+def _nested_model(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """The model a field holds, directly or as a list (Optional unwrapped), and whether it is a list."""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        annotation = args[0] if len(args) == 1 else None
+    many = get_origin(annotation) is list
+    if many:
+        annotation = get_args(annotation)[0] if get_args(annotation) else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, many
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def _model_fields(model: Type[BaseModel]) -> Tuple[tuple, tuple]:
+    """(name, field) of the fields with a default, and (name, model, is list) of nested models."""
+    defaults, nested = [], []
+    for name, field in model.model_fields.items():
+        if name == "id":
+            continue
+        if not field.is_required():
+            defaults.append((name, field))
+        inner, many = _nested_model(field.annotation)
+        if inner is not None:
+            nested.append((name, inner, many))
+    return tuple(defaults), tuple(nested)
+
+
+def fill_defaults(doc: dict, model: Type[BaseModel]) -> dict:
+    """Set the model's defaults for fields missing from ``doc``, nested models included, in place."""
+    defaults, nested = _model_fields(model)
+    for name, field in defaults:
+        if name not in doc:
+            doc[name] = field.get_default(call_default_factory=True)
+    for name, inner, many in nested:
+        value = doc.get(name)
+        if many and isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict):
+                    fill_defaults(item, inner)
+        elif isinstance(value, dict):
+            fill_defaults(value, inner)
+    return doc
+
+
+def api_document(doc: dict, model: Optional[Type[BaseModel]] = None) -> dict:
+    """Stored document in API shape: ``_id`` becomes a string ``id``, listed first.
+
+    With ``model``, fields missing from the document get the model's defaults.
+    """
+    out = {"id": str(doc["_id"])}
+    out.update((k, v) for k, v in doc.items() if k != "_id")
+    if model is not None:
+        fill_defaults(out, model)
+    return out
+
+
+def api_documents(docs: Iterable[dict], model: Optional[Type[BaseModel]] = None) -> List[dict]:
+    return [api_document(doc, model) for doc in docs]
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,142 @@
+"""Restaurant floor plans: stored per restaurant, served from an in-process map.
+
+Each document in the ``floor_plans`` collection is keyed by ``restaurantId`` and
+holds one or more rooms of tables plus a ``version``. Every update increments
+the version. All plans are preloaded into ``FloorPlanStore`` at startup, with
+their response JSON already serialized, so serving a plan is a dict lookup. A
+periodic refresh picks up plans changed by other workers.
+
+A restaurant without a stored plan has no tables: nothing is made up for it.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from catalog_cache import CachedResponse, serialize
+
+# Seed layouts for the demo restaurants, keyed by restaurant slug
+FLOOR_PLAN_TEMPLATES = {
+    "bella-italia": [
+        {"id": "main", "name": "Main Room", "tables": [
+            {"tableNumber": "T1", "capacity": 2, "x": 15, "y": 15, "available": True},
+            {"tableNumber": "T2", "capacity": 2, "x": 15, "y": 50, "available": True},
+            {"tableNumber": "T3", "capacity": 4, "x": 55, "y": 15, "available": True},
+            {"tableNumber": "T4", "capacity": 4, "x": 55, "y": 50, "available": True},
+            {"tableNumber": "T5", "capacity": 6, "x": 15, "y": 85, "available": True},
+            {"tableNumber": "T6", "capacity": 6, "x": 55, "y": 85, "available": False},  # One unavailable
+            {"tableNumber": "T7", "capacity": 8, "x": 35, "y": 120, "available": True},
+        ]},
+    ],
+    "sushi-master": [
+        {"id": "main", "name": "Main Room", "tables": [
+            {"tableNumber": "S1", "capacity": 2, "x": 20, "y": 20, "available": True},
+            {"tableNumber": "S2", "capacity": 2, "x": 20, "y": 55, "available": True},
+            {"tableNumber": "S3", "capacity": 4, "x": 60, "y": 20, "available": True},
+            {"tableNumber": "S4", "capacity": 4, "x": 60, "y": 55, "available": True},
+            {"tableNumber": "S5", "capacity": 6, "x": 20, "y": 90, "available": True},
+            {"tableNumber": "S6", "capacity": 8, "x": 60, "y": 90, "available": True},
+            {"tableNumber": "Bar", "capacity": 10, "x": 40, "y": 125, "available": True},
+        ]},
+    ],
+    "burger-junction": [
+        {"id": "main", "name": "Main Room", "tables": [
+            {"tableNumber": "B1", "capacity": 2, "x": 25, "y": 25, "available": True},
+            {"tableNumber": "B2", "capacity": 2, "x": 65, "y": 25, "available": True},
+            {"tableNumber": "B3", "capacity": 4, "x": 25, "y": 60, "available": True},
+            {"tableNumber": "B4", "capacity": 4, "x": 65, "y": 60, "available": True},
+            {"tableNumber": "B5", "capacity": 6, "x": 25, "y": 95, "available": True},
+            {"tableNumber": "B6", "capacity": 6, "x": 65, "y": 95, "available": True},
+            {"tableNumber": "B7", "capacity": 8, "x": 45, "y": 130, "available": False},  # One unavailable
+        ]},
+    ],
+    "green-bowl": [
+        {"id": "main", "name": "Main Room", "tables": [
+            {"tableNumber": "G1", "capacity": 2, "x": 18, "y": 18, "available": True},
+            {"tableNumber": "G2", "capacity": 2, "x": 18, "y": 48, "available": True},
+            {"tableNumber": "G3", "capacity": 4, "x": 58, "y": 18, "available": True},
+            {"tableNumber": "G4", "capacity": 4, "x": 58, "y": 48, "available": True},
+            {"tableNumber": "G5", "capacity": 6, "x": 18, "y": 78, "available": True},
+            {"tableNumber": "G6", "capacity": 6, "x": 58, "y": 78, "available": True},
+            {"tableNumber": "G8", "capacity": 2, "x": 38, "y": 138, "available": True},
+        ]},
+        {"id": "patio", "name": "Patio", "tables": [
+            {"tableNumber": "Patio", "capacity": 8, "x": 38, "y": 108, "available": True},
+        ]},
+    ],
+}
+def validate_rooms(rooms: List[dict]) -> None:
+    """Table numbers identify tables in bookings, so they must be unique across rooms."""
+    seen = set()
+    for room in rooms:
+        for table in room["tables"]:
+            if table["tableNumber"] in seen:
+                raise ValueError(f"Duplicate table number: {table['tableNumber']}")
+            seen.add(table["tableNumber"])
+
+
+class FloorPlan:
+    """A decoded floor plan with its tables flattened and its response precomputed."""
+
+    __slots__ = ("restaurant_id", "version", "rooms", "tables", "response")
+
+    def __init__(self, restaurant_id: str, version: int, rooms: List[dict]):
+        self.restaurant_id = restaurant_id
+        self.version = version
+        self.rooms = [{"id": room["id"], "name": room["name"]} for room in rooms]
+        self.tables = [{**table, "room": room["id"]} for room in rooms for table in room["tables"]]
+        self.response = CachedResponse(serialize({
+            "restaurantId": restaurant_id,
+            "version": version,
+            "rooms": self.rooms,
+            "tables": self.tables,
+        }))
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "FloorPlan":
+        return cls(doc["_id"], doc.get("version", 1), doc.get("rooms", []))
+
+
+class FloorPlanStore:
+    """Preloaded ``restaurantId -> FloorPlan`` map."""
+
+    def __init__(self):
+        self._plans: Dict[str, FloorPlan] = {}
+        self._synced_until: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, restaurant_id: str) -> Optional[FloorPlan]:
+        return self._plans.get(restaurant_id)
+
+    async def fetch(self, collection, restaurant_id: str) -> Optional[FloorPlan]:
+        """The restaurant's plan, read from ``collection`` if stored since the last refresh; None if it has none."""
+        plan = self._plans.get(restaurant_id)
+        if plan is None:
+            doc = await collection.find_one({"_id": restaurant_id})
+            if doc is not None:
+                plan = self.put(doc)
+        return plan
+
+    def put(self, doc: dict) -> FloorPlan:
+        """Install a stored plan, unless a newer version is already loaded."""
+        current = self._plans.get(doc["_id"])
+        if current is not None and current.version >= doc.get("version", 1):
+            return current
+        plan = FloorPlan.from_document(doc)
+        self._plans[plan.restaurant_id] = plan
+        updated_at = doc.get("updatedAt")
+        if updated_at and (self._synced_until is None or updated_at > self._synced_until):
+            self._synced_until = updated_at
+        return plan
+
+    async def refresh(self, collection) -> int:
+        """Load plans stored or updated since the last refresh (all of them the first time)."""
+        query = {"updatedAt": {"$gte": self._synced_until}} if self._synced_until else {}
+        count = 0
+        async for doc in collection.find(query):
+            self.put(doc)
+            count += 1
+        if count:
+            logging.info(f"Loaded {count} floor plans ({len(self._plans)} total)")
+        return count
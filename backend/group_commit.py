@@ -0,0 +1,102 @@
+"""Group commit: coalesce concurrent single-document inserts into bulk writes.
+
+Each caller awaits ``insert(doc)`` as if it were ``insert_one``. Documents that
+arrive within ``max_linger_ms`` of the first pending one are written together.
+The write is one unordered ``insert_many``, sent early once ``max_batch``
+documents are pending. Each caller still gets its own inserted id, or its own
+exception when its document fails. A failure of the whole batch is raised to
+every caller.
+"""
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+
+DUPLICATE_KEY = 11000
+
+
+class GroupCommitWriter:
+    """Batches ``insert`` calls on one collection; see the module docstring."""
+
+    def __init__(self, collection, max_batch: int = 100, max_linger_ms: float = 2.0):
+        self.collection = collection
+        self.max_batch = max_batch
+        self.max_linger = max_linger_ms / 1000
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: set = set()
+        # Instrumentation
+        self.batches = 0
+        self.documents = 0
+        self.failed_documents = 0
+        self.max_batch_seen = 0
+        self.write_seconds = 0.0
+
+    async def insert(self, doc: dict) -> ObjectId:
+        """Insert ``doc`` (assigning an ``_id`` if missing) and return its id."""
+        doc.setdefault("_id", ObjectId())
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((doc, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_linger, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._write(batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def flush(self) -> None:
+        """Write everything pending now and wait for in-flight batches (e.g. on shutdown)."""
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _write(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        started = time.perf_counter()
+        errors = {}
+        try:
+            await self.collection.insert_many([doc for doc, _ in batch], ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                error_type = DuplicateKeyError if error.get("code") == DUPLICATE_KEY else WriteError
+                errors[error["index"]] = error_type(error.get("errmsg"), error.get("code"), error)
+        except Exception as exc:
+            errors = {i: exc for i in range(len(batch))}
+        finally:
+            self.write_seconds += time.perf_counter() - started
+            self.batches += 1
+            self.documents += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+        self.failed_documents += len(errors)
+        for i, (doc, future) in enumerate(batch):
+            if future.done():  # caller went away (request cancelled)
+                continue
+            if i in errors:
+                future.set_exception(errors[i])
+            else:
+                future.set_result(doc["_id"])
+
+    def stats(self) -> dict:
+        return {
+            "maxBatch": self.max_batch,
+            "maxLingerMs": self.max_linger * 1000,
+            "batches": self.batches,
+            "documents": self.documents,
+            "failedDocuments": self.failed_documents,
+            "pending": len(self._pending),
+            "avgBatchSize": round(self.documents / self.batches, 2) if self.batches else 0.0,
+            "maxBatchSize": self.max_batch_seen,
+            "avgWriteMs": round(self.write_seconds * 1000 / self.batches, 3) if self.batches else 0.0,
+        }
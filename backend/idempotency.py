@@ -0,0 +1,155 @@
+"""Idempotency keys: run a create request once per key and replay its response to retries.
+
+A key is recorded in the ``idempotency_keys`` collection under
+``<scope>:<key>``, so the unique ``_id`` index lets exactly one request claim
+it, whichever worker receives it. The claim is ``pending`` while the request
+runs. It then holds the response (status and JSON body) until the TTL index
+removes it. Retries are answered from that record without running the
+request again.
+
+Within a worker, a recently completed key is answered from an in-process
+cache, without a database round trip. Identical requests arriving together
+share one execution: the first starts it and the others await the same
+result. The execution runs as its own task, so a client disconnecting
+mid-request does not leave its key half-done.
+
+A key reused with a different request body is refused. A key still pending
+on another worker is waited for, up to ``wait_seconds``. If that worker
+died, its lease lapses and a retry takes the key over. In that case the
+request may run a second time.
+"""
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, NamedTuple, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = timedelta(hours=24)
+LEASE = timedelta(seconds=30)
+WAIT_SECONDS = 5.0
+POLL_INTERVAL_SECONDS = 0.05
+
+
+class StoredResponse(NamedTuple):
+    status_code: int
+    body: bytes
+
+
+class KeyReused(Exception):
+    """The key was first used with a different request."""
+
+
+class KeyInProgress(Exception):
+    """The key's first request is still running elsewhere."""
+
+
+async def ensure_idempotency_indexes(collection) -> None:
+    await collection.create_index("expiresAt", expireAfterSeconds=0)
+
+
+class IdempotencyStore:
+    def __init__(self, collection, ttl: timedelta = DEFAULT_TTL, cache_size: int = 10000,
+                 wait_seconds: float = WAIT_SECONDS):
+        self.collection = collection
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.wait_seconds = wait_seconds
+        # id -> (fingerprint, response, expires at)
+        self._cache: "OrderedDict[str, Tuple[str, StoredResponse, datetime]]" = OrderedDict()
+        # id -> (fingerprint, execution)
+        self._running: Dict[str, Tuple[str, asyncio.Task]] = {}
+
+    async def execute(
+        self, scope: str, key: str, fingerprint: str, handler: Callable[[], Awaitable[StoredResponse]],
+    ) -> Tuple[StoredResponse, bool]:
+        """The response for ``key``, running ``handler`` only if no request has used it yet.
+
+        Returns the response and whether it was replayed. Raises KeyReused or KeyInProgress.
+        """
+        doc_id = f"{scope}:{key}"
+        cached = self._cache.get(doc_id)
+        if cached is not None:
+            if cached[2] > datetime.utcnow():
+                self._cache.move_to_end(doc_id)
+                return self._check(cached[0], fingerprint, cached[1]), True
+            del self._cache[doc_id]
+
+        running = self._running.get(doc_id)
+        if running is not None:
+            response, _ = await asyncio.shield(running[1])
+            return self._check(running[0], fingerprint, response), True
+
+        task = asyncio.ensure_future(self._claim_and_run(doc_id, fingerprint, handler))
+        self._running[doc_id] = (fingerprint, task)
+        task.add_done_callback(lambda _: self._finished(doc_id, task))
+        return await asyncio.shield(task)
+
+    def _finished(self, doc_id: str, task: asyncio.Task) -> None:
+        self._running.pop(doc_id, None)
+        # Retrieved here so that an execution nobody waits for anymore does not log a stray error
+        if not task.cancelled():
+            task.exception()
+
+    @staticmethod
+    def _check(expected: str, fingerprint: str, response: StoredResponse) -> StoredResponse:
+        if expected != fingerprint:
+            raise KeyReused()
+        return response
+
+    def _remember(self, doc_id: str, fingerprint: str, response: StoredResponse, expires_at: datetime) -> None:
+        self._cache[doc_id] = (fingerprint, response, expires_at)
+        self._cache.move_to_end(doc_id)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _claim_and_run(self, doc_id: str, fingerprint: str, handler) -> Tuple[StoredResponse, bool]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while True:
+            now = datetime.utcnow()
+            try:
+                await self.collection.insert_one({
+                    "_id": doc_id, "fingerprint": fingerprint, "status": "pending",
+                    "lockedUntil": now + LEASE, "expiresAt": now + self.ttl,
+                })
+                break
+            except DuplicateKeyError:
+                pass
+            doc = await self.collection.find_one({"_id": doc_id})
+            if doc is None:
+                continue  # failed and released (or expired) since our insert: claim it again
+            if doc["fingerprint"] != fingerprint:
+                raise KeyReused()
+            if doc["status"] == "done":
+                response = StoredResponse(doc["statusCode"], bytes(doc["body"]))
+                self._remember(doc_id, fingerprint, response, doc["expiresAt"])
+                return response, True
+            if doc["lockedUntil"] < now:
+                # The worker running it is gone: take over its lease
+                taken = await self.collection.find_one_and_update(
+                    {"_id": doc_id, "status": "pending", "lockedUntil": doc["lockedUntil"]},
+                    {"$set": {"lockedUntil": now + LEASE}},
+                )
+                if taken is not None:
+                    break
+                continue
+            if loop.time() >= deadline:
+                raise KeyInProgress()
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+        try:
+            response = await handler()
+        except BaseException:
+            # Nothing to replay: let a retry run it again
+            await self.collection.delete_one({"_id": doc_id, "status": "pending"})
+            raise
+        expires_at = datetime.utcnow() + self.ttl
+        await self.collection.update_one(
+            {"_id": doc_id},
+            {"$set": {"status": "done", "statusCode": response.status_code, "body": response.body, "expiresAt": expires_at},
+             "$unset": {"lockedUntil": ""}},
+        )
+        self._remember(doc_id, fingerprint, response, expires_at)
+        return response, False
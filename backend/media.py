@@ -0,0 +1,308 @@
+"""Content-addressed media store: images kept out of catalog documents.
+
+``MenuItem.image``, ``Restaurant.logo`` and ``heroImage`` may hold an image
+inline, as a ``data:`` URI or bare base64. Inlined, every catalog read
+carries the image bytes, and a restaurant with a large menu creeps toward
+Mongo's 16 MB document limit. ``MediaStore.externalize`` moves such images
+into a blob store under the SHA-256 of their bytes and leaves a short
+``/api/media/<hash>`` reference in the document. URLs and references are
+left alone, and an image stored twice is kept once.
+
+Blobs live in GridFS (``GridFSBlobStore``, shared by every worker) or in a
+directory (``DiskBlobStore``, for a single host or a shared volume). Every
+blob has a record in the ``media`` collection with its content type and
+size. With Pillow installed, an original's record also lists thumbnails
+rendered at ingest, one per width in ``THUMBNAIL_WIDTHS`` narrower than the
+image. Thumbnails are blobs in their own right, addressed by their own hash.
+
+The bytes under a hash never change, so records are cached in-process
+without expiry and clients may cache responses for a year.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from gridfs.errors import FileExists
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: without it images are served at their original size only
+    Image = None
+
+REFERENCE_PREFIX = "/api/media/"
+THUMBNAIL_WIDTHS = (160, 480)
+CHUNK_SIZE = 256 * 1024
+
+DIGEST = re.compile(r"[0-9a-f]{64}")
+DATA_URI = re.compile(r"data:(?P<type>[\w.+-]+/[\w.+-]+)?(?:;[\w.+-]+=[\w.+-]+)*;base64,(?P<data>.*)", re.S)
+# Anything shorter is not worth moving out of the document (nor likely to be an image)
+MIN_INLINE_LENGTH = 64
+
+# Restaurant fields that may hold an image, and a filter for documents where one may be inline
+IMAGE_FIELDS = ("logo", "heroImage", "menu.items.image")
+INLINE_PATTERN = rf"^(data:|(?!{REFERENCE_PREFIX})[A-Za-z0-9+/]{{{MIN_INLINE_LENGTH}}})"
+INLINE_FILTER = {"$or": [{field: {"$regex": INLINE_PATTERN}} for field in IMAGE_FIELDS]}
+
+# Pillow format -> (content type, save options) for thumbnails; others are written as PNG
+THUMBNAIL_FORMATS = {
+    "JPEG": ("image/jpeg", {"quality": 85, "optimize": True, "progressive": True}),
+    "WEBP": ("image/webp", {"quality": 80}),
+    "PNG": ("image/png", {"optimize": True}),
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class MediaRecord(NamedTuple):
+    digest: str
+    content_type: str
+    length: int
+    # width -> hash of the thumbnail
+    thumbnails: Dict[int, str]
+
+
+def reference(digest: str) -> str:
+    return f"{REFERENCE_PREFIX}{digest}"
+
+
+def sniff(data: bytes) -> Optional[str]:
+    """Image content type from the first bytes, or None."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def decode_inline(value: str) -> Optional[Tuple[bytes, str]]:
+    """Bytes and content type of an inline image, or None if ``value`` is not one."""
+    if len(value) < MIN_INLINE_LENGTH or value.startswith(REFERENCE_PREFIX):
+        return None
+    match = DATA_URI.match(value)
+    try:
+        data = base64.b64decode("".join((match["data"] if match else value).split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    content_type = (match and match["type"]) or sniff(data)
+    if not content_type or not content_type.startswith("image/"):
+        return None
+    return data, content_type
+
+
+def render_thumbnails(data: bytes, widths: Iterable[int]) -> List[Tuple[int, bytes, str]]:
+    """(width, bytes, content type) of each thumbnail narrower than the image; none without Pillow."""
+    if Image is None:
+        return []
+    try:
+        with Image.open(io.BytesIO(data)) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+            if image.mode in ("1", "P"):
+                image = image.convert("RGBA")
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # Not something Pillow can read: the original is served at every width
+        return []
+    content_type, options = THUMBNAIL_FORMATS.get(opened.format, THUMBNAIL_FORMATS["PNG"])
+    thumbnails = []
+    for width in sorted(widths):
+        if width >= image.width:
+            break
+        thumbnail = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        if content_type == "image/jpeg" and thumbnail.mode != "RGB":
+            thumbnail = thumbnail.convert("RGB")
+        out = io.BytesIO()
+        thumbnail.save(out, format=content_type.split("/")[1].upper(), **options)
+        thumbnails.append((width, out.getvalue(), content_type))
+    return thumbnails
+
+
+def parse_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Start and (exclusive) end of a single ``bytes=`` range, or None to send the whole body.
+
+    Ranges this server does not handle (other units, several ranges, malformed)
+    are ignored, as RFC 9110 allows. Raises RangeNotSatisfiable for a range
+    outside the body.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    first, dash, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or not dash or "," in spec:
+        return None
+    if not (first.isdigit() or (not first and last)) or not (last.isdigit() or not last):
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0 or length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, length - suffix), length
+    start, end = int(first), int(last) + 1 if last else length
+    if start >= length or end <= start:
+        raise RangeNotSatisfiable()
+    return start, min(end, length)
+
+
+class DiskBlobStore:
+    """Blobs as files named by their hash under ``root``, fanned out by the first two hex digits."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    async def put(self, digest: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, digest, data)
+
+    def _write(self, digest: str, data: bytes) -> None:
+        path = self._path(digest)
+        if path.exists():
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Renamed into place so that readers never see a partly written blob
+        partial = path.with_name(f"{digest}.{uuid.uuid4().hex}.tmp")
+        partial.write_bytes(data)
+        os.replace(partial, path)
+
+    async def read(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Bytes ``start`` to ``end`` of a blob, in chunks."""
+        path, offset = self._path(digest), start
+        while offset < end:
+            # One thread hop per chunk; most images fit in one
+            chunk = await asyncio.to_thread(self._read, path, offset, min(CHUNK_SIZE, end - offset))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    @staticmethod
+    def _read(path: Path, offset: int, size: int) -> bytes:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+
+class GridFSBlobStore:
+    """Blobs in a GridFS bucket, with the hash as file id."""
+
+    def __init__(self, db, bucket_name: str = "media_blobs"):
+        self.db = db
+        self.bucket_name = bucket_name
+        self._bucket: Optional[AsyncIOMotorGridFSBucket] = None
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(self.db, bucket_name=self.bucket_name)
+        return self._bucket
+
+    async def put(self, digest: str, data: bytes) -> None:
+        try:
+            await self.bucket.upload_from_stream_with_id(digest, digest, data)
+        except (FileExists, DuplicateKeyError):
+            pass  # same hash, same bytes: already stored
+
+    async def read(self, digest: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Bytes ``start`` to ``end`` of a blob, in chunks."""
+        stream = await self.bucket.open_download_stream(digest)
+        stream.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = await stream.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class MediaStore:
+    """Images and their thumbnails by content hash: blobs plus a record each in ``collection``."""
+
+    def __init__(self, collection, blobs, thumbnail_widths: Iterable[int] = THUMBNAIL_WIDTHS,
+                 cache_size: int = 10000):
+        self.collection = collection
+        self.blobs = blobs
+        self.thumbnail_widths = tuple(thumbnail_widths)
+        self.cache_size = cache_size
+        self._records: "OrderedDict[str, MediaRecord]" = OrderedDict()
+
+    async def get(self, digest: str) -> Optional[MediaRecord]:
+        record = self._records.get(digest)
+        if record is not None:
+            self._records.move_to_end(digest)
+            return record
+        doc = await self.collection.find_one({"_id": digest})
+        if doc is None:
+            return None
+        record = MediaRecord(
+            digest, doc["contentType"], doc["length"], {int(w): d for w, d in doc.get("thumbnails", {}).items()},
+        )
+        self._records[digest] = record
+        if len(self._records) > self.cache_size:
+            self._records.popitem(last=False)
+        return record
+
+    async def put(self, data: bytes, content_type: str) -> str:
+        """Store an image and its thumbnails; returns its hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        if await self.get(digest) is not None:
+            return digest
+        thumbnails = {}
+        for width, thumbnail, thumbnail_type in await asyncio.to_thread(render_thumbnails, data, self.thumbnail_widths):
+            thumbnails[str(width)] = await self._store(hashlib.sha256(thumbnail).hexdigest(), thumbnail, thumbnail_type)
+        return await self._store(digest, data, content_type, thumbnails)
+
+    async def _store(self, digest: str, data: bytes, content_type: str, thumbnails: Optional[dict] = None) -> str:
+        # The blob goes first: a record always has its bytes in place
+        await self.blobs.put(digest, data)
+        try:
+            await self.collection.update_one({"_id": digest}, {"$setOnInsert": {
+                "contentType": content_type, "length": len(data), "thumbnails": thumbnails or {},
+                "createdAt": datetime.utcnow(),
+            }}, upsert=True)
+        except DuplicateKeyError:
+            pass  # stored concurrently by another request or worker
+        return digest
+
+    async def variant(self, record: MediaRecord, width: Optional[int]) -> MediaRecord:
+        """The smallest rendition at least ``width`` wide; the original when no thumbnail is."""
+        if width:
+            for w in sorted(record.thumbnails):
+                if w >= width:
+                    thumbnail = await self.get(record.thumbnails[w])
+                    if thumbnail is not None:
+                        return thumbnail
+        return record
+
+    def read(self, record: MediaRecord, start: int, end: int) -> AsyncIterator[bytes]:
+        return self.blobs.read(record.digest, start, end)
+
+    async def externalize(self, restaurant: dict) -> int:
+        """Move the inline images of a restaurant document into the store, in place; returns how many."""
+        slots = [(restaurant, "logo"), (restaurant, "heroImage")]
+        slots += [(item, "image") for category in restaurant.get("menu") or [] for item in category.get("items") or []]
+        moved = 0
+        for holder, field in slots:
+            value = holder.get(field)
+            inline = decode_inline(value) if isinstance(value, str) else None
+            if inline is not None:
+                holder[field] = reference(await self.put(*inline))
+                moved += 1
+        return moved
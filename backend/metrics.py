@@ -0,0 +1,319 @@
+"""Process metrics in the Prometheus text exposition format.
+
+A small thread-safe registry of counters, gauges and histograms fed from
+three places:
+
+* ``MetricsMiddleware``: request count, latency histogram and in-flight
+  gauge per route template (``/api/orders/{order_id}``, never the raw path,
+  so label cardinality stays bounded).
+* ``MongoCommandListener``: latency and failures per collection and command.
+* ``MongoPoolListener``: open and checked-out connections and checkout
+  failures per server.
+
+Pymongo calls listeners from the driver's threads (Motor runs pymongo on a
+thread pool), so every metric takes its own lock. An observation is a dict
+lookup, a bisect and a few additions under an uncontended lock.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=REQUEST_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (the last one is +Inf), then sum and count
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def count(self, *labels: str) -> int:
+        state = self._values.get(labels)
+        return state[-1] if state else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(state)) for labels, state in self._values.items()]
+        lines = self.header()
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(state[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status.", ("method", "route", "status"),
+))
+http_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time until the response body was sent.", ("method", "route"),
+))
+http_in_flight = REGISTRY.register(Gauge(
+    "http_requests_in_flight", "Requests being handled, including open streams.", ("method", "route"),
+))
+mongo_duration = REGISTRY.register(Histogram(
+    "mongo_command_duration_seconds", "Mongo command round trips by collection and command.",
+    ("collection", "command"), buckets=MONGO_BUCKETS,
+))
+mongo_failures = REGISTRY.register(Counter(
+    "mongo_command_failures_total", "Mongo commands that returned an error.", ("collection", "command"),
+))
+pool_connections = REGISTRY.register(Gauge(
+    "mongo_pool_connections", "Open connections in the driver's pool.", ("address",),
+))
+pool_checked_out = REGISTRY.register(Gauge(
+    "mongo_pool_checked_out_connections", "Pool connections currently in use.", ("address",),
+))
+pool_checkout_failures = REGISTRY.register(Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed (e.g. pool timeout).", ("address", "reason"),
+))
+
+
+class RouteResolver:
+    """Route template of a request, matched the way the router matches it.
+
+    Static paths are a dict lookup. Parameterized ones are tried with each
+    route's compiled path regex, without building the child scope the router
+    would.
+    """
+
+    UNMATCHED = "unmatched"
+
+    def __init__(self, routes: Iterable):
+        self._static: Dict[str, str] = {}
+        self._dynamic = []
+        for route in routes:
+            path, regex = getattr(route, "path", None), getattr(route, "path_regex", None)
+            if path is None or regex is None:
+                continue
+            if "{" in path:
+                self._dynamic.append((regex, getattr(route, "methods", None), path))
+            else:
+                self._static.setdefault(path, path)
+
+    def resolve(self, scope) -> str:
+        path = scope["path"]
+        if path in self._static:
+            return path
+        partial = None
+        for regex, methods, template in self._dynamic:
+            if regex.match(path):
+                if methods is None or scope["method"] in methods:
+                    return template
+                # Right path, wrong method: the router answers 405, label it anyway
+                partial = partial or template
+        return partial or self.UNMATCHED
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route counts, latency and in-flight requests."""
+
+    def __init__(self, app, router):
+        self.app = app
+        # Routes are read on first use, once every router has been included
+        self.router = router
+        self._resolver: Optional[RouteResolver] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self._resolver is None:
+            self._resolver = RouteResolver(self.router.routes)
+        method, route = scope["method"], self._resolver.resolve(scope)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        http_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_in_flight.dec(method, route)
+            http_duration.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, status)
+
+
+def _command_collection(event) -> str:
+    command = event.command
+    name = event.command_name
+    target = command.get("collection") if name == "getMore" else command.get(name)
+    return target if isinstance(target, str) else ""
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Times every command; the collection is remembered from the started event."""
+
+    # Driver-internal monitoring and handshakes, not application queries
+    IGNORED = frozenset({"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions"})
+
+    def __init__(self):
+        self._collections: Dict[Tuple, str] = {}
+
+    def started(self, event) -> None:
+        if event.command_name not in self.IGNORED:
+            self._collections[(event.connection_id, event.request_id)] = _command_collection(event)
+
+    def succeeded(self, event) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            mongo_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event) -> None:
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is not None:
+            mongo_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+            mongo_failures.inc(collection, event.command_name)
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    def pool_created(self, event) -> None:
+        pool_connections.set(_address(event), value=0)
+        pool_checked_out.set(_address(event), value=0)
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pool_connections.inc(_address(event))
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pool_connections.dec(_address(event))
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        pool_checkout_failures.inc(_address(event), str(event.reason))
+
+    def connection_checked_out(self, event) -> None:
+        pool_checked_out.inc(_address(event))
+
+    def connection_checked_in(self, event) -> None:
+        pool_checked_out.dec(_address(event))
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,58 @@
+"""Keyset (cursor) pagination over ``(createdAt, _id)``, newest first.
+
+A page is fetched with ``find(keyset_filter(cursor)).sort(KEYSET_SORT).limit(n + 1)``.
+The extra document only tells whether another page exists. Every page is an
+index range scan on the matching compound index, however deep it is, and no
+``skip`` is involved.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+KEYSET_SORT = [("createdAt", -1), ("_id", -1)]
+KEYSET_INDEX = KEYSET_SORT
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(created_at: datetime, doc_id: ObjectId) -> str:
+    """Opaque token pointing just past the given document."""
+    raw = json.dumps([created_at.isoformat(), str(doc_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, ObjectId]:
+    """Inverse of ``encode_cursor``; raises ValueError for malformed tokens."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_at, doc_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except (ValueError, TypeError, InvalidId) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def keyset_filter(cursor: Optional[str]) -> dict:
+    """Query selecting the documents that sort after the cursor."""
+    if not cursor:
+        return {}
+    created_at, doc_id = decode_cursor(cursor)
+    return {
+        "$or": [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "_id": {"$lt": doc_id}},
+        ]
+    }
+
+
+def next_cursor(page: list, limit: int) -> Optional[str]:
+    """Trim a ``limit + 1`` fetch in place and return the token for the next page."""
+    if len(page) <= limit:
+        return None
+    del page[limit:]
+    last = page[-1]
+    return encode_cursor(last["createdAt"], last["_id"])
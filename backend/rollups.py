@@ -0,0 +1,222 @@
+"""Per-(restaurant, day, orderType) order rollups maintained with ``$inc`` upserts.
+
+Every new order increments one bucket in the ``order_rollups`` collection:
+order count, revenue and number of items. Analytics read only the buckets, so
+a dashboard costs O(days x order types) whatever the order volume. Revenue is
+summed in integer cents so repeated increments do not accumulate float error.
+Days are UTC calendar days of ``createdAt``.
+
+Increments are applied after the order is stored and are not transactional
+with it. ``backfill`` rebuilds buckets from the orders themselves and repairs
+any drift. With a linger configured, ``RollupWriter`` merges increments to
+the same bucket in memory, so a burst of orders on a hot restaurant becomes
+one update per bucket.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import ReplaceOne, UpdateOne
+
+COUNTERS = ("orders", "revenueCents", "items")
+MAX_RANGE_DAYS = 366
+
+
+def bucket_id(restaurant_id: str, day: str, order_type: str) -> str:
+    return f"{restaurant_id}:{day}:{order_type}"
+
+
+def order_increments(orders: Iterable[dict]) -> Dict[tuple, Dict[str, int]]:
+    """Counter increments per ``(restaurantId, day, orderType)`` for new orders."""
+    increments: Dict[tuple, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for order in orders:
+        key = (order["restaurantId"], order["createdAt"].strftime("%Y-%m-%d"), order["orderType"])
+        bucket = increments[key]
+        bucket["orders"] += 1
+        bucket["revenueCents"] += round(order.get("totalPrice", 0) * 100)
+        bucket["items"] += sum(item.get("quantity", 0) for item in order.get("items", []))
+    return increments
+
+
+def increment_requests(increments: Dict[tuple, Dict[str, int]]) -> List[UpdateOne]:
+    return [
+        UpdateOne(
+            {"_id": bucket_id(*key)},
+            {
+                "$inc": counters,
+                "$setOnInsert": {"restaurantId": key[0], "day": key[1], "orderType": key[2]},
+            },
+            upsert=True,
+        )
+        for key, counters in increments.items()
+    ]
+
+
+async def ensure_rollup_indexes(collection) -> None:
+    await collection.create_index([("restaurantId", 1), ("day", 1)])
+
+
+class RollupWriter:
+    """Applies order increments, optionally merging them over a short linger."""
+
+    def __init__(self, collection, max_linger_ms: float = 0.0):
+        self.collection = collection
+        self.max_linger = max_linger_ms / 1000
+        self._pending: Dict[tuple, Dict[str, int]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writes: set = set()
+
+    async def record(self, orders: Iterable[dict]) -> None:
+        increments = order_increments(orders)
+        if self.max_linger <= 0:
+            await self._apply(increments)
+            return
+        for key, counters in increments.items():
+            pending = self._pending.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            for name, value in counters.items():
+                pending[name] += value
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_linger, self._flush)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        increments, self._pending = self._pending, {}
+        if increments:
+            task = asyncio.ensure_future(self._apply(increments))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def flush(self) -> None:
+        """Apply everything pending now and wait for in-flight writes (e.g. on shutdown)."""
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _apply(self, increments: Dict[tuple, Dict[str, int]]) -> None:
+        if not increments:
+            return
+        try:
+            await self.collection.bulk_write(increment_requests(increments), ordered=False)
+        except Exception:
+            # The orders are stored; a backfill brings the buckets back in line
+            logging.exception(f"Failed to apply {len(increments)} order rollup increments")
+
+
+def backfill_pipeline(since: Optional[datetime] = None, until: Optional[datetime] = None) -> List[dict]:
+    created = {}
+    if since is not None:
+        created["$gte"] = since
+    if until is not None:
+        created["$lt"] = until
+    return ([{"$match": {"createdAt": created}}] if created else []) + [
+        {"$group": {
+            "_id": {
+                "restaurantId": "$restaurantId",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}},
+                "orderType": "$orderType",
+            },
+            "orders": {"$sum": 1},
+            "revenue": {"$sum": "$totalPrice"},
+            "items": {"$sum": {"$sum": "$items.quantity"}},
+        }},
+    ]
+
+
+async def backfill(orders, rollups, since: Optional[date] = None, until: Optional[date] = None) -> int:
+    """Rebuild the buckets of the days in ``[since, until)`` from the orders; returns the bucket count.
+
+    Buckets of those days are replaced, not incremented, so a backfill can be
+    rerun at any time. Orders arriving for a day while it is being rebuilt may
+    be counted twice or not at all, so rebuild days that no longer take
+    orders, or rerun the backfill once they are quiet. Work is done a day at a
+    time, so memory is bounded by the buckets of one day.
+    """
+    start = datetime.combine(since, datetime.min.time()) if since else None
+    end = datetime.combine(until, datetime.min.time()) if until else None
+    pipeline = backfill_pipeline(start, end) + [{"$sort": {"_id.day": 1}}]
+    written, days = 0, []
+    day, ids, requests = None, [], []
+
+    async def write_day():
+        # Replace the day's buckets, then drop the ones that no longer have orders
+        await rollups.bulk_write(requests, ordered=False)
+        await rollups.delete_many({"day": day, "_id": {"$nin": ids}})
+
+    async for group in orders.aggregate(pipeline, allowDiskUse=True):
+        key = group["_id"]
+        if key["day"] != day:
+            if requests:
+                await write_day()
+                written += len(requests)
+            day, ids, requests = key["day"], [], []
+            days.append(day)
+        ids.append(bucket_id(key["restaurantId"], key["day"], key["orderType"]))
+        requests.append(ReplaceOne(
+            {"_id": ids[-1]},
+            {**key, "orders": group["orders"], "revenueCents": round(group["revenue"] * 100), "items": group["items"]},
+            upsert=True,
+        ))
+    if requests:
+        await write_day()
+        written += len(requests)
+
+    # Days in the range without any orders left
+    empty_days: dict = {"$nin": days}
+    if since:
+        empty_days["$gte"] = since.isoformat()
+    if until:
+        empty_days["$lt"] = until.isoformat()
+    await rollups.delete_many({"day": empty_days})
+    return written
+
+
+def empty_totals() -> dict:
+    return {"orders": 0, "revenue": 0.0, "items": 0, "averageOrderValue": 0.0}
+
+
+def _add(totals: dict, bucket: dict) -> None:
+    totals["orders"] += bucket.get("orders", 0)
+    totals["revenueCents"] = totals.get("revenueCents", 0) + bucket.get("revenueCents", 0)
+    totals["items"] += bucket.get("items", 0)
+
+
+def _finish(totals: dict) -> dict:
+    cents = totals.pop("revenueCents", 0)
+    totals["revenue"] = cents / 100
+    totals["averageOrderValue"] = round(cents / totals["orders"] / 100, 2) if totals["orders"] else 0.0
+    return totals
+
+
+def summarize(buckets: Iterable[dict], since: date, until: date) -> dict:
+    """Totals, per order type and per day (every day in ``[since, until]``, zeros included)."""
+    days = {
+        (since + timedelta(days=n)).isoformat(): {"totals": empty_totals(), "byOrderType": {}}
+        for n in range((until - since).days + 1)
+    }
+    totals, by_type = empty_totals(), {}
+    for bucket in buckets:
+        day = days.get(bucket["day"])
+        if day is None:
+            continue
+        order_type = bucket["orderType"]
+        for target in (
+            totals,
+            by_type.setdefault(order_type, empty_totals()),
+            day["totals"],
+            day["byOrderType"].setdefault(order_type, empty_totals()),
+        ):
+            _add(target, bucket)
+    for day in days.values():
+        _finish(day["totals"])
+        day["byOrderType"] = {order_type: _finish(t) for order_type, t in sorted(day["byOrderType"].items())}
+    return {
+        "from": since.isoformat(),
+        "to": until.isoformat(),
+        "totals": _finish(totals),
+        "byOrderType": {order_type: _finish(t) for order_type, t in sorted(by_type.items())},
+        "days": [{"date": day, **values} for day, values in days.items()],
+    }
@@ -0,0 +1,195 @@
+"""In-process search index for the restaurant catalog.
+
+Restaurant names and cuisines are tokenized into a shared vocabulary. A query
+token is matched against that vocabulary three ways, from best to worst:
+
+* exact token match
+* prefix match (the user is still typing), found by bisecting the sorted vocabulary
+* typo match, found through a trigram index and confirmed with a bounded edit distance
+
+The index is updated incrementally with ``add``/``remove`` so it never needs a
+full rebuild after a single catalog write.
+"""
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Field weights: a hit in the restaurant name counts more than a cuisine hit
+NAME_WEIGHT = 1.0
+CUISINE_WEIGHT = 0.8
+
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+TYPO_SCORE = 0.6
+
+
+def normalize(text: str) -> str:
+    """Lowercase and strip accents so "Café" matches "cafe"."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(normalize(text))
+
+
+def trigrams(token: str) -> Set[str]:
+    """Padded trigrams, so short tokens and word starts still produce grams."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(token: str) -> int:
+    """Edit distance tolerated for a query token of this length."""
+    if len(token) < 4:
+        return 0
+    if len(token) < 8:
+        return 1
+    return 2
+
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> Optional[int]:
+    """Levenshtein distance between ``a`` and ``b``, or None if it exceeds ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, cb in enumerate(b, 1):
+            cost = previous[j - 1] + (ca != cb)
+            value = min(previous[j] + 1, current[j - 1] + 1, cost)
+            current.append(value)
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= limit else None
+
+
+class RestaurantSearchIndex:
+    """Ranked, prefix and typo tolerant search over restaurant names and cuisines."""
+
+    def __init__(self):
+        # doc id -> (token -> field weight) for every indexed restaurant
+        self._docs: Dict[str, Dict[str, float]] = {}
+        self._ratings: Dict[str, float] = {}
+        self._cuisines: Dict[str, str] = {}
+        # token -> ids of the restaurants containing it
+        self._postings: Dict[str, Set[str]] = defaultdict(set)
+        # trigram -> vocabulary tokens containing it
+        self._grams: Dict[str, Set[str]] = defaultdict(set)
+        self._vocabulary: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_id: str, name: str, cuisine: str, rating: float = 0.0) -> None:
+        """Index a restaurant, replacing any previous entry with the same id."""
+        self.remove(doc_id)
+        weights: Dict[str, float] = {}
+        for token in tokenize(cuisine):
+            weights[token] = CUISINE_WEIGHT
+        for token in tokenize(name):
+            weights[token] = NAME_WEIGHT
+        self._docs[doc_id] = weights
+        self._ratings[doc_id] = rating or 0.0
+        self._cuisines[doc_id] = cuisine
+        for token in weights:
+            if token not in self._postings:
+                bisect.insort(self._vocabulary, token)
+                for gram in trigrams(token):
+                    self._grams[gram].add(token)
+            self._postings[token].add(doc_id)
+
+    def remove(self, doc_id: str) -> None:
+        weights = self._docs.pop(doc_id, None)
+        self._ratings.pop(doc_id, None)
+        self._cuisines.pop(doc_id, None)
+        if not weights:
+            return
+        for token in weights:
+            postings = self._postings[token]
+            postings.discard(doc_id)
+            if postings:
+                continue
+            del self._postings[token]
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, token)]
+            for gram in trigrams(token):
+                self._grams[gram].discard(token)
+                if not self._grams[gram]:
+                    del self._grams[gram]
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def _prefix_matches(self, token: str) -> Iterable[str]:
+        start = bisect.bisect_left(self._vocabulary, token)
+        for candidate in self._vocabulary[start:]:
+            if not candidate.startswith(token):
+                break
+            yield candidate
+
+    def _typo_matches(self, token: str) -> Iterable[Tuple[str, int]]:
+        limit = max_typos(token)
+        if not limit:
+            return
+        grams = trigrams(token)
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in grams:
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] += 1
+        # q-gram lemma: every edit destroys at most three trigrams
+        threshold = len(grams) - 3 * limit
+        for candidate, count in shared.items():
+            if count < threshold:
+                continue
+            # Compare against the candidate's prefix too, so typos work while typing
+            distance = bounded_edit_distance(token, candidate, limit)
+            if distance is None and len(candidate) > len(token):
+                distance = bounded_edit_distance(token, candidate[:len(token)], limit)
+            if distance:
+                yield candidate, distance
+
+    def _match(self, token: str) -> Dict[str, float]:
+        """Vocabulary tokens matching a query token, with their match score."""
+        matches: Dict[str, float] = {}
+        for candidate, distance in self._typo_matches(token):
+            matches[candidate] = TYPO_SCORE / distance
+        for candidate in self._prefix_matches(token):
+            matches[candidate] = EXACT_SCORE if candidate == token else PREFIX_SCORE
+        return matches
+
+    def search(self, query: str, limit: int = 100, cuisine: Optional[str] = None) -> List[str]:
+        """Ids of the restaurants matching every query token, best match first.
+
+        With ``cuisine``, only restaurants of exactly that cuisine are kept, before
+        ``limit`` applies.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores: Optional[Dict[str, float]] = None
+        for token in tokens:
+            token_scores: Dict[str, float] = {}
+            for candidate, match_score in self._match(token).items():
+                for doc_id in self._postings[candidate]:
+                    score = match_score * self._docs[doc_id][candidate]
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+            if not scores:
+                return []
+
+        if cuisine is not None:
+            scores = {d: s for d, s in scores.items() if self._cuisines[d] == cuisine}
+        ranked = sorted(scores, key=lambda d: (-scores[d], -self._ratings[d], d))
+        return ranked[:limit]
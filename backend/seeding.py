@@ -0,0 +1,118 @@
+"""Run-once data migrations shared safely between API workers.
+
+A migration is identified by a name and a content hash of the data it writes.
+Its last applied hash is recorded in the ``migrations`` collection. Boots that
+see the same hash skip the work entirely. When several workers start at once,
+a lease in the ``locks`` collection lets exactly one of them apply the
+migration. The others wait until it is recorded.
+
+The holder renews its lease while the migration runs, however long that
+takes. If the holder dies, its lease expires after ``LOCK_TTL`` and a waiting
+worker takes the migration over.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+LOCK_TTL = timedelta(seconds=60)
+# A holder renews its lease this often, well within LOCK_TTL
+RENEW_INTERVAL_SECONDS = 20.0
+# For migrations the API can serve without: how long a worker waits for another to finish them
+WAIT_TIMEOUT_SECONDS = 30.0
+POLL_INTERVAL_SECONDS = 0.2
+
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def content_hash(data: Any) -> str:
+    """Stable SHA-256 of JSON-like data (key order does not matter)."""
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+async def ensure_lock_indexes(db) -> None:
+    # Crashed holders' leases are also taken over on expiry, this only cleans them up
+    await db.locks.create_index("expiresAt", expireAfterSeconds=0)
+
+
+async def acquire_lock(db, name: str, ttl: timedelta = LOCK_TTL) -> bool:
+    """Take the named lease, or an expired one; False if someone else holds it."""
+    now = datetime.utcnow()
+    lease = {"owner": OWNER, "expiresAt": now + ttl}
+    try:
+        await db.locks.insert_one({"_id": name, **lease})
+        return True
+    except DuplicateKeyError:
+        taken = await db.locks.find_one_and_update(
+            {"_id": name, "expiresAt": {"$lt": now}},
+            {"$set": lease},
+        )
+        return taken is not None
+
+
+async def renew_lock(db, name: str, ttl: timedelta = LOCK_TTL) -> bool:
+    """Extend our lease; False if it was lost (it expired and was taken over)."""
+    result = await db.locks.update_one({"_id": name, "owner": OWNER}, {"$set": {"expiresAt": datetime.utcnow() + ttl}})
+    return result.matched_count == 1
+
+
+async def keep_lock(db, name: str) -> None:
+    """Renew our lease until cancelled."""
+    while True:
+        await asyncio.sleep(RENEW_INTERVAL_SECONDS)
+        try:
+            if not await renew_lock(db, name, LOCK_TTL):
+                logging.warning(f"Lost the lease of migration {name!r} to another worker")
+                return
+        except Exception:
+            logging.exception(f"Could not renew the lease of migration {name!r}")
+
+
+async def release_lock(db, name: str) -> None:
+    await db.locks.delete_one({"_id": name, "owner": OWNER})
+
+
+async def run_once(
+    db, name: str, digest: str, apply: Callable[[], Awaitable[None]], wait_timeout: Optional[float] = None,
+) -> bool:
+    """Apply a migration unless ``digest`` is already recorded for ``name``.
+
+    While another worker applies it, waits until it is recorded, or at most
+    ``wait_timeout`` seconds if given. Returns True if this process applied it.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = None if wait_timeout is None else loop.time() + wait_timeout
+    while True:
+        applied = await db.migrations.find_one({"_id": name})
+        if applied and applied.get("hash") == digest:
+            return False
+
+        if await acquire_lock(db, name, LOCK_TTL):
+            heartbeat = asyncio.ensure_future(keep_lock(db, name))
+            try:
+                # Another worker may have finished between our check and the lock
+                applied = await db.migrations.find_one({"_id": name})
+                if applied and applied.get("hash") == digest:
+                    return False
+                await apply()
+                await db.migrations.update_one(
+                    {"_id": name},
+                    {"$set": {"hash": digest, "appliedAt": datetime.utcnow(), "appliedBy": OWNER}},
+                    upsert=True,
+                )
+                return True
+            finally:
+                heartbeat.cancel()
+                await release_lock(db, name)
+
+        if deadline is not None and loop.time() > deadline:
+            logging.warning(f"Timed out waiting for migration {name!r} held by another worker")
+            return False
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
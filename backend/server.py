@@ -1,21 +1,59 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Body, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import re
+import asyncio
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
-from datetime import datetime
+from pydantic import AfterValidator, BaseModel, Field, ValidationError
+from typing import Annotated, Any, List, Optional
+from datetime import date, datetime, timedelta
 from bson import ObjectId
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from catalog_cache import CachedResponse, CatalogCache, etag_matches, serialize
+from compression import CompressionMiddleware, negotiate_encoding
+from seeding import WAIT_TIMEOUT_SECONDS, content_hash, ensure_lock_indexes, run_once
+from availability import AvailabilityEngine, normalize_date, normalize_time, parse_time, reservation_tables
+from booking import TableConflict, claim_tables, ensure_claim_indexes, release_claims
+from floor_plans import FLOOR_PLAN_TEMPLATES, FloorPlan, FloorPlanStore, validate_rooms
+from table_assignment import suggest_tables
+from group_commit import GroupCommitWriter
+from export import (
+    DEFAULT_EXPORT_BATCH, MAX_EXPORT_BATCH, MEDIA_TYPES, ORDER_COLUMNS, RESERVATION_COLUMNS, export_chunks, export_filter,
+    naive_utc,
+)
+from fast_json import FastJSONResponse, api_document, api_documents, dumps, fill_defaults, model_projection
+from idempotency import MAX_KEY_LENGTH, IdempotencyStore, KeyInProgress, KeyReused, StoredResponse, ensure_idempotency_indexes
+from search_index import RestaurantSearchIndex
+from events import MAX_TOPICS, EventHub
+from slow_queries import SlowQueryListener, explain as explain_slow_query
+from admission import CRITICAL, EXEMPT, LOW, AdmissionController, AdmissionMiddleware, TokenBuckets
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, MongoCommandListener, MongoPoolListener, render as render_metrics
+from rollups import MAX_RANGE_DAYS, RollupWriter, backfill as backfill_rollups, ensure_rollup_indexes, summarize
+from media import (
+    DIGEST, INLINE_FILTER, THUMBNAIL_WIDTHS, DiskBlobStore, GridFSBlobStore, MediaStore, RangeNotSatisfiable, parse_range,
+)
+from pagination import DEFAULT_PAGE_SIZE, KEYSET_INDEX, KEYSET_SORT, MAX_PAGE_SIZE, keyset_filter, next_cursor
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Sampled commands slower than SLOW_QUERY_MS are kept for GET /api/admin/slow-queries
+slow_query_log = SlowQueryListener(
+    threshold_ms=float(os.environ.get("SLOW_QUERY_MS", 100)),
+    sample_rate=float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 1)),
+    capacity=int(os.environ.get("SLOW_QUERY_LOG_SIZE", 200)),
+)
+# Listeners feed the Mongo command latency and connection pool metrics, and the slow-query log
+client = AsyncIOMotorClient(
+    mongo_url, event_listeners=[MongoCommandListener(), MongoPoolListener(), slow_query_log],
+)
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
@@ -24,6 +62,80 @@ app = FastAPI()
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# In-process full-text index over restaurant names and cuisines, kept fresh by the catalog change
+# stream; without one (a standalone mongod) it is rebuilt every SEARCH_INDEX_REBUILD seconds instead
+search_index = RestaurantSearchIndex()
+SEARCH_INDEX_REBUILD_SECONDS = float(os.environ.get("SEARCH_INDEX_REBUILD", 300))
+
+# Restaurants, menus and floor plans are read-mostly: cache them in-process
+catalog_cache = CatalogCache(
+    max_entries=int(os.environ.get("CATALOG_CACHE_SIZE", 1024)),
+    ttl_seconds=float(os.environ.get("CATALOG_CACHE_TTL", 300)),
+)
+background_tasks: List[asyncio.Task] = []
+
+# Admission control: concurrent requests per worker (0 disables) and per-client rate limit (off by default).
+# Behind an ingress every request comes from the proxy's address: to rate limit per user, also set
+# RATE_LIMIT_CLIENT_HEADER to the header the ingress puts the client address in, e.g. X-Forwarded-For
+ADMISSION_MAX_CONCURRENCY = int(os.environ.get("ADMISSION_MAX_CONCURRENCY", 64))
+RATE_LIMIT_RPS = float(os.environ.get("RATE_LIMIT_RPS", 0))
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", 60))
+RATE_LIMIT_CLIENT_HEADER = os.environ.get("RATE_LIMIT_CLIENT_HEADER") or None
+admission = AdmissionController(ADMISSION_MAX_CONCURRENCY) if ADMISSION_MAX_CONCURRENCY > 0 else None
+rate_limiter = TokenBuckets(RATE_LIMIT_RPS, RATE_LIMIT_BURST) if RATE_LIMIT_RPS > 0 else None
+
+# Pushes order/reservation status changes to SSE subscribers of this worker
+event_hub = EventHub()
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+
+# Floor plans by restaurant id, preloaded from the floor_plans collection
+floor_plan_store = FloorPlanStore()
+FLOOR_PLAN_REFRESH_SECONDS = float(os.environ.get("FLOOR_PLAN_REFRESH", 30))
+
+# Optional group commit: coalesce concurrent order/reservation inserts into bulk writes
+GROUP_COMMIT_ENABLED = os.environ.get("GROUP_COMMIT", "").lower() in ("1", "true", "yes")
+GROUP_COMMIT_MAX_BATCH = int(os.environ.get("GROUP_COMMIT_MAX_BATCH", 100))
+GROUP_COMMIT_MAX_LINGER_MS = float(os.environ.get("GROUP_COMMIT_MAX_LINGER_MS", 2))
+# Created at startup; None when group commit is disabled
+order_writer: Optional[GroupCommitWriter] = None
+reservation_writer: Optional[GroupCommitWriter] = None
+
+# Revenue/volume buckets per (restaurant, day, orderType); created at startup, merging
+# increments over the group-commit linger when group commit is enabled
+rollup_writer: Optional[RollupWriter] = None
+
+# Responses of keyed create requests, replayed to retries for IDEMPOTENCY_TTL_HOURS; created at startup
+IDEMPOTENCY_TTL = timedelta(hours=float(os.environ.get("IDEMPOTENCY_TTL_HOURS", 24)))
+idempotency_store: Optional[IdempotencyStore] = None
+
+# Images moved out of restaurant documents: GridFS by default, or files under MEDIA_ROOT
+# with MEDIA_STORE=disk (a volume shared by every worker); created at startup
+MEDIA_STORE = os.environ.get("MEDIA_STORE", "gridfs").lower()
+MEDIA_ROOT = Path(os.environ.get("MEDIA_ROOT", ROOT_DIR / "media"))
+MEDIA_THUMBNAIL_WIDTHS = tuple(
+    int(w) for w in os.environ.get("MEDIA_THUMBNAIL_WIDTHS", ",".join(map(str, THUMBNAIL_WIDTHS))).split(",") if w.strip()
+)
+media_store: Optional[MediaStore] = None
+
+async def insert_document(collection, writer: Optional[GroupCommitWriter], doc: dict) -> ObjectId:
+    """insert_one, or a group-committed insert when enabled"""
+    if writer is not None:
+        return await writer.insert(doc)
+    result = await collection.insert_one(doc)
+    return result.inserted_id
+
+async def load_day_reservations(restaurant_id: str, dates: List[str]) -> List[dict]:
+    return await db.reservations.find(
+        {"restaurantId": restaurant_id, "date": {"$in": dates}, "status": {"$ne": "cancelled"}},
+        {"_id": 0, "date": 1, "time": 1, "duration": 1, "selectedTables.tableNumber": 1},
+    ).to_list(None)
+
+# Which tables are booked when, per restaurant and day
+availability = AvailabilityEngine(
+    load_day_reservations,
+    ttl_seconds=float(os.environ.get("AVAILABILITY_TTL", 30)),
+)
+
 # ========================
 # MODELS
 # ========================
@@ -32,16 +144,17 @@ class MenuItem(BaseModel):
     name: str
     description: str
     price: float
-    image: str = ""  # base64 or empty for demo
+    image: str = ""  # URL, /api/media/<hash> reference or empty; inline base64 is moved to the media store
 
 class MenuCategory(BaseModel):
     category: str
     items: List[MenuItem]
 
-class Restaurant(BaseModel):
+class RestaurantSummary(BaseModel):
+    """Restaurant without its menu, as returned by the list endpoints"""
     id: Optional[str] = None
     name: str
-    logo: str = ""  # base64
+    logo: str = ""  # URL or /api/media/<hash> reference, like MenuItem.image
     cuisine: str
     rating: float
     priceRange: str
@@ -50,9 +163,18 @@ class Restaurant(BaseModel):
     deliveryTime: str
     latitude: float
     longitude: float
-    menu: List[MenuCategory]
     openingHours: str = "9:00 AM - 10:00 PM"
 
+class Restaurant(RestaurantSummary):
+    menu: List[MenuCategory]
+
+class NearbyRestaurant(RestaurantSummary):
+    distance: float  # meters from the requested point
+
+# Mongo projection that only loads the fields of a RestaurantSummary
+SUMMARY_PROJECTION = model_projection(RestaurantSummary)
+RESTAURANT_PROJECTION = model_projection(Restaurant)
+
 class CartItem(BaseModel):
     name: str
     price: float
@@ -80,16 +202,41 @@ class Order(BaseModel):
     pickupTime: Optional[str] = None
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
+class BatchOrderResult(BaseModel):
+    index: int  # position in the submitted batch
+    status: str  # "created", "invalid" or "failed"
+    id: Optional[str] = None
+    errors: List[str] = []
+
+class BatchOrderResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchOrderResult]
+
+MAX_ORDER_BATCH = 500
+
+ORDER_STATUSES = ("active", "completed", "cancelled")
+RESERVATION_STATUSES = ("upcoming", "completed", "cancelled", "no-show")
+# Statuses a document can no longer leave
+FINAL_STATUSES = ("completed", "cancelled", "no-show")
+
+class StatusUpdate(BaseModel):
+    status: str
+
 class Table(BaseModel):
     tableNumber: str
     capacity: int
 
+# Stored and used in claim ids in canonical form, so every spelling of a slot books the same claims
+ReservationDate = Annotated[str, AfterValidator(normalize_date)]  # YYYY-MM-DD
+ReservationTime = Annotated[str, AfterValidator(normalize_time)]  # HH:MM
+
 class ReservationCreate(BaseModel):
     restaurantId: str
     restaurantName: str
-    date: str
-    time: str
-    duration: int
+    date: ReservationDate
+    time: ReservationTime
+    duration: int = Field(60, gt=0, le=720)
     people: int
     selectedTables: List[Table] = []
     totalCapacity: int = 0
@@ -112,6 +259,32 @@ class Reservation(BaseModel):
     qrCode: str = ""
     createdAt: datetime = Field(default_factory=datetime.utcnow)
 
+ORDER_PROJECTION = model_projection(Order)
+RESERVATION_PROJECTION = model_projection(Reservation)
+
+class FloorPlanTable(BaseModel):
+    tableNumber: str
+    capacity: int
+    x: float
+    y: float
+    available: bool = True  # False takes the table out of service
+
+class FloorPlanRoom(BaseModel):
+    id: str
+    name: str
+    tables: List[FloorPlanTable]
+
+class FloorPlanUpdate(BaseModel):
+    rooms: List[FloorPlanRoom]
+    version: Optional[int] = None  # version being replaced, for optimistic concurrency
+
+class TableSuggestionRequest(BaseModel):
+    people: int = Field(gt=0)
+    date: ReservationDate
+    time: ReservationTime
+    duration: int = Field(60, gt=0, le=720)
+    limit: int = Field(3, ge=1, le=10)
+
 # ========================
 # SEED DEMO DATA
 # ========================
@@ -309,16 +482,186 @@ DEMO_RESTAURANTS = [
     }
 ]
 
+def geo_point(latitude: float, longitude: float) -> dict:
+    """GeoJSON point for the 2dsphere index (GeoJSON order is [lng, lat])"""
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+def viewport_polygon(south: float, west: float, north: float, east: float) -> dict:
+    """GeoJSON polygon of a map viewport, as a closed counter-clockwise ring from its south-west corner"""
+    return {
+        "type": "Polygon",
+        "coordinates": [[[west, south], [east, south], [east, north], [west, north], [west, south]]],
+    }
+
+def slugify(name: str) -> str:
+    """Stable natural key for a restaurant, e.g. "Bella Italia" becomes bella-italia"""
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+def demo_restaurant_documents() -> List[dict]:
+    return [
+        {**r, "slug": slugify(r["name"]), "location": geo_point(r["latitude"], r["longitude"])}
+        for r in DEMO_RESTAURANTS
+    ]
+
 async def seed_restaurants():
-    """Seed database with demo restaurants - force reseed to update images"""
-    # Clear existing restaurants to reseed with images
-    await db.restaurants.delete_many({})
-    await db.restaurants.insert_many(DEMO_RESTAURANTS)
-    logging.info(f"Reseeded {len(DEMO_RESTAURANTS)} demo restaurants with images")
+    """Upsert the demo restaurants by slug, once per change of the seed data"""
+    documents = demo_restaurant_documents()
+
+    async def apply():
+        for d in documents:
+            await media_store.externalize(d)
+        # Replacing by natural key keeps each restaurant's _id stable across deployments.
+        # Documents from the old delete-and-reinsert seeding have no slug yet and are matched by name.
+        result = await db.restaurants.bulk_write([
+            ReplaceOne({"$or": [{"slug": d["slug"]}, {"name": d["name"], "slug": {"$exists": False}}]}, d, upsert=True)
+            for d in documents
+        ], ordered=False)
+        catalog_cache.bump_version()
+        logging.info(
+            f"Seeded demo restaurants: {result.upserted_count} inserted, {result.modified_count} updated"
+        )
+
+    if not await run_once(db, "seed:restaurants", content_hash(documents), apply):
+        logging.info("Demo restaurants already seeded")
+
+async def seed_floor_plans():
+    """Store the template floor plans of the demo restaurants, keeping custom edits"""
+    slugs = {slug: None for slug in FLOOR_PLAN_TEMPLATES}
+    async for r in db.restaurants.find({"slug": {"$in": list(slugs)}}, {"slug": 1}):
+        slugs[r["slug"]] = str(r["_id"])
+    plans = {restaurant_id: FLOOR_PLAN_TEMPLATES[slug] for slug, restaurant_id in slugs.items() if restaurant_id}
+
+    async def apply():
+        now = datetime.utcnow()
+        for restaurant_id, rooms in plans.items():
+            try:
+                # Plans edited through the API (source "custom") are left alone
+                await db.floor_plans.update_one(
+                    {"_id": restaurant_id, "source": {"$ne": "custom"}},
+                    {
+                        "$set": {"restaurantId": restaurant_id, "rooms": rooms, "source": "seed", "updatedAt": now},
+                        "$inc": {"version": 1},
+                    },
+                    upsert=True,
+                )
+            except DuplicateKeyError:
+                pass
+        logging.info(f"Seeded {len(plans)} demo floor plans")
+
+    await run_once(db, "seed:floor-plans", content_hash(plans), apply)
+
+async def initialize_order_rollups():
+    """Build the order rollups from existing orders the first time they are deployed"""
+    async def apply():
+        buckets = await backfill_rollups(db.orders, db.order_rollups)
+        logging.info(f"Backfilled {buckets} order rollup buckets")
+
+    await run_once(db, "backfill:order_rollups", "v1", apply)
+
+async def externalize_inline_media() -> dict:
+    """Move inline images of stored restaurants into the media store, leaving references"""
+    restaurants = images = 0
+    async for r in db.restaurants.find(INLINE_FILTER, {"logo": 1, "heroImage": 1, "menu": 1}):
+        moved = await media_store.externalize(r)
+        if moved:
+            await db.restaurants.update_one({"_id": r.pop("_id")}, {"$set": r})
+            restaurants += 1
+            images += moved
+    if restaurants:
+        catalog_cache.bump_version()
+    return {"restaurants": restaurants, "images": images}
+
+async def initialize_media():
+    """Externalize the inline images already stored the first time the media store is deployed"""
+    async def apply():
+        moved = await externalize_inline_media()
+        logging.info(f"Moved {moved['images']} inline images of {moved['restaurants']} restaurants to the media store")
+
+    # Inline images still work until it is done: do not hold up the other workers' startup for it
+    await run_once(db, "media:externalize", "v1", apply, wait_timeout=WAIT_TIMEOUT_SECONDS)
+
+async def refresh_floor_plans_periodically():
+    """Pick up floor plans changed by other workers"""
+    while True:
+        await asyncio.sleep(FLOOR_PLAN_REFRESH_SECONDS)
+        try:
+            await floor_plan_store.refresh(db.floor_plans)
+        except Exception:
+            logging.exception("Floor plan refresh failed")
+
+async def build_search_index():
+    """(Re)build the in-process search index from the catalog; searches use the old one until it is complete"""
+    global search_index
+    index = RestaurantSearchIndex()
+    async for r in db.restaurants.find({}, {"name": 1, "cuisine": 1, "rating": 1}):
+        index.add(str(r["_id"]), r.get("name", ""), r.get("cuisine", ""), r.get("rating", 0.0))
+    search_index = index
+    logging.info(f"Indexed {len(search_index)} restaurants for search")
+
+async def rebuild_search_index_periodically():
+    while True:
+        await asyncio.sleep(SEARCH_INDEX_REBUILD_SECONDS)
+        try:
+            await build_search_index()
+        except Exception:
+            logging.exception("Search index rebuild failed")
+
+async def watch_catalog_changes():
+    """Follow restaurant writes made by any worker to keep the cache and search index fresh"""
+    try:
+        async with db.restaurants.watch(full_document="updateLookup") as stream:
+            async for change in stream:
+                catalog_cache.bump_version()
+                restaurant_id = str(change["documentKey"]["_id"])
+                r = change.get("fullDocument")
+                if change["operationType"] == "delete" or not r:
+                    search_index.remove(restaurant_id)
+                else:
+                    search_index.add(restaurant_id, r.get("name", ""), r.get("cuisine", ""), r.get("rating", 0.0))
+    except OperationFailure:
+        # Change streams need a replica set; without one the cache TTL and index rebuilds bound staleness
+        logging.warning(
+            "Catalog change stream unavailable (it needs a replica set): restaurants written by other "
+            f"processes show up after the cache TTL, and in search after a rebuild every {SEARCH_INDEX_REBUILD_SECONDS:g}s"
+        )
+        await rebuild_search_index_periodically()
+
+async def ensure_indexes():
+    """Create the indexes the API queries rely on (no-op when they already exist)"""
+    await db.restaurants.create_index([("location", "2dsphere")])
+    await db.restaurants.create_index("slug", unique=True, sparse=True)
+    await db.orders.create_index(KEYSET_INDEX)
+    await db.reservations.create_index(KEYSET_INDEX)
+    await db.reservations.create_index([("restaurantId", 1), ("date", 1)])
+    await ensure_claim_indexes(db.table_claims)
+    await db.floor_plans.create_index("updatedAt")
+    await ensure_rollup_indexes(db.order_rollups)
+    await ensure_idempotency_indexes(db.idempotency_keys)
 
 @app.on_event("startup")
 async def startup_event():
+    await ensure_indexes()
+    await ensure_lock_indexes(db)
+    global media_store
+    blobs = DiskBlobStore(MEDIA_ROOT) if MEDIA_STORE == "disk" else GridFSBlobStore(db)
+    media_store = MediaStore(db.media, blobs, MEDIA_THUMBNAIL_WIDTHS)
     await seed_restaurants()
+    await seed_floor_plans()
+    await initialize_media()
+    await initialize_order_rollups()
+    await build_search_index()
+    await floor_plan_store.refresh(db.floor_plans)
+    global rollup_writer
+    rollup_writer = RollupWriter(db.order_rollups, GROUP_COMMIT_MAX_LINGER_MS if GROUP_COMMIT_ENABLED else 0)
+    global idempotency_store
+    idempotency_store = IdempotencyStore(db.idempotency_keys, ttl=IDEMPOTENCY_TTL)
+    if GROUP_COMMIT_ENABLED:
+        global order_writer, reservation_writer
+        order_writer = GroupCommitWriter(db.orders, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_LINGER_MS)
+        reservation_writer = GroupCommitWriter(db.reservations, GROUP_COMMIT_MAX_BATCH, GROUP_COMMIT_MAX_LINGER_MS)
+    background_tasks.append(asyncio.create_task(watch_catalog_changes()))
+    background_tasks.append(asyncio.create_task(refresh_floor_plans_periodically()))
+    background_tasks.append(asyncio.create_task(event_hub.run_heartbeats(SSE_HEARTBEAT_SECONDS)))
 
 # ========================
 # API ENDPOINTS
@@ -328,167 +671,736 @@ async def startup_event():
 async def root():
     return {"message": "Food Super App API"}
 
+@api_router.get("/admin/group-commit")
+async def get_group_commit_stats():
+    """Batching statistics of the group-commit writers"""
+    return {
+        "enabled": GROUP_COMMIT_ENABLED,
+        "orders": order_writer.stats() if order_writer else None,
+        "reservations": reservation_writer.stats() if reservation_writer else None,
+    }
+
+@api_router.get("/admin/events")
+async def get_event_hub_stats():
+    """Subscriber and fan-out counters of this worker's event hub"""
+    return event_hub.stats()
+
+@api_router.get("/admin/admission")
+async def get_admission_stats():
+    """Concurrency slots, queues and shed requests of this worker, and rate-limited clients"""
+    return {
+        "concurrency": admission.stats() if admission else None,
+        "rateLimit": rate_limiter.stats() if rate_limiter else None,
+    }
+
+@api_router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Request, Mongo command and connection pool metrics in the Prometheus text format"""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Recent Mongo commands over the slow-query threshold, newest first"""
+    return {**slow_query_log.stats(), "queries": slow_query_log.records(limit)}
+
+@api_router.post("/admin/slow-queries/{record_id}/explain")
+async def explain_slow_query_record(record_id: int):
+    """Explain (executionStats) a recorded slow command: plan stages, indexes, docs examined vs returned"""
+    try:
+        plan = await explain_slow_query(client, slow_query_log, record_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OperationFailure as e:
+        # e.g. the collection or index has since been dropped, or the command is no longer valid
+        raise HTTPException(status_code=422, detail=f"Explain failed: {e}")
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Slow query record not found (it may have been evicted)")
+    return plan
+
+@api_router.delete("/admin/slow-queries")
+async def clear_slow_queries():
+    """Empty the slow-query log"""
+    slow_query_log.clear()
+    return {"cleared": True}
+
+@api_router.get("/catalog/cache-stats")
+async def get_catalog_cache_stats():
+    """Catalog cache version and hit/miss counters"""
+    return catalog_cache.stats()
+
+def catalog_response(request: Request, cached: CachedResponse) -> Response:
+    """Serve a cached catalog body, or 304 Not Modified if the client already has it"""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    etag = cached.encoded_etag(encoding)
+    # no-cache: clients may store the body but must revalidate it with If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    # Either representation's tag proves the client holds this version of the content
+    if etag_matches(if_none_match, etag) or etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers=headers)
+    body = cached.encoded(encoding)
+    if body is not cached.body:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def load_restaurant(restaurant_id: str) -> Optional[dict]:
+    """Decoded restaurant document (None if missing), served from the catalog cache"""
+    async def load():
+        return await db.restaurants.find_one({"_id": ObjectId(restaurant_id)}, RESTAURANT_PROJECTION)
+    return await catalog_cache.get_or_load(("restaurant", restaurant_id), load)
+
 # RESTAURANTS
-@api_router.get("/restaurants", response_model=List[Restaurant])
-async def get_restaurants(search: Optional[str] = None, cuisine: Optional[str] = None):
+@api_router.get("/restaurants", response_model=List[RestaurantSummary])
+async def get_restaurants(request: Request, search: Optional[str] = None, cuisine: Optional[str] = None):
     """Get all restaurants with optional filters"""
+    cache_key = ("restaurants", (search or "").strip().lower(), cuisine or "all")
+    cached = await catalog_cache.get_or_load(cache_key, lambda: find_restaurants(search, cuisine))
+    return catalog_response(request, cached)
+
+async def find_restaurants(search: Optional[str], cuisine: Optional[str]) -> CachedResponse:
     query = {}
-    if search:
+    ranked_ids = None
+    if cuisine == "all":
+        cuisine = None
+    if search and len(search_index):
+        # Filtered in the index, or the cuisine's matches could be cut off by better ones of other cuisines
+        ranked_ids = search_index.search(search, limit=100, cuisine=cuisine)
+        query["_id"] = {"$in": [ObjectId(i) for i in ranked_ids]}
+    elif search:
+        # Index not built yet (e.g. still starting up): fall back to an escaped regex scan
+        pattern = re.escape(search)
         query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"cuisine": {"$regex": search, "$options": "i"}}
+            {"name": {"$regex": pattern, "$options": "i"}},
+            {"cuisine": {"$regex": pattern, "$options": "i"}}
         ]
-    if cuisine and cuisine != "all":
+    if cuisine:
         query["cuisine"] = cuisine
     
-    restaurants = await db.restaurants.find(query).to_list(100)
-    return [Restaurant(id=str(r["_id"]), **{k: v for k, v in r.items() if k != "_id"}) for r in restaurants]
+    restaurants = await db.restaurants.find(query, SUMMARY_PROJECTION).to_list(100)
+    if ranked_ids is not None:
+        rank = {restaurant_id: i for i, restaurant_id in enumerate(ranked_ids)}
+        restaurants.sort(key=lambda r: rank[str(r["_id"])])
+    return CachedResponse(serialize(api_documents(restaurants, RestaurantSummary)))
+
+@api_router.get("/restaurants/nearby", response_model=List[NearbyRestaurant])
+async def get_nearby_restaurants(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(5000, gt=0, le=50000, description="Search radius in meters"),
+    limit: int = Query(50, ge=1, le=200),
+    cuisine: Optional[str] = None,
+):
+    """Get restaurants around a point, nearest first (served by the 2dsphere index)"""
+    geo_near = {
+        "near": geo_point(lat, lng),
+        "distanceField": "distance",
+        "maxDistance": radius,
+        "spherical": True,
+    }
+    if cuisine and cuisine != "all":
+        geo_near["query"] = {"cuisine": cuisine}
+
+    pipeline = [{"$geoNear": geo_near}, {"$limit": limit}, {"$project": {**SUMMARY_PROJECTION, "distance": 1}}]
+    restaurants = await db.restaurants.aggregate(pipeline).to_list(limit)
+    return FastJSONResponse(api_documents(restaurants, NearbyRestaurant))
+
+@api_router.get("/restaurants/within", response_model=List[RestaurantSummary])
+async def get_restaurants_within(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    limit: int = Query(200, ge=1, le=1000),
+    cuisine: Optional[str] = None,
+):
+    """Get restaurants inside a map viewport given by its south-west and north-east corners"""
+    if south >= north or west >= east:
+        raise HTTPException(status_code=400, detail="Invalid bounding box")
+
+    query = {"location": {"$geoWithin": {"$geometry": viewport_polygon(south, west, north, east)}}}
+    if cuisine and cuisine != "all":
+        query["cuisine"] = cuisine
+
+    restaurants = await db.restaurants.find(query, SUMMARY_PROJECTION).to_list(limit)
+    return FastJSONResponse(api_documents(restaurants, RestaurantSummary))
 
 @api_router.get("/restaurants/{restaurant_id}", response_model=Restaurant)
-async def get_restaurant(restaurant_id: str):
+async def get_restaurant(request: Request, restaurant_id: str):
     """Get single restaurant by ID"""
-    try:
-        restaurant = await db.restaurants.find_one({"_id": ObjectId(restaurant_id)})
+    if not ObjectId.is_valid(restaurant_id):
+        raise HTTPException(status_code=400, detail="Invalid restaurant ID")
+
+    async def render():
+        restaurant = await load_restaurant(restaurant_id)
         if not restaurant:
-            raise HTTPException(status_code=404, detail="Restaurant not found")
-        return Restaurant(id=str(restaurant["_id"]), **{k: v for k, v in restaurant.items() if k != "_id"})
-    except:
+            return None
+        return CachedResponse(serialize(api_document(restaurant, Restaurant)))
+
+    cached = await catalog_cache.get_or_load(("restaurant-body", restaurant_id), render)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return catalog_response(request, cached)
+
+@api_router.get("/restaurants/{restaurant_id}/menu", response_model=List[MenuCategory])
+async def get_restaurant_menu(request: Request, restaurant_id: str, category: Optional[str] = None):
+    """Get a restaurant's menu, optionally only one category"""
+    if not ObjectId.is_valid(restaurant_id):
         raise HTTPException(status_code=400, detail="Invalid restaurant ID")
 
+    async def render():
+        projection = {"_id": 0, "menu": {"$elemMatch": {"category": category}} if category else 1}
+        restaurant = await db.restaurants.find_one({"_id": ObjectId(restaurant_id)}, projection)
+        if restaurant is None:
+            return None
+        return CachedResponse(serialize([fill_defaults(c, MenuCategory) for c in restaurant.get("menu", [])]))
+
+    cached = await catalog_cache.get_or_load(("menu", restaurant_id, category), render)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return catalog_response(request, cached)
+
+async def idempotent(kind: str, key: Optional[str], request: BaseModel, create):
+    """Run ``create`` once per Idempotency-Key and replay its response (errors below 500 included) to retries"""
+    if key is None:
+        return await create()
+    if not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+
+    async def run() -> StoredResponse:
+        try:
+            result = await create()
+        except HTTPException as e:
+            if e.status_code >= 500:
+                raise
+            return StoredResponse(e.status_code, dumps({"detail": e.detail}))
+        return StoredResponse(200, dumps(result))
+
+    try:
+        stored, replayed = await idempotency_store.execute(kind, key, content_hash(request.model_dump(mode="json")), run)
+    except KeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    except KeyInProgress:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress", headers={"Retry-After": "1"})
+    return Response(
+        stored.body, status_code=stored.status_code, media_type="application/json",
+        headers={"Idempotent-Replayed": "true"} if replayed else None,
+    )
+
 # ORDERS
 @api_router.post("/orders", response_model=Order)
-async def create_order(order: OrderCreate):
-    """Create a new order"""
+async def create_order(order: OrderCreate, idempotency_key: Optional[str] = Header(None)):
+    """Create a new order; retries with the same Idempotency-Key get the first response"""
+    return await idempotent("order", idempotency_key, order, lambda: insert_order(order))
+
+async def insert_order(order: OrderCreate) -> Order:
     order_dict = order.dict()
     order_obj = Order(**order_dict)
-    result = await db.orders.insert_one(order_obj.dict(exclude={"id"}))
-    order_obj.id = str(result.inserted_id)
+    doc = order_obj.dict(exclude={"id"})
+    inserted_id = await insert_document(db.orders, order_writer, doc)
+    await rollup_writer.record([doc])
+    order_obj.id = str(inserted_id)
     return order_obj
 
+@api_router.post("/orders/batch", response_model=BatchOrderResponse)
+async def create_orders_batch(orders: List[Any] = Body(...)):
+    """Create many orders in one unordered bulk insert (kiosk / offline replay).
+
+    Each order is validated on its own; invalid or failed orders are reported
+    per item without affecting the others.
+    """
+    if len(orders) > MAX_ORDER_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_ORDER_BATCH} orders per batch")
+
+    results = [BatchOrderResult(index=i, status="created") for i in range(len(orders))]
+    docs, positions = [], []
+    for i, raw in enumerate(orders):
+        try:
+            order_obj = Order(**OrderCreate.model_validate(raw).dict())
+        except ValidationError as e:
+            results[i].status = "invalid"
+            results[i].errors = [
+                f"{'.'.join(map(str, err['loc']))}: {err['msg']}" if err["loc"] else err["msg"] for err in e.errors()
+            ]
+            continue
+        # Ids are assigned up front so they are known even when part of the batch fails
+        docs.append({"_id": ObjectId(), **order_obj.dict(exclude={"id"})})
+        positions.append(i)
+
+    if docs:
+        failed = {}
+        try:
+            await db.orders.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {err["index"]: err.get("errmsg", "write failed") for err in e.details.get("writeErrors", [])}
+        for n, (doc, i) in enumerate(zip(docs, positions)):
+            if n in failed:
+                results[i].status = "failed"
+                results[i].errors = [failed[n]]
+            else:
+                results[i].id = str(doc["_id"])
+        await rollup_writer.record(doc for n, doc in enumerate(docs) if n not in failed)
+
+    created = sum(r.status == "created" for r in results)
+    return BatchOrderResponse(created=created, failed=len(results) - created, results=results)
+
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders():
-    """Get all orders"""
-    orders = await db.orders.find().sort("createdAt", -1).to_list(100)
-    return [Order(id=str(o["_id"]), **{k: v for k, v in o.items() if k != "_id"}) for o in orders]
+async def get_orders(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Get orders newest first; the next page's cursor is returned in X-Next-Cursor"""
+    try:
+        query = keyset_filter(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    orders = await db.orders.find(query, ORDER_PROJECTION).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    next_page = next_cursor(orders, limit)
+    headers = {"X-Next-Cursor": next_page} if next_page else None
+    return FastJSONResponse(api_documents(orders, Order), headers=headers)
 
 @api_router.get("/orders/{order_id}", response_model=Order)
 async def get_order(order_id: str):
     """Get single order by ID"""
-    try:
-        order = await db.orders.find_one({"_id": ObjectId(order_id)})
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
-        return Order(id=str(order["_id"]), **{k: v for k, v in order.items() if k != "_id"})
-    except:
+    if not ObjectId.is_valid(order_id):
         raise HTTPException(status_code=400, detail="Invalid order ID")
+    order = await db.orders.find_one({"_id": ObjectId(order_id)}, ORDER_PROJECTION)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return FastJSONResponse(api_document(order, Order))
+
+async def update_status(collection, kind: str, doc_id: str, status: str, allowed, projection: dict) -> dict:
+    """Move a document to ``status`` unless it is already final; returns it as it was before.
+
+    Publishes the change as a ``<kind>.status`` event on the ``<kind>:<id>`` topic.
+    """
+    if not ObjectId.is_valid(doc_id):
+        raise HTTPException(status_code=400, detail=f"Invalid {kind} ID")
+    if status not in allowed:
+        raise HTTPException(status_code=400, detail=f"Status must be one of: {', '.join(allowed)}")
+    updated_at = datetime.utcnow()
+    before = await collection.find_one_and_update(
+        {"_id": ObjectId(doc_id), "status": {"$nin": FINAL_STATUSES}},
+        {"$set": {"status": status, "updatedAt": updated_at}},
+        {**projection, "status": 1},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        current = await collection.find_one({"_id": ObjectId(doc_id)}, {"status": 1})
+        if current is None:
+            raise HTTPException(status_code=404, detail=f"{kind.capitalize()} not found")
+        raise HTTPException(status_code=409, detail=f"{kind.capitalize()} is already {current['status']}")
+    event_hub.publish(f"{kind}:{doc_id}", f"{kind}.status", {
+        "id": doc_id, "status": status, "previousStatus": before["status"], "updatedAt": updated_at,
+    })
+    return before
+
+@api_router.patch("/orders/{order_id}/status")
+async def update_order_status(order_id: str, update: StatusUpdate):
+    """Change an order's status and notify its subscribers"""
+    before = await update_status(db.orders, "order", order_id, update.status, ORDER_STATUSES, {})
+    return {"id": order_id, "status": update.status, "previousStatus": before["status"]}
 
 # RESERVATIONS
-@api_router.post("/reservations", response_model=Reservation)
-async def create_reservation(reservation: ReservationCreate):
-    """Create a new table reservation"""
+@api_router.post("/reservations", response_model=Reservation, responses={409: {"description": "Tables already booked"}})
+async def create_reservation(reservation: ReservationCreate, idempotency_key: Optional[str] = Header(None)):
+    """Create a new table reservation.
+
+    The selected tables are claimed atomically for the interval; a conflicting
+    booking gets 409 with alternative tables and times. Retries with the same
+    Idempotency-Key get the first response.
+    """
+    return await idempotent("reservation", idempotency_key, reservation, lambda: book_reservation(reservation))
+
+async def book_reservation(reservation: ReservationCreate) -> Reservation:
     reservation_dict = reservation.dict()
     # Generate mock QR code data
     reservation_dict["qrCode"] = f"RESERVATION-{datetime.utcnow().timestamp()}"
     reservation_obj = Reservation(**reservation_dict)
-    result = await db.reservations.insert_one(reservation_obj.dict(exclude={"id"}))
-    reservation_obj.id = str(result.inserted_id)
+    tables = reservation_tables(reservation_dict)
+    # Only tables of the restaurant's floor plan that are in service can be booked
+    plan = await restaurant_floor_plan(reservation_obj.restaurantId)
+    bookable = {t["tableNumber"] for t in plan.tables if t["available"]}
+    unbookable = sorted(set(tables) - bookable)
+    if unbookable:
+        raise HTTPException(status_code=400, detail=f"Tables not available for booking: {', '.join(unbookable)}")
+    reservation_id = ObjectId()
+
+    try:
+        await claim_tables(
+            db.table_claims, reservation_id, reservation_obj.restaurantId, reservation_obj.date,
+            tables, reservation_obj.time, reservation_obj.duration,
+        )
+    except TableConflict as conflict:
+        # Our cached schedule missed the competing booking: reload it for the suggestions
+        availability.invalidate_booking(
+            reservation_obj.restaurantId, reservation_obj.date, reservation_obj.time, reservation_obj.duration,
+        )
+        raise HTTPException(status_code=409, detail={
+            "message": str(conflict),
+            "conflictingTables": conflict.tables,
+            **await booking_alternatives(reservation_obj, tables),
+        })
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid reservation time or duration")
+
+    try:
+        await insert_document(
+            db.reservations, reservation_writer, {"_id": reservation_id, **reservation_obj.dict(exclude={"id"})},
+        )
+    except Exception:
+        await release_claims(db.table_claims, reservation_id)
+        raise
+    reservation_obj.id = str(reservation_id)
+    if tables:
+        availability.record(
+            reservation_obj.restaurantId, reservation_obj.date, reservation_obj.time,
+            reservation_obj.duration, tables,
+        )
     return reservation_obj
 
+async def booking_alternatives(reservation: Reservation, tables: List[str], max_times: int = 3) -> dict:
+    """Free tables at the requested time, and nearby times when the requested tables are free"""
+    layout = (await restaurant_floor_plan(reservation.restaurantId)).tables
+    free = await availability.free_tables(
+        reservation.restaurantId, reservation.date, reservation.time, reservation.duration,
+        [t["tableNumber"] for t in layout],
+    )
+    alternative_tables = sorted(
+        (
+            {"tableNumber": t["tableNumber"], "capacity": t["capacity"]}
+            for t in layout if t["available"] and t["tableNumber"] in free
+        ),
+        key=lambda t: (t["capacity"] < reservation.people, abs(t["capacity"] - reservation.people)),
+    )
+
+    alternative_times = []
+    start = parse_time(reservation.time)
+    for offset in sorted(range(-90, 91, 15), key=lambda m: (abs(m), m)):
+        minutes = start + offset
+        if offset == 0 or not 0 <= minutes < 24 * 60:
+            continue
+        candidate = f"{minutes // 60:02d}:{minutes % 60:02d}"
+        free_then = await availability.free_tables(
+            reservation.restaurantId, reservation.date, candidate, reservation.duration, tables,
+        )
+        if len(free_then) == len(set(tables)):
+            alternative_times.append(candidate)
+            if len(alternative_times) == max_times:
+                break
+
+    return {"alternativeTables": alternative_tables, "alternativeTimes": alternative_times}
+
 @api_router.get("/reservations", response_model=List[Reservation])
-async def get_reservations():
-    """Get all reservations"""
-    reservations = await db.reservations.find().sort("createdAt", -1).to_list(100)
-    return [Reservation(id=str(r["_id"]), **{k: v for k, v in r.items() if k != "_id"}) for r in reservations]
+async def get_reservations(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Get reservations newest first; the next page's cursor is returned in X-Next-Cursor"""
+    try:
+        query = keyset_filter(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    reservations = await db.reservations.find(query, RESERVATION_PROJECTION).sort(KEYSET_SORT).limit(limit + 1).to_list(limit + 1)
+    next_page = next_cursor(reservations, limit)
+    headers = {"X-Next-Cursor": next_page} if next_page else None
+    return FastJSONResponse(api_documents(reservations, Reservation), headers=headers)
 
 @api_router.get("/reservations/{reservation_id}", response_model=Reservation)
 async def get_reservation(reservation_id: str):
     """Get single reservation by ID"""
-    try:
-        reservation = await db.reservations.find_one({"_id": ObjectId(reservation_id)})
-        if not reservation:
-            raise HTTPException(status_code=404, detail="Reservation not found")
-        return Reservation(id=str(reservation["_id"]), **{k: v for k, v in reservation.items() if k != "_id"})
-    except:
+    if not ObjectId.is_valid(reservation_id):
         raise HTTPException(status_code=400, detail="Invalid reservation ID")
+    reservation = await db.reservations.find_one({"_id": ObjectId(reservation_id)}, RESERVATION_PROJECTION)
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+    return FastJSONResponse(api_document(reservation, Reservation))
+
+@api_router.patch("/reservations/{reservation_id}/status")
+async def update_reservation_status(reservation_id: str, update: StatusUpdate):
+    """Change a reservation's status and notify its subscribers; cancelling frees its tables"""
+    before = await update_status(
+        db.reservations, "reservation", reservation_id, update.status, RESERVATION_STATUSES,
+        {"restaurantId": 1, "date": 1, "time": 1, "duration": 1},
+    )
+    if update.status == "cancelled":
+        await release_claims(db.table_claims, ObjectId(reservation_id))
+        availability.invalidate_booking(before["restaurantId"], before["date"], before["time"], before["duration"])
+    return {"id": reservation_id, "status": update.status, "previousStatus": before["status"]}
+
+async def restaurant_floor_plan(restaurant_id: str) -> FloorPlan:
+    """The restaurant's stored floor plan: 400 for an invalid ID, 404 for a restaurant without one"""
+    if not ObjectId.is_valid(restaurant_id):
+        raise HTTPException(status_code=400, detail="Invalid restaurant ID")
+    plan = await floor_plan_store.fetch(db.floor_plans, restaurant_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Floor plan not found")
+    return plan
 
 @api_router.get("/restaurants/{restaurant_id}/floor-plan")
-async def get_floor_plan(restaurant_id: str):
-    """Get restaurant floor plan with table layout"""
-    # Different floor plans for different restaurants
-    floor_plans = {
-        "bella_italia": [
-            {"tableNumber": "T1", "capacity": 2, "x": 15, "y": 15, "available": True},
-            {"tableNumber": "T2", "capacity": 2, "x": 15, "y": 50, "available": True},
-            {"tableNumber": "T3", "capacity": 4, "x": 55, "y": 15, "available": True},
-            {"tableNumber": "T4", "capacity": 4, "x": 55, "y": 50, "available": True},
-            {"tableNumber": "T5", "capacity": 6, "x": 15, "y": 85, "available": True},
-            {"tableNumber": "T6", "capacity": 6, "x": 55, "y": 85, "available": False},  # One unavailable
-            {"tableNumber": "T7", "capacity": 8, "x": 35, "y": 120, "available": True},
-        ],
-        "sushi_master": [
-            {"tableNumber": "S1", "capacity": 2, "x": 20, "y": 20, "available": True},
-            {"tableNumber": "S2", "capacity": 2, "x": 20, "y": 55, "available": True},
-            {"tableNumber": "S3", "capacity": 4, "x": 60, "y": 20, "available": True},
-            {"tableNumber": "S4", "capacity": 4, "x": 60, "y": 55, "available": True},
-            {"tableNumber": "S5", "capacity": 6, "x": 20, "y": 90, "available": True},
-            {"tableNumber": "S6", "capacity": 8, "x": 60, "y": 90, "available": True},
-            {"tableNumber": "Bar", "capacity": 10, "x": 40, "y": 125, "available": True},
-        ],
-        "burger_junction": [
-            {"tableNumber": "B1", "capacity": 2, "x": 25, "y": 25, "available": True},
-            {"tableNumber": "B2", "capacity": 2, "x": 65, "y": 25, "available": True},
-            {"tableNumber": "B3", "capacity": 4, "x": 25, "y": 60, "available": True},
-            {"tableNumber": "B4", "capacity": 4, "x": 65, "y": 60, "available": True},
-            {"tableNumber": "B5", "capacity": 6, "x": 25, "y": 95, "available": True},
-            {"tableNumber": "B6", "capacity": 6, "x": 65, "y": 95, "available": True},
-            {"tableNumber": "B7", "capacity": 8, "x": 45, "y": 130, "available": False},  # One unavailable
-        ],
-        "green_bowl": [
-            {"tableNumber": "G1", "capacity": 2, "x": 18, "y": 18, "available": True},
-            {"tableNumber": "G2", "capacity": 2, "x": 18, "y": 48, "available": True},
-            {"tableNumber": "G3", "capacity": 4, "x": 58, "y": 18, "available": True},
-            {"tableNumber": "G4", "capacity": 4, "x": 58, "y": 48, "available": True},
-            {"tableNumber": "G5", "capacity": 6, "x": 18, "y": 78, "available": True},
-            {"tableNumber": "G6", "capacity": 6, "x": 58, "y": 78, "available": True},
-            {"tableNumber": "Patio", "capacity": 8, "x": 38, "y": 108, "available": True},
-            {"tableNumber": "G8", "capacity": 2, "x": 38, "y": 138, "available": True},
-        ],
+async def get_floor_plan(
+    request: Request,
+    restaurant_id: str,
+    date: Optional[str] = None,
+    time: Optional[str] = None,
+    duration: int = Query(60, gt=0, le=720),
+):
+    """Get restaurant floor plan with table layout.
+
+    With date (YYYY-MM-DD) and time (HH:MM), each table's availability reflects
+    the existing reservations for that interval.
+    """
+    plan = await restaurant_floor_plan(restaurant_id)
+    if not (date and time):
+        return catalog_response(request, plan.response)
+
+    try:
+        date, time = normalize_date(date), normalize_time(time)
+        free = await availability.free_tables(restaurant_id, date, time, duration, [t["tableNumber"] for t in plan.tables])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date or time")
+    return {
+        "restaurantId": restaurant_id,
+        "version": plan.version,
+        "rooms": plan.rooms,
+        "date": date,
+        "time": time,
+        "duration": duration,
+        "tables": [{**t, "available": t["available"] and t["tableNumber"] in free} for t in plan.tables],
     }
-    
-    # Get restaurant to determine which floor plan
+
+@api_router.post("/restaurants/{restaurant_id}/table-suggestions")
+async def get_table_suggestions(restaurant_id: str, request: TableSuggestionRequest):
+    """Best-fit sets of free tables for a party: fewest wasted seats, then fewest and closest tables"""
+    plan = await restaurant_floor_plan(restaurant_id)
     try:
-        restaurant = await db.restaurants.find_one({"_id": ObjectId(restaurant_id)})
-        if not restaurant:
-            # Default floor plan
-            tables = floor_plans.get("bella_italia", [])
-        else:
-            restaurant_name = restaurant.get("name", "").lower().replace(" ", "_")
-            if "bella" in restaurant_name or "italia" in restaurant_name:
-                tables = floor_plans["bella_italia"]
-            elif "sushi" in restaurant_name:
-                tables = floor_plans["sushi_master"]
-            elif "burger" in restaurant_name:
-                tables = floor_plans["burger_junction"]
-            elif "green" in restaurant_name or "bowl" in restaurant_name:
-                tables = floor_plans["green_bowl"]
-            else:
-                tables = floor_plans["bella_italia"]
-    except:
-        tables = floor_plans["bella_italia"]
-    
-    return {"restaurantId": restaurant_id, "tables": tables}
+        free = await availability.free_tables(
+            restaurant_id, request.date, request.time, request.duration, [t["tableNumber"] for t in plan.tables],
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid time")
+    tables = [t for t in plan.tables if t["available"] and t["tableNumber"] in free]
+    return {
+        "restaurantId": restaurant_id,
+        "people": request.people,
+        "suggestions": suggest_tables(tables, request.people, k=request.limit),
+    }
+
+@api_router.put("/restaurants/{restaurant_id}/floor-plan")
+async def update_floor_plan(restaurant_id: str, update: FloorPlanUpdate):
+    """Store a restaurant's floor plan; pass the current version to avoid overwriting concurrent edits"""
+    if not ObjectId.is_valid(restaurant_id):
+        raise HTTPException(status_code=400, detail="Invalid restaurant ID")
+    rooms = [room.dict() for room in update.rooms]
+    try:
+        validate_rooms(rooms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if await load_restaurant(restaurant_id) is None:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+
+    query = {"_id": restaurant_id}
+    if update.version is not None:
+        query["version"] = update.version
+    try:
+        doc = await db.floor_plans.find_one_and_update(
+            query,
+            {
+                "$set": {"restaurantId": restaurant_id, "rooms": rooms, "source": "custom", "updatedAt": datetime.utcnow()},
+                "$inc": {"version": 1},
+            },
+            upsert=update.version is None,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        doc = None
+    if doc is None:
+        raise HTTPException(status_code=409, detail="Floor plan was modified concurrently")
+    plan = floor_plan_store.put(doc)
+    return Response(content=plan.response.body, media_type="application/json")
+
+# EVENTS
+@api_router.get("/events")
+async def subscribe_events(
+    request: Request,
+    orders: Optional[str] = None,
+    reservations: Optional[str] = None,
+    last_event_id: Optional[str] = Query(None, alias="lastEventId"),
+):
+    """Server-Sent Events stream of status changes for comma-separated order and reservation ids.
+
+    Reconnecting with Last-Event-ID (or lastEventId) replays missed events;
+    a ``reset`` event means they are gone and the client should refetch.
+    """
+    topics = [f"order:{i.strip()}" for i in (orders or "").split(",") if i.strip()]
+    topics += [f"reservation:{i.strip()}" for i in (reservations or "").split(",") if i.strip()]
+    if not topics:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one order or reservation")
+    if len(topics) > MAX_TOPICS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TOPICS} orders and reservations per stream")
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    return StreamingResponse(
+        event_hub.stream(topics, resume_from),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ANALYTICS
+@api_router.get("/analytics/restaurants/{restaurant_id}")
+async def get_restaurant_analytics(
+    restaurant_id: str,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+):
+    """Orders, revenue and items per day and order type over [from, to] (UTC days, default the last 30)"""
+    date_to = date_to or datetime.utcnow().date()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_RANGE_DAYS} days per request")
+    buckets = await db.order_rollups.find(
+        {"restaurantId": restaurant_id, "day": {"$gte": date_from.isoformat(), "$lte": date_to.isoformat()}},
+        {"_id": 0},
+    ).to_list(None)
+    return {"restaurantId": restaurant_id, **summarize(buckets, date_from, date_to)}
+
+@api_router.post("/admin/rollups/backfill")
+async def backfill_order_rollups(since: Optional[date] = None, until: Optional[date] = None):
+    """Rebuild the order rollups of the days in [since, until) (all history by default) from the orders"""
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    await rollup_writer.flush()
+    buckets = await backfill_rollups(db.orders, db.order_rollups, since, until)
+    return {"buckets": buckets}
+
+# MEDIA
+@api_router.get("/media/{digest}", responses={206: {"description": "Partial content"}, 416: {"description": "Range not satisfiable"}})
+async def get_media(
+    request: Request,
+    digest: str,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Serve the smallest stored width at least this wide"),
+):
+    """Serve a stored image or one of its thumbnails; immutable, so cacheable for a year, with Range support"""
+    record = await media_store.get(digest) if DIGEST.fullmatch(digest) else None
+    if record is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    record = await media_store.variant(record, w)
+    etag = f'"{record.digest}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable", "Accept-Ranges": "bytes"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    # If-Range: a client resuming a download of other bytes gets the whole body
+    if request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers.get("range"), record.length)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{record.length}"})
+    start, end = byte_range or (0, record.length)
+    headers["Content-Length"] = str(end - start)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{record.length}"
+    return StreamingResponse(
+        media_store.read(record, start, end), status_code=206 if byte_range else 200,
+        media_type=record.content_type, headers=headers,
+    )
+
+@api_router.post("/admin/media/externalize")
+async def externalize_media():
+    """Move inline images of restaurants (e.g. after a bulk import) into the media store"""
+    return await externalize_inline_media()
+
+# EXPORT
+def export_response(
+    name: str, projection: dict, columns, fmt: str, since: Optional[datetime], until: Optional[datetime], batch_size: int
+) -> StreamingResponse:
+    # Mixed bounds (one with a timezone, one without) cannot be compared as given
+    since, until = naive_utc(since), naive_utc(until)
+    if since and until and since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    chunks = export_chunks(db[name], export_filter(since, until), projection, fmt, columns, batch_size)
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+@api_router.get("/export/orders")
+async def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH, alias="batchSize", ge=1, le=MAX_EXPORT_BATCH),
+):
+    """Stream every order created in [since, until), oldest first, as NDJSON or CSV"""
+    return export_response("orders", ORDER_PROJECTION, ORDER_COLUMNS, format, since, until, batch_size)
+
+@api_router.get("/export/reservations")
+async def export_reservations(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH, alias="batchSize", ge=1, le=MAX_EXPORT_BATCH),
+):
+    """Stream every reservation created in [since, until), oldest first, as NDJSON or CSV"""
+    return export_response("reservations", RESERVATION_PROJECTION, RESERVATION_COLUMNS, format, since, until, batch_size)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Compresses everything not already served precompressed from the catalog cache
+app.add_middleware(CompressionMiddleware)
+
+# Order and reservation writes are admitted first, catalog browsing and bulk reads last;
+# other routes are "normal". Inside CORS, so shed requests still carry CORS headers.
+ROUTE_PRIORITIES = {
+    "POST /api/orders": CRITICAL,
+    "POST /api/orders/batch": CRITICAL,
+    "PATCH /api/orders/{order_id}/status": CRITICAL,
+    "POST /api/reservations": CRITICAL,
+    "PATCH /api/reservations/{reservation_id}/status": CRITICAL,
+    "GET /api/restaurants": LOW,
+    "GET /api/restaurants/nearby": LOW,
+    "GET /api/restaurants/within": LOW,
+    "GET /api/restaurants/{restaurant_id}": LOW,
+    "GET /api/restaurants/{restaurant_id}/menu": LOW,
+    "GET /api/restaurants/{restaurant_id}/floor-plan": LOW,
+    "POST /api/restaurants/{restaurant_id}/table-suggestions": LOW,
+    "GET /api/analytics/restaurants/{restaurant_id}": LOW,
+    "GET /api/export/orders": LOW,
+    "GET /api/export/reservations": LOW,
+    "POST /api/admin/rollups/backfill": LOW,
+    "GET /api/media/{digest}": LOW,
+    "POST /api/admin/media/externalize": LOW,
+    "GET /api/events": EXEMPT,
+    "GET /api/metrics": EXEMPT,
+    "GET /api/admin/admission": EXEMPT,
+}
+app.add_middleware(
+    AdmissionMiddleware,
+    router=app.router,
+    controller=admission,
+    rate_limiter=rate_limiter,
+    priorities=ROUTE_PRIORITIES,
+    # A menu page loads every item's image at once; they are immutable and cached by clients
+    unmetered={"GET /api/metrics", "GET /api/media/{digest}"},
+    client_header=RATE_LIMIT_CLIENT_HEADER,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After", "Idempotent-Replayed", "Content-Range"],
 )
 
+# Outermost, so request latency includes every other middleware
+app.add_middleware(MetricsMiddleware, router=app.router)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -498,4 +1410,11 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    for writer in (order_writer, reservation_writer):
+        if writer is not None:
+            await writer.flush()
+    if rollup_writer is not None:
+        await rollup_writer.flush()
     client.close()
@@ -0,0 +1,247 @@
+"""Slow Mongo command log with on-demand explain plans.
+
+``SlowQueryListener`` is a pymongo command listener. A sampled command
+that runs longer than the threshold is recorded in a bounded ring buffer,
+together with:
+
+* its shape: filter, sort and pipeline with every literal replaced by
+  ``"?"``, so records group by query pattern and carry no customer data;
+* its duration and the number of documents it returned;
+* for commands that accept explain (find, aggregate, updates, ...), the
+  command itself, minus session and cluster metadata, kept in memory only so
+  that ``explain`` can be run later and never returned by ``records``.
+  Documents examined are only known from the plan's execution stats.
+
+Other commands (inserts, GridFS chunk writes) are recorded by shape only:
+their documents are never kept.
+
+Commands that are not sampled cost a single ``random()`` in ``started``.
+Sampled ones cost a dict insert and a dict pop. Only slow ones are copied
+and shaped.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from bson import json_util
+from pymongo import monitoring
+
+DEFAULT_THRESHOLD_MS = 100.0
+DEFAULT_CAPACITY = 200
+
+# Commands that accept explain, and where their filter-like parts live
+SHAPE_FIELDS = {
+    "find": ("filter", "sort", "projection"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("key", "query"),
+    "findAndModify": ("query", "sort"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+EXPLAINABLE = frozenset(SHAPE_FIELDS)
+IGNORED = frozenset({"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "explain"})
+# Session, transaction and cluster metadata the driver adds to each command
+METADATA_FIELDS = frozenset({"lsid", "txnNumber", "autocommit", "startTransaction", "stmtId"})
+
+
+def query_shape(value: Any) -> Any:
+    """``value`` with literals replaced by "?", keeping field names and operators."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return "?"
+    return "?"
+
+
+def command_shape(command_name: str, command: dict) -> dict:
+    shape = {}
+    for field in SHAPE_FIELDS.get(command_name, ()):
+        if field not in command:
+            continue
+        if field in ("updates", "deletes"):
+            shape["q"] = [query_shape(statement.get("q", {})) for statement in command[field]]
+        elif field == "key":
+            shape["key"] = command[field]
+        else:
+            shape[field] = query_shape(command[field])
+    return shape
+
+
+def documents_returned(command_name: str, reply: dict) -> Optional[int]:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+        if batch is not None:
+            return len(batch)
+    if command_name == "distinct" and "values" in reply:
+        return len(reply["values"])
+    if "n" in reply:
+        return reply["n"]
+    return None
+
+
+def _collection(command_name: str, command: dict) -> str:
+    target = command.get("collection") if command_name == "getMore" else command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+def _replayable(command: dict) -> dict:
+    return {k: v for k, v in command.items() if not k.startswith("$") and k not in METADATA_FIELDS}
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Records sampled commands slower than ``threshold_ms`` into a ring buffer."""
+
+    def __init__(self, threshold_ms: float = DEFAULT_THRESHOLD_MS, sample_rate: float = 1.0,
+                 capacity: int = DEFAULT_CAPACITY):
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self._started: Dict[tuple, tuple] = {}
+        self._records: Deque[dict] = deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.sampled = 0
+        self.recorded = 0
+
+    def started(self, event) -> None:
+        if event.command_name in IGNORED:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.sampled += 1
+        self._started[(event.connection_id, event.request_id)] = (event.database_name, event.command)
+
+    def succeeded(self, event) -> None:
+        self._finish(event, reply=event.reply)
+
+    def failed(self, event) -> None:
+        self._finish(event, error=event.failure)
+
+    def _finish(self, event, reply: Optional[dict] = None, error: Optional[dict] = None) -> None:
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+        database, command = started
+        name = event.command_name
+        record = {
+            "id": next(self._ids),
+            "at": time.time(),
+            "database": database,
+            "collection": _collection(name, command),
+            "command": name,
+            "durationMs": round(duration_ms, 3),
+            "shape": command_shape(name, command),
+            "docsReturned": documents_returned(name, reply) if reply is not None else None,
+            "error": error.get("errmsg") if error else None,
+            "explainable": name in EXPLAINABLE,
+            "explain": None,
+            # Inserts would keep whole batches (and image bytes) alive in the buffer
+            "_command": _replayable(command) if name in EXPLAINABLE else None,
+        }
+        with self._lock:
+            self._records.append(record)
+            self.recorded += 1
+
+    def records(self, limit: Optional[int] = None) -> List[dict]:
+        """Recorded slow commands, newest first, without the replayable command."""
+        with self._lock:
+            records = list(self._records)
+        records.reverse()
+        return [{k: v for k, v in r.items() if not k.startswith("_")} for r in records[:limit]]
+
+    def get(self, record_id: int) -> Optional[dict]:
+        with self._lock:
+            return next((r for r in self._records if r["id"] == record_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+    def stats(self) -> dict:
+        return {
+            "thresholdMs": self.threshold_ms,
+            "sampleRate": self.sample_rate,
+            "capacity": self._records.maxlen,
+            "sampled": self.sampled,
+            "recorded": self.recorded,
+            "buffered": len(self._records),
+        }
+
+
+def _find(document: Any, key: str) -> Optional[Any]:
+    """First value stored under ``key`` anywhere in a nested explain document."""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        values = document.values()
+    elif isinstance(document, list):
+        values = document
+    else:
+        return None
+    for value in values:
+        found = _find(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_stages(plan: Any, stages: List[str], indexes: List[str]) -> None:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        if "indexName" in plan:
+            indexes.append(plan["indexName"])
+        for key in ("inputStage", "inputStages", "queryPlan", "outerStage", "innerStage"):
+            if key in plan:
+                _plan_stages(plan[key], stages, indexes)
+    elif isinstance(plan, list):
+        for child in plan:
+            _plan_stages(child, stages, indexes)
+
+
+def summarize_explain(result: dict) -> dict:
+    """The parts of an ``explain`` (executionStats verbosity) that answer "why was this slow?"."""
+    winning_plan = _find(result, "winningPlan")
+    stages: List[str] = []
+    indexes: List[str] = []
+    _plan_stages(winning_plan, stages, indexes)
+    execution = _find(result, "executionStats") or {}
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "collectionScan": "COLLSCAN" in stages,
+        "docsExamined": execution.get("totalDocsExamined"),
+        "keysExamined": execution.get("totalKeysExamined"),
+        "docsReturned": execution.get("nReturned"),
+        "executionTimeMillis": execution.get("executionTimeMillis"),
+        # Extended JSON keeps MinKey/MaxKey bounds and the like serializable
+        "winningPlan": json.loads(json_util.dumps(winning_plan)) if winning_plan is not None else None,
+    }
+
+
+async def explain(client, listener: SlowQueryListener, record_id: int) -> Optional[dict]:
+    """Run explain for a recorded command (once; later calls reuse it). None if there is no such record.
+
+    Raises ValueError for commands that cannot be explained.
+    """
+    record = listener.get(record_id)
+    if record is None:
+        return None
+    if not record["explainable"]:
+        raise ValueError(f"{record['command']} commands cannot be explained")
+    if record["explain"] is None:
+        result = await client[record["database"]].command(
+            {"explain": record["_command"], "verbosity": "executionStats"}
+        )
+        record["explain"] = summarize_explain(result)
+    return record["explain"]
@@ -0,0 +1,390 @@
+"""Reproducible synthetic catalog and history for load tests and index tuning.
+
+Everything is derived from a seed: the same seed and counts always produce
+the same documents, ``_id``s included. The data is shaped like the demo data
+but at scale:
+
+* Restaurants are clustered around real city centres, with menus drawn from
+  per-cuisine dish pools and prices scaled by the price range.
+* Orders pick restaurants with a long-tailed popularity (a few restaurants
+  get most orders), dishes from the restaurant's own menu, and times with
+  lunch and dinner peaks over the last ``days`` days.
+* Every restaurant gets a stored floor plan, the same layout for all.
+* Reservations are spread over the same past window and a short future one.
+  Future bookings use non-overlapping sittings and come with their table
+  claims, so the booking and availability code sees a consistent schedule.
+
+Generators yield documents one at a time. Each section draws from its own
+random stream, so the output does not depend on how it is batched.
+"""
+import random
+import struct
+from bisect import bisect
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+from typing import Iterator, List, NamedTuple, Sequence, Tuple
+
+from bson import ObjectId
+
+from booking import claim_documents
+from floor_plans import FLOOR_PLAN_TEMPLATES
+
+# Layout of every generated restaurant
+FLOOR_PLAN_TEMPLATE = "bella-italia"
+
+# (city, latitude, longitude, spread in degrees, weight)
+CITIES = [
+    ("New York", 40.7306, -73.9866, 0.08, 10),
+    ("Los Angeles", 34.0522, -118.2437, 0.15, 7),
+    ("Chicago", 41.8781, -87.6298, 0.09, 5),
+    ("Houston", 29.7604, -95.3698, 0.12, 4),
+    ("Phoenix", 33.4484, -112.0740, 0.12, 3),
+    ("Philadelphia", 39.9526, -75.1652, 0.07, 3),
+    ("San Antonio", 29.4241, -98.4936, 0.10, 2),
+    ("San Diego", 32.7157, -117.1611, 0.09, 2),
+    ("Dallas", 32.7767, -96.7970, 0.11, 3),
+    ("San Francisco", 37.7749, -122.4194, 0.05, 4),
+    ("Seattle", 47.6062, -122.3321, 0.07, 3),
+    ("Boston", 42.3601, -71.0589, 0.06, 3),
+    ("Miami", 25.7617, -80.1918, 0.08, 3),
+    ("London", 51.5074, -0.1278, 0.10, 8),
+    ("Paris", 48.8566, 2.3522, 0.06, 6),
+    ("Berlin", 52.5200, 13.4050, 0.09, 4),
+    ("Madrid", 40.4168, -3.7038, 0.07, 3),
+    ("Rome", 41.9028, 12.4964, 0.06, 3),
+    ("Tokyo", 35.6762, 139.6503, 0.12, 8),
+    ("Singapore", 1.3521, 103.8198, 0.06, 3),
+    ("Sydney", -33.8688, 151.2093, 0.10, 3),
+    ("Toronto", 43.6532, -79.3832, 0.08, 3),
+    ("Mexico City", 19.4326, -99.1332, 0.10, 4),
+    ("Sao Paulo", -23.5505, -46.6333, 0.12, 4),
+    ("Mumbai", 19.0760, 72.8777, 0.08, 5),
+]
+
+# cuisine -> category -> [(dish, description, base price)]
+CUISINES = {
+    "Italian": {
+        "Antipasti": [("Bruschetta", "Grilled bread with tomatoes and basil", 8.5), ("Arancini", "Fried risotto balls", 9.0),
+                      ("Caprese Salad", "Mozzarella, tomatoes and basil", 10.5), ("Calamari Fritti", "Fried squid with lemon", 12.0)],
+        "Pasta": [("Spaghetti Carbonara", "Egg, pecorino and guanciale", 16.5), ("Penne Arrabbiata", "Spicy tomato and garlic", 14.0),
+                  ("Lasagna", "Beef ragu and bechamel", 17.0), ("Tagliatelle al Ragu", "Slow-cooked meat sauce", 16.0),
+                  ("Gnocchi Sorrentina", "Potato gnocchi, tomato and mozzarella", 15.0)],
+        "Pizza": [("Margherita", "Tomato, mozzarella and basil", 13.0), ("Diavola", "Spicy salami", 15.0),
+                  ("Quattro Formaggi", "Four cheeses", 16.5), ("Capricciosa", "Ham, mushrooms and artichokes", 16.0)],
+        "Dolci": [("Tiramisu", "Coffee and mascarpone", 7.5), ("Panna Cotta", "Vanilla cream", 6.5), ("Cannoli", "Ricotta-filled pastry", 6.0)],
+    },
+    "Japanese": {
+        "Starters": [("Edamame", "Salted soybeans", 5.0), ("Gyoza", "Pan-fried dumplings", 7.5), ("Miso Soup", "Tofu and wakame", 4.0)],
+        "Sushi": [("Salmon Nigiri", "Two pieces", 6.5), ("Tuna Roll", "Six pieces", 8.0), ("California Roll", "Crab, avocado, cucumber", 9.5),
+                  ("Dragon Roll", "Eel and avocado", 14.5), ("Chirashi", "Assorted sashimi on rice", 22.0)],
+        "Hot Dishes": [("Chicken Teriyaki", "With steamed rice", 15.0), ("Tonkotsu Ramen", "Pork broth, chashu, egg", 16.0),
+                       ("Katsu Curry", "Breaded pork and curry", 15.5), ("Tempura Udon", "Noodle soup with shrimp tempura", 14.5)],
+        "Desserts": [("Mochi Ice Cream", "Three pieces", 6.0), ("Matcha Cheesecake", "Green tea cheesecake", 7.0)],
+    },
+    "American": {
+        "Starters": [("Buffalo Wings", "Hot sauce and blue cheese", 11.0), ("Onion Rings", "Beer-battered", 6.5),
+                     ("Loaded Nachos", "Cheese, jalapenos, salsa", 10.5)],
+        "Burgers": [("Classic Burger", "Beef, lettuce, tomato", 13.0), ("Bacon Cheeseburger", "Cheddar and smoked bacon", 15.0),
+                    ("Veggie Burger", "Black bean patty", 13.5), ("Double Smash", "Two smashed patties", 16.0)],
+        "Mains": [("BBQ Ribs", "Half rack with slaw", 22.0), ("Fried Chicken", "Three pieces with fries", 16.5),
+                  ("Mac and Cheese", "Baked with breadcrumbs", 12.0)],
+        "Desserts": [("Apple Pie", "With vanilla ice cream", 7.0), ("Brownie Sundae", "Warm brownie and fudge", 8.0),
+                     ("Milkshake", "Chocolate, vanilla or strawberry", 6.5)],
+    },
+    "Mexican": {
+        "Antojitos": [("Guacamole", "With tortilla chips", 9.0), ("Elote", "Grilled corn, cotija, lime", 6.0), ("Queso Fundido", "Melted cheese and chorizo", 10.0)],
+        "Tacos": [("Al Pastor", "Pork and pineapple", 4.5), ("Carne Asada", "Grilled steak", 5.0), ("Baja Fish", "Battered fish and cabbage", 5.0),
+                  ("Carnitas", "Slow-cooked pork", 4.5)],
+        "Platos": [("Chicken Enchiladas", "Salsa verde and crema", 15.0), ("Burrito", "Rice, beans and choice of meat", 13.0),
+                   ("Mole Poblano", "Chicken in mole sauce", 18.0)],
+        "Postres": [("Churros", "With chocolate sauce", 6.5), ("Flan", "Caramel custard", 6.0)],
+    },
+    "Indian": {
+        "Starters": [("Samosa", "Spiced potato pastry", 6.0), ("Onion Bhaji", "Chickpea-battered onions", 6.5), ("Paneer Tikka", "Grilled cheese skewers", 10.0)],
+        "Curries": [("Butter Chicken", "Creamy tomato sauce", 17.0), ("Lamb Rogan Josh", "Kashmiri chilli sauce", 19.0),
+                    ("Chana Masala", "Chickpeas in spiced gravy", 13.0), ("Palak Paneer", "Spinach and cottage cheese", 14.0)],
+        "Rice and Breads": [("Chicken Biryani", "Fragrant layered rice", 16.0), ("Garlic Naan", "Tandoor-baked", 3.5),
+                            ("Jeera Rice", "Cumin rice", 4.0)],
+        "Desserts": [("Gulab Jamun", "Milk dumplings in syrup", 5.5), ("Mango Lassi", "Yogurt drink", 4.5)],
+    },
+    "Chinese": {
+        "Dim Sum": [("Har Gow", "Shrimp dumplings", 7.0), ("Siu Mai", "Pork and shrimp dumplings", 7.0), ("Char Siu Bao", "BBQ pork buns", 6.5)],
+        "Mains": [("Kung Pao Chicken", "Peanuts and chillies", 15.0), ("Mapo Tofu", "Spicy Sichuan tofu", 13.0),
+                  ("Sweet and Sour Pork", "Pineapple and peppers", 15.5), ("Peking Duck", "Half duck with pancakes", 32.0)],
+        "Noodles and Rice": [("Dan Dan Noodles", "Spicy pork and sesame", 12.0), ("Yangzhou Fried Rice", "Shrimp, pork and egg", 11.0),
+                             ("Beef Chow Fun", "Wide rice noodles", 14.0)],
+    },
+    "Thai": {
+        "Starters": [("Spring Rolls", "Vegetable, with sweet chilli", 7.0), ("Satay", "Chicken skewers, peanut sauce", 9.0),
+                     ("Tom Yum", "Hot and sour shrimp soup", 8.5)],
+        "Mains": [("Pad Thai", "Rice noodles, tamarind, peanuts", 14.0), ("Green Curry", "Coconut and Thai basil", 15.0),
+                  ("Massaman Curry", "Beef and potato", 16.5), ("Pad Kra Pao", "Holy basil stir-fry with egg", 14.0)],
+        "Desserts": [("Mango Sticky Rice", "Coconut cream", 7.5)],
+    },
+    "French": {
+        "Entrees": [("French Onion Soup", "Gruyere crouton", 10.0), ("Escargots", "Garlic and parsley butter", 14.0),
+                    ("Pate de Campagne", "With cornichons", 12.0)],
+        "Plats": [("Steak Frites", "Entrecote and fries", 28.0), ("Coq au Vin", "Chicken braised in red wine", 24.0),
+                  ("Duck Confit", "With sarladaise potatoes", 26.0), ("Moules Frites", "Mussels in white wine", 22.0)],
+        "Desserts": [("Creme Brulee", "Vanilla custard", 9.0), ("Tarte Tatin", "Caramelised apple tart", 9.5)],
+    },
+    "Mediterranean": {
+        "Mezze": [("Hummus", "With warm pita", 7.0), ("Falafel", "Tahini sauce", 8.0), ("Tabbouleh", "Parsley and bulgur", 7.5),
+                  ("Halloumi", "Grilled with honey", 9.5)],
+        "Grill": [("Chicken Shawarma", "With garlic sauce", 15.0), ("Lamb Kofta", "Spiced lamb skewers", 17.0),
+                  ("Grilled Sea Bass", "Lemon and herbs", 24.0)],
+        "Bowls": [("Quinoa Power Bowl", "Quinoa, avocado, vegetables", 13.5), ("Greek Salad", "Feta and olives", 11.0)],
+        "Desserts": [("Baklava", "Pistachio and honey", 6.0)],
+    },
+    "Korean": {
+        "Starters": [("Kimchi Pancake", "Crispy and savoury", 10.0), ("Mandu", "Pork dumplings", 8.0), ("Tteokbokki", "Spicy rice cakes", 9.5)],
+        "Mains": [("Bibimbap", "Rice, vegetables, egg, gochujang", 15.0), ("Bulgogi", "Marinated beef", 19.0),
+                  ("Korean Fried Chicken", "Soy garlic or spicy", 17.0), ("Kimchi Jjigae", "Kimchi and pork stew", 14.0)],
+        "Desserts": [("Bingsu", "Shaved ice with red bean", 9.0)],
+    },
+}
+CUISINE_NAMES = list(CUISINES)
+# Flattened dish pools: (category, name, description, base price)
+DISHES = {
+    cuisine: [(category, *dish) for category, dishes in categories.items() for dish in dishes]
+    for cuisine, categories in CUISINES.items()
+}
+
+NAME_FIRST = ["Golden", "Little", "Blue", "Red", "Urban", "Old Town", "Happy", "Lucky", "Green", "Royal", "Rustic",
+              "Silver", "Corner", "Harbor", "Sunset", "Garden", "Midnight", "Wild", "Copper", "Bright"]
+NAME_SECOND = {
+    "Italian": ["Trattoria", "Osteria", "Pizzeria", "Cucina", "Forno"],
+    "Japanese": ["Sushi Bar", "Izakaya", "Ramen House", "Kitchen", "Teahouse"],
+    "American": ["Diner", "Grill", "Burger Joint", "Smokehouse", "Tavern"],
+    "Mexican": ["Taqueria", "Cantina", "Cocina", "Taco Shop"],
+    "Indian": ["Tandoor", "Curry House", "Spice Kitchen", "Masala"],
+    "Chinese": ["Dumpling House", "Wok", "Noodle Bar", "Palace"],
+    "Thai": ["Thai Kitchen", "Noodle House", "Orchid", "Street Food"],
+    "French": ["Bistro", "Brasserie", "Cafe", "Table"],
+    "Mediterranean": ["Mezze", "Taverna", "Kitchen", "Grill"],
+    "Korean": ["BBQ", "Pocha", "Kitchen", "Chicken"],
+}
+STREETS = ["Main", "Oak", "Maple", "Park", "Market", "Church", "High", "Mill", "River", "Station", "King", "Queen",
+           "Elm", "Cedar", "Harbor", "Bridge", "Union", "Lake", "Hill", "Broad"]
+STREET_SUFFIXES = ["Street", "Avenue", "Road", "Boulevard", "Lane", "Place"]
+PRICE_RANGES = [("$", 0.7, 3), ("$$", 1.0, 5), ("$$$", 1.5, 2), ("$$$$", 2.3, 1)]
+LOGOS = [
+    "https://images.unsplash.com/photo-1517248135467-4c7edcad34c4?w=400",
+    "https://images.unsplash.com/photo-1579871494447-9811cf80d66c?w=400",
+    "https://images.unsplash.com/photo-1571091718767-18b5b1457add?w=400",
+    "https://images.unsplash.com/photo-1512621776951-a57141f2eefd?w=400",
+]
+
+ORDER_TYPES = (("delivery", 5), ("pickup", 3), ("dine-in", 2))
+# Share of a day's orders per hour of the day: lunch and dinner peaks
+HOURLY_WEIGHTS = [1, 0, 0, 0, 0, 0, 1, 2, 3, 3, 4, 8, 14, 12, 6, 4, 5, 8, 14, 16, 12, 7, 4, 2]
+# Future bookings use these non-overlapping sittings (no duration exceeds their spacing)
+SITTINGS = ("12:00", "14:00", "18:00", "20:00", "22:00")
+DURATIONS = (60, 90, 120)
+# Exponent of the restaurant popularity power law
+POPULARITY_SKEW = 0.9
+
+RESTAURANT, ORDER, RESERVATION = 1, 2, 3
+
+
+def synthetic_id(kind: int, seed: int, index: int, timestamp: datetime) -> ObjectId:
+    """Deterministic ObjectId: creation time, then kind, seed and index."""
+    return ObjectId(struct.pack(">IBxHI", int(timestamp.timestamp()), kind, seed & 0xFFFF, index))
+
+
+class Profile(NamedTuple):
+    """What orders and reservations need to know about a generated restaurant."""
+    id: str
+    name: str
+    cuisine: str
+    price_factor: float
+    # Indexes into the cuisine's dish pool
+    dishes: bytes
+
+
+def menu(profile: Profile) -> List[dict]:
+    categories = {}
+    for index in profile.dishes:
+        category, name, description, price = DISHES[profile.cuisine][index]
+        categories.setdefault(category, []).append({
+            "name": name, "description": description, "price": round(price * profile.price_factor, 2), "image": "",
+        })
+    return [{"category": category, "items": items} for category, items in categories.items()]
+
+
+def restaurants(count: int, seed: int, created: datetime) -> Iterator[Tuple[dict, Profile]]:
+    """Restaurant documents with their profiles."""
+    rng = random.Random(f"{seed}:restaurants")
+    city_weights = list(accumulate(city[4] for city in CITIES))
+    price_weights = list(accumulate(p[2] for p in PRICE_RANGES))
+    for i in range(count):
+        city, lat, lng, spread, _ = CITIES[bisect(city_weights, rng.random() * city_weights[-1])]
+        cuisine = rng.choice(CUISINE_NAMES)
+        price_range, factor, _ = PRICE_RANGES[bisect(price_weights, rng.random() * price_weights[-1])]
+        pool = DISHES[cuisine]
+        dishes = bytes(sorted(rng.sample(range(len(pool)), rng.randint(min(6, len(pool)), len(pool)))))
+        name = f"{rng.choice(NAME_FIRST)} {rng.choice(NAME_SECOND[cuisine])}"
+        latitude = round(max(-85.0, min(85.0, rng.gauss(lat, spread))), 6)
+        longitude = round(max(-180.0, min(180.0, rng.gauss(lng, spread))), 6)
+        opens, closes = rng.choice((7, 8, 10, 11, 11, 12)), rng.choice((9, 10, 10, 11, 11))
+        delivery = rng.choice((15, 20, 25, 30, 35, 40))
+        doc_id = synthetic_id(RESTAURANT, seed, i, created)
+        profile = Profile(str(doc_id), name, cuisine, round(factor * rng.uniform(0.85, 1.2), 3), dishes)
+        yield {
+            "_id": doc_id,
+            "name": name,
+            "logo": rng.choice(LOGOS),
+            "cuisine": cuisine,
+            "rating": round(min(5.0, max(1.0, rng.gauss(4.2, 0.45))), 1),
+            "priceRange": price_range,
+            "address": f"{rng.randint(1, 2999)} {rng.choice(STREETS)} {rng.choice(STREET_SUFFIXES)}",
+            "city": city,
+            "deliveryTime": f"{delivery}-{delivery + 10} min",
+            "latitude": latitude,
+            "longitude": longitude,
+            "openingHours": f"{opens}:00 AM - {closes}:00 PM",
+            "heroImage": "",
+            "menu": menu(profile),
+            # Seed and index keep slugs unique next to the demo data and other seeds
+            "slug": f"{name.lower().replace(' ', '-')}-{seed}-{i}",
+            "location": {"type": "Point", "coordinates": [longitude, latitude]},
+        }, profile
+
+
+def floor_plans(profiles: Sequence[Profile], created: datetime) -> Iterator[dict]:
+    """Floor plan documents of the generated restaurants, as the seeding of the demo ones stores them."""
+    rooms = FLOOR_PLAN_TEMPLATES[FLOOR_PLAN_TEMPLATE]
+    for profile in profiles:
+        yield {
+            "_id": profile.id, "restaurantId": profile.id, "rooms": rooms, "source": "seed",
+            "version": 1, "updatedAt": created,
+        }
+
+
+def popularity(count: int, seed: int) -> List[float]:
+    """Cumulative order weights of ``count`` restaurants: a shuffled power law."""
+    rng = random.Random(f"{seed}:popularity")
+    weights = [1 / (rank + 1) ** POPULARITY_SKEW for rank in range(count)]
+    rng.shuffle(weights)
+    return list(accumulate(weights))
+
+
+def _pick(rng: random.Random, cumulative: Sequence[float]) -> int:
+    return bisect(cumulative, rng.random() * cumulative[-1])
+
+
+def _moment(rng: random.Random, start: datetime, days: int, hours: Sequence[float]) -> datetime:
+    hour = _pick(rng, hours)
+    return start + timedelta(days=rng.randrange(days), hours=hour, seconds=rng.randrange(3600))
+
+
+def _items(rng: random.Random, profile: Profile, count: int) -> List[dict]:
+    pool = DISHES[profile.cuisine]
+    items = {}
+    for _ in range(count):
+        _, name, _, price = pool[rng.choice(profile.dishes)]
+        if name in items:
+            items[name]["quantity"] += 1
+        else:
+            items[name] = {"name": name, "price": round(price * profile.price_factor, 2), "quantity": 1, "image": ""}
+    return list(items.values())
+
+
+def orders(profiles: Sequence[Profile], count: int, seed: int, now: datetime, days: int) -> Iterator[dict]:
+    """Order documents over the last ``days`` days up to ``now`` (today included), newest ones still active."""
+    rng = random.Random(f"{seed}:orders")
+    cumulative = popularity(len(profiles), seed)
+    hours = list(accumulate(HOURLY_WEIGHTS))
+    types = list(accumulate(weight for _, weight in ORDER_TYPES))
+    start = datetime.combine(now.date() - timedelta(days=days - 1), datetime.min.time())
+    for i in range(count):
+        profile = profiles[_pick(rng, cumulative)]
+        created = _moment(rng, start, days, hours)
+        while created > now:
+            created = _moment(rng, start, days, hours)
+        order_type = ORDER_TYPES[_pick(rng, types)][0]
+        items = _items(rng, profile, rng.choice((1, 1, 2, 2, 3, 4, 5)))
+        age = now - created
+        if age < timedelta(hours=2):
+            status = "active"
+        else:
+            status = "cancelled" if rng.random() < 0.06 else "completed"
+        yield {
+            "_id": synthetic_id(ORDER, seed, i, created),
+            "restaurantId": profile.id,
+            "restaurantName": profile.name,
+            "items": items,
+            "orderType": order_type,
+            "status": status,
+            "totalPrice": round(sum(item["price"] * item["quantity"] for item in items), 2),
+            "deliveryAddress": f"{rng.randint(1, 999)} {rng.choice(STREETS)} {rng.choice(STREET_SUFFIXES)}"
+            if order_type == "delivery" else None,
+            "pickupTime": (created + timedelta(minutes=rng.choice((15, 20, 30)))).strftime("%H:%M")
+            if order_type == "pickup" else None,
+            "createdAt": created,
+        }
+
+
+def reservations(
+    profiles: Sequence[Profile], count: int, seed: int, now: datetime, days: int, future_days: int,
+) -> Iterator[Tuple[dict, List[dict]]]:
+    """Reservation documents with the table claims of the upcoming ones.
+
+    About a tenth are in the next ``future_days`` days. A future booking that
+    would clash with an earlier generated one is skipped, so slightly fewer
+    than ``count`` may be produced.
+    """
+    rng = random.Random(f"{seed}:reservations")
+    cumulative = popularity(len(profiles), seed)
+    tables = [t for room in FLOOR_PLAN_TEMPLATES[FLOOR_PLAN_TEMPLATE] for t in room["tables"] if t["available"]]
+    today = now.date()
+    booked = set()
+    for i in range(count):
+        profile = profiles[_pick(rng, cumulative)]
+        people = rng.choice((2, 2, 2, 3, 4, 4, 5, 6, 8))
+        fitting = [t for t in tables if t["capacity"] >= people] or tables[-1:]
+        future = future_days > 0 and rng.random() < 0.1
+        if future:
+            day = today + timedelta(days=rng.randrange(1, future_days + 1))
+            for _ in range(5):
+                table, sitting = rng.choice(fitting), rng.choice(SITTINGS)
+                key = (profile.id, day, table["tableNumber"], sitting)
+                if key not in booked:
+                    booked.add(key)
+                    break
+            else:
+                continue
+            status = "cancelled" if rng.random() < 0.05 else "upcoming"
+        else:
+            day = today - timedelta(days=rng.randrange(1, days + 1))
+            table, sitting = rng.choice(fitting), f"{rng.randint(11, 21):02d}:{rng.choice(('00', '15', '30', '45'))}"
+            roll = rng.random()
+            status = "no-show" if roll < 0.05 else "cancelled" if roll < 0.12 else "completed"
+        booked_at = datetime.combine(day, datetime.min.time()) - timedelta(days=rng.randint(0, 21), seconds=rng.randrange(86400))
+        pre_ordered = _items(rng, profile, rng.randint(1, 3)) if rng.random() < 0.2 else []
+        doc_id = synthetic_id(RESERVATION, seed, i, booked_at)
+        doc = {
+            "_id": doc_id,
+            "restaurantId": profile.id,
+            "restaurantName": profile.name,
+            "date": day.isoformat(),
+            "time": sitting,
+            "duration": rng.choice(DURATIONS),
+            "people": people,
+            "selectedTables": [{"tableNumber": table["tableNumber"], "capacity": table["capacity"]}],
+            "totalCapacity": table["capacity"],
+            "preOrderedFood": pre_ordered,
+            "status": status,
+            "totalPrice": round(sum(item["price"] * item["quantity"] for item in pre_ordered), 2),
+            "qrCode": f"RESERVATION-{doc_id}",
+            "createdAt": min(booked_at, now),
+        }
+        claims = []
+        if status == "upcoming":
+            claims = claim_documents(doc_id, profile.id, doc["date"], [table["tableNumber"]], sitting, doc["duration"])
+        yield doc, claims
+
+
+def order_days(now: datetime, days: int) -> Tuple[date, date]:
+    """Days covered by generated orders, as ``[since, until)``."""
+    return now.date() - timedelta(days=days - 1), now.date() + timedelta(days=1)
@@ -0,0 +1,125 @@
+"""Best-fit table assignment for a party.
+
+Solving happens in two steps:
+
+1. Capacity mix. A memoized DP over capacity classes (how many 2-, 4-, 6-seat
+   tables...) finds the k best multisets of capacities that seat the party.
+   They are ranked by wasted seats, then by number of tables. Every state is
+   ``(class, seats still needed, tables left)``, so the work depends on the
+   number of distinct capacities and the party size, not on the number of
+   tables. States that cannot seat the party with the tables left are pruned.
+2. Concrete tables. Each multiset is mapped to actual tables that are close
+   together, preferring a single room. Candidate groups are grown around
+   anchor tables by distance.
+"""
+import math
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+MAX_TABLES = 4
+# Growing groups around this many anchors per capacity mix bounds the work on huge plans
+MAX_ANCHORS = 64
+# Distance penalty for joining tables that are in different rooms
+ROOM_PENALTY = 1e6
+
+CapacityMix = Tuple[Tuple[int, int], ...]  # ((capacity, count), ...), largest capacity first
+
+
+@lru_cache(maxsize=4096)
+def best_capacity_mixes(classes: CapacityMix, people: int, max_tables: int, k: int) -> List[Tuple[int, int, CapacityMix]]:
+    """The k best ``(wasted seats, tables, mix)`` choices seating ``people``."""
+    capacities = [capacity for capacity, _ in classes]
+    available = [count for _, count in classes]
+    # Most seats reachable from class i on with n tables, for pruning
+    reach: Dict[Tuple[int, int], int] = {}
+
+    def max_seats(i: int, tables: int) -> int:
+        key = (i, tables)
+        if key not in reach:
+            seats, left = 0, tables
+            for capacity, count in zip(capacities[i:], available[i:]):
+                used = min(count, left)
+                seats += used * capacity
+                left -= used
+            reach[key] = seats
+        return reach[key]
+
+    memo: Dict[Tuple[int, int, int], List[Tuple[int, int, CapacityMix]]] = {}
+
+    def solve(i: int, needed: int, tables: int) -> List[Tuple[int, int, CapacityMix]]:
+        if needed <= 0:
+            return [(-needed, 0, ())]
+        if i == len(capacities) or tables == 0 or max_seats(i, tables) < needed:
+            return []
+        key = (i, needed, tables)
+        if key in memo:
+            return memo[key]
+        results = []
+        capacity = capacities[i]
+        # Never take more tables of a class than it takes to cover the remaining seats
+        most = min(available[i], tables, -(-needed // capacity))
+        for count in range(most, -1, -1):
+            for waste, used, mix in solve(i + 1, needed - count * capacity, tables - count):
+                results.append((waste, used + count, ((capacity, count),) + mix if count else mix))
+        results.sort()
+        memo[key] = results[:k]
+        return memo[key]
+
+    return solve(0, people, max_tables)
+
+
+def _distance(a: dict, b: dict) -> float:
+    penalty = 0.0 if a.get("room") == b.get("room") else ROOM_PENALTY
+    return math.hypot(a.get("x", 0) - b.get("x", 0), a.get("y", 0) - b.get("y", 0)) + penalty
+
+
+def _place(mix: CapacityMix, by_capacity: Dict[int, List[dict]]) -> Optional[Tuple[float, List[dict]]]:
+    """Closest group of concrete tables matching a capacity mix, with its spread."""
+    needed = dict(mix)
+    # Anchor on the scarcest capacity in the mix: fewest candidates to try
+    anchor_capacity = min(needed, key=lambda c: len(by_capacity[c]))
+    best = None
+    for anchor in by_capacity[anchor_capacity][:MAX_ANCHORS]:
+        remaining = Counter(needed)
+        remaining[anchor_capacity] -= 1
+        group, spread = [anchor], 0.0
+        for capacity, count in remaining.items():
+            if not count:
+                continue
+            candidates = [t for t in by_capacity[capacity] if t is not anchor]
+            nearest = sorted(candidates, key=lambda t: _distance(anchor, t))[:count]
+            group.extend(nearest)
+            spread += sum(_distance(anchor, t) for t in nearest)
+        if best is None or spread < best[0]:
+            best = (spread, group)
+    return best
+
+
+def suggest_tables(tables: List[dict], people: int, k: int = 3, max_tables: int = MAX_TABLES) -> List[dict]:
+    """Top-k table sets seating ``people``: least wasted seats, fewest tables, closest together."""
+    if people <= 0:
+        return []
+    by_capacity: Dict[int, List[dict]] = defaultdict(list)
+    for table in tables:
+        if table.get("capacity", 0) > 0:
+            by_capacity[table["capacity"]].append(table)
+    classes = tuple(sorted(((c, len(ts)) for c, ts in by_capacity.items()), reverse=True))
+
+    suggestions = []
+    # Ask for extra mixes so adjacency can still reorder near-ties
+    for waste, used, mix in best_capacity_mixes(classes, people, max_tables, 2 * k):
+        placed = _place(mix, by_capacity)
+        if placed is None:
+            continue
+        spread, group = placed
+        rooms = len({t.get("room") for t in group})
+        suggestions.append(((waste, used, rooms, spread), {
+            "tables": [
+                {"tableNumber": t["tableNumber"], "capacity": t["capacity"], "room": t.get("room")} for t in group
+            ],
+            "totalCapacity": sum(t["capacity"] for t in group),
+            "wastedSeats": waste,
+        }))
+    suggestions.sort(key=lambda s: s[0])
+    return [suggestion for _, suggestion in suggestions[:k]]
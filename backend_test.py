@@ -70,14 +70,17 @@ class FoodAppTester:
                     
                     # Verify restaurant structure
                     first_restaurant = restaurants[0]
-                    required_fields = ["id", "name", "cuisine", "rating", "menu"]
+                    required_fields = ["id", "name", "cuisine", "rating", "latitude", "longitude"]
                     missing_fields = [f for f in required_fields if f not in first_restaurant]
-                    if not missing_fields:
+                    if not missing_fields and "menu" not in first_restaurant:
                         self.log_result("restaurants", "Restaurant data structure", True, 
-                                      "All required fields present")
-                    else:
+                                      "All summary fields present, menu omitted")
+                    elif missing_fields:
                         self.log_result("restaurants", "Restaurant data structure", False, 
                                       f"Missing fields: {missing_fields}")
+                    else:
+                        self.log_result("restaurants", "Restaurant data structure", False, 
+                                      "List response should not include the menu")
                 else:
                     self.log_result("restaurants", "GET /restaurants", False, 
                                   f"Expected 4+ restaurants, got {len(restaurants)}")
@@ -130,6 +133,24 @@ class FoodAppTester:
                                       f"Status code: {response.status_code}")
                 except Exception as e:
                     self.log_result("restaurants", f"GET /restaurants/{restaurant_id}", False, str(e))
+
+            # Test GET /restaurants/{id}/menu (full and single category)
+            restaurant_id = self.restaurant_ids[0]
+            try:
+                response = self.session.get(f"{self.base_url}/restaurants/{restaurant_id}/menu")
+                menu = response.json() if response.status_code == 200 else []
+                self.log_result("restaurants", f"GET /restaurants/{restaurant_id}/menu", len(menu) > 0,
+                              f"Status code: {response.status_code}, {len(menu)} categories")
+                if menu:
+                    category = menu[0]["category"]
+                    response = self.session.get(f"{self.base_url}/restaurants/{restaurant_id}/menu",
+                                                params={"category": category})
+                    filtered = response.json() if response.status_code == 200 else []
+                    self.log_result("restaurants", f"GET /restaurants/{restaurant_id}/menu?category={category}",
+                                  [c["category"] for c in filtered] == [category],
+                                  f"Status code: {response.status_code}")
+            except Exception as e:
+                self.log_result("restaurants", f"GET /restaurants/{restaurant_id}/menu", False, str(e))
     
     def test_orders_endpoints(self):
         """Test all order-related endpoints"""
@@ -0,0 +1,399 @@
+"""In-process latency and throughput benchmark of every API endpoint.
+
+Drives ``server.app`` through an ASGI client, with no network or uvicorn in
+between. Each scenario runs a fixed number of requests spread over N
+concurrent workers. For each one the script reports p50/p95/p99 latency,
+requests per second and, in a separate sequential pass under
+``tracemalloc``, the memory a request allocates at its peak and the memory
+it leaves behind. Latencies include the client's own overhead (roughly
+0.1 ms per request), which is the same between runs, so compare them
+between runs rather than reading them as absolute server times.
+Scenarios run in a fixed order and the write scenarios add data, so with
+the same arguments each scenario sees the same data volume on every run.
+
+Against a local mongod (the database is dropped afterwards unless
+``--keep-data`` is given):
+
+    python benchmarks/api_bench.py --mongo-url mongodb://localhost:27017 --output bench.json
+
+Against an in-memory Motor stand-in (needs ``mongomock_motor``). Scenarios
+that need the real server (``$geoNear``, explain) are skipped:
+
+    python benchmarks/api_bench.py --in-memory --concurrency 32 --requests 2000
+
+Compare with an earlier run; the exit status is 1 when a scenario's p95 or
+throughput got worse by more than ``--tolerance`` percent:
+
+    python benchmarks/api_bench.py --mongo-url ... --output new.json --compare bench.json
+
+The client side needs ``httpx``.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.insert(0, BACKEND)
+
+ORDER = {
+    "restaurantId": "",
+    "restaurantName": "Benchmark Bistro",
+    "items": [{"name": "Coffee", "price": 3.5, "quantity": 2}, {"name": "Bagel", "price": 4.25, "quantity": 1}],
+    "orderType": "pickup",
+    "totalPrice": 11.25,
+}
+
+
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    # Path, JSON body and query parameters may depend on the request number
+    path: Callable[[int], str]
+    body: Optional[Callable[[int], Any]] = None
+    params: Optional[Dict[str, Any]] = None
+    needs_mongod: bool = False
+    # Event streams never end: time the first frame, then disconnect
+    first_frame: bool = False
+
+
+def scenarios(ctx: dict) -> List[Scenario]:
+    rid, order_ids, reservation_ids = ctx["restaurantId"], ctx["orderIds"], ctx["reservationIds"]
+    tables = ctx["tables"][:1]
+    order = {**ORDER, "restaurantId": rid}
+    today = date.today()
+
+    def reservation(n):
+        # A fresh day per request, so claims never conflict
+        return {
+            "restaurantId": rid, "restaurantName": "Benchmark Bistro", "date": (today + timedelta(days=1 + n)).isoformat(),
+            "time": "19:00", "duration": 90, "people": 2, "selectedTables": tables,
+            "totalCapacity": sum(t["capacity"] for t in tables),
+        }
+
+    def fixed(path):
+        return lambda n: path
+
+    return [
+        Scenario("root", "GET", fixed("/api/")),
+        Scenario("restaurants.list", "GET", fixed("/api/restaurants")),
+        Scenario("restaurants.search", "GET", fixed("/api/restaurants"), params={"search": "pizza"}),
+        Scenario("restaurants.cuisine", "GET", fixed("/api/restaurants"), params={"cuisine": "Italian"}),
+        Scenario("restaurants.nearby", "GET", fixed("/api/restaurants/nearby"),
+                 params={"lat": 40.7128, "lng": -74.006, "radius": 10000}, needs_mongod=True),
+        Scenario("restaurants.within", "GET", fixed("/api/restaurants/within"),
+                 params={"south": 40.6, "west": -74.1, "north": 40.9, "east": -73.8}, needs_mongod=True),
+        Scenario("restaurants.get", "GET", fixed(f"/api/restaurants/{rid}")),
+        Scenario("restaurants.menu", "GET", fixed(f"/api/restaurants/{rid}/menu")),
+        Scenario("floor_plan.get", "GET", fixed(f"/api/restaurants/{rid}/floor-plan")),
+        Scenario("floor_plan.availability", "GET", fixed(f"/api/restaurants/{rid}/floor-plan"),
+                 params={"date": today.isoformat(), "time": "19:00"}),
+        Scenario("floor_plan.put", "PUT", fixed(f"/api/restaurants/{ctx['floorPlanId']}/floor-plan"),
+                 body=lambda n: {"rooms": ctx["rooms"]}),
+        Scenario("table_suggestions", "POST", fixed(f"/api/restaurants/{rid}/table-suggestions"),
+                 body=lambda n: {"people": 4, "date": today.isoformat(), "time": "20:00"}),
+        Scenario("orders.create", "POST", fixed("/api/orders"), body=lambda n: order),
+        Scenario("orders.batch50", "POST", fixed("/api/orders/batch"), body=lambda n: [order] * 50),
+        Scenario("orders.list", "GET", fixed("/api/orders")),
+        Scenario("orders.get", "GET", lambda n: f"/api/orders/{order_ids[n % len(order_ids)]}"),
+        Scenario("orders.status", "PATCH", lambda n: f"/api/orders/{order_ids[n % len(order_ids)]}/status",
+                 body=lambda n: {"status": "active"}),
+        Scenario("reservations.create", "POST", fixed("/api/reservations"), body=reservation),
+        Scenario("reservations.list", "GET", fixed("/api/reservations")),
+        Scenario("reservations.get", "GET", lambda n: f"/api/reservations/{reservation_ids[n % len(reservation_ids)]}"),
+        Scenario("reservations.status", "PATCH",
+                 lambda n: f"/api/reservations/{reservation_ids[n % len(reservation_ids)]}/status",
+                 body=lambda n: {"status": "upcoming"}),
+        Scenario("events.subscribe", "GET", fixed("/api/events"), params={"orders": order_ids[0]}, first_frame=True),
+        Scenario("analytics.restaurant", "GET", fixed(f"/api/analytics/restaurants/{rid}")),
+        Scenario("media.get", "GET", fixed(f"/api/media/{ctx['mediaDigest']}")),
+        Scenario("export.orders.ndjson", "GET", fixed("/api/export/orders")),
+        Scenario("export.reservations.csv", "GET", fixed("/api/export/reservations"), params={"format": "csv"}),
+        Scenario("admin.rollups_backfill", "POST", fixed("/api/admin/rollups/backfill")),
+        Scenario("admin.group_commit", "GET", fixed("/api/admin/group-commit")),
+        Scenario("admin.events", "GET", fixed("/api/admin/events")),
+        Scenario("admin.slow_queries", "GET", fixed("/api/admin/slow-queries")),
+        Scenario("admin.slow_queries.explain", "POST",
+                 fixed(f"/api/admin/slow-queries/{ctx['slowQueryId']}/explain"), needs_mongod=True),
+        Scenario("admin.slow_queries.clear", "DELETE", fixed("/api/admin/slow-queries")),
+        Scenario("catalog.cache_stats", "GET", fixed("/api/catalog/cache-stats")),
+        Scenario("metrics", "GET", fixed("/api/metrics")),
+    ]
+
+
+async def first_frame(app, path: str, params: Dict[str, Any]) -> int:
+    """Call the ASGI app directly until the first body chunk, then disconnect; returns the status."""
+    disconnect = asyncio.Event()
+    status = 0
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": str(httpx.QueryParams(params)).encode(),
+        "headers": [(b"host", b"bench"), (b"accept", b"text/event-stream")],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80), "root_path": "",
+    }
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and (message.get("body") or not message.get("more_body")):
+            disconnect.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def call(client: httpx.AsyncClient, app, scenario: Scenario, n: int) -> int:
+    if scenario.first_frame:
+        return await first_frame(app, scenario.path(n), scenario.params or {})
+    body = scenario.body(n) if scenario.body else None
+    response = await client.request(scenario.method, scenario.path(n), json=body, params=scenario.params)
+    return response.status_code
+
+
+def percentile_summary(latencies: List[float]) -> dict:
+    q = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "mean": round(statistics.fmean(latencies), 4),
+        "p50": round(q[49], 4),
+        "p95": round(q[94], 4),
+        "p99": round(q[98], 4),
+        "max": round(max(latencies), 4),
+    }
+
+
+async def run_scenario(client, app, scenario: Scenario, requests: int, concurrency: int, warmup: int) -> dict:
+    for n in range(warmup):
+        await call(client, app, scenario, n)
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    numbers = iter(range(warmup, warmup + requests))
+
+    async def worker():
+        for n in numbers:
+            started = time.perf_counter()
+            status = await call(client, app, scenario, n)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "method": scenario.method,
+        "path": scenario.path(0),
+        "requests": len(latencies),
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": round(len(latencies) / elapsed, 1),
+        "latencyMs": percentile_summary(latencies),
+    }
+
+
+async def measure_allocations(client, app, scenario: Scenario, samples: int, offset: int) -> dict:
+    """Mean peak and retained traced memory per request, measured one request at a time."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        baseline = tracemalloc.get_traced_memory()[0]
+        for n in range(offset, offset + samples):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await call(client, app, scenario, n)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return {
+        "samples": samples,
+        "peakKiB": round(statistics.fmean(peaks) / 1024, 2),
+        "retainedKiB": round(retained / samples / 1024, 2),
+    }
+
+
+async def prepare(client: httpx.AsyncClient, server) -> dict:
+    """Ids the scenarios need: a restaurant, its tables, orders, a reservation, an image and a slow-query record."""
+    restaurants = (await client.get("/api/restaurants")).json()
+    rid = restaurants[0]["id"]
+    plan = (await client.get(f"/api/restaurants/{rid}/floor-plan")).json()
+    tables = [{"tableNumber": t["tableNumber"], "capacity": t["capacity"]} for t in plan["tables"]]
+    # The response flattens tables; an update nests them in their rooms again
+    rooms = [
+        {**room, "tables": [{k: v for k, v in t.items() if k != "room"} for t in plan["tables"] if t["room"] == room["id"]]}
+        for room in plan["rooms"]
+    ]
+
+    batch = (await client.post("/api/orders/batch", json=[{**ORDER, "restaurantId": rid}] * 200)).json()
+    order_ids = [r["id"] for r in batch["results"]]
+    reservation_ids = []
+    for n in range(20):
+        response = await client.post("/api/reservations", json={
+            "restaurantId": rid, "restaurantName": "Benchmark Bistro",
+            "date": (date.today() - timedelta(days=1 + n)).isoformat(), "time": "12:00", "duration": 60,
+            "people": 2, "selectedTables": tables[:1], "totalCapacity": tables[0]["capacity"],
+        })
+        reservation_ids.append(response.json()["id"])
+
+    # 64 KiB behind a PNG signature, the size of a typical menu photo
+    media_digest = await server.media_store.put(b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 256, "image/png")
+
+    # Record one explainable command regardless of the configured threshold
+    threshold, server.slow_query_log.threshold_ms = server.slow_query_log.threshold_ms, 0
+    await client.get("/api/orders")
+    server.slow_query_log.threshold_ms = threshold
+    explainable = [r for r in server.slow_query_log.records() if r["explainable"]]
+
+    return {
+        "restaurantId": rid,
+        # Writes go to a floor plan of its own, so they do not change what the other scenarios read
+        "floorPlanId": "benchmark-floor-plan",
+        "rooms": rooms,
+        "tables": tables,
+        "orderIds": order_ids,
+        "reservationIds": reservation_ids,
+        "mediaDigest": media_digest,
+        "slowQueryId": explainable[0]["id"] if explainable else 0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BACKEND,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Print p95 and throughput changes against ``baseline``; returns the regressed scenarios."""
+    regressions = []
+    print(f"\ncompared with {baseline['meta'].get('commit') or 'baseline'}:")
+    for name, current in results["scenarios"].items():
+        previous = baseline["scenarios"].get(name)
+        if previous is None:
+            continue
+        p95 = (current["latencyMs"]["p95"] / previous["latencyMs"]["p95"] - 1) * 100 if previous["latencyMs"]["p95"] else 0.0
+        rps = (current["rps"] / previous["rps"] - 1) * 100 if previous["rps"] else 0.0
+        regressed = p95 > tolerance or rps < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"  {name:32} p95 {p95:+7.1f}%  rps {rps:+7.1f}%{'  REGRESSED' if regressed else ''}")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--mongo-url", help="local mongod to run against")
+    backend.add_argument("--in-memory", action="store_true", help="use mongomock_motor instead of a mongod")
+    parser.add_argument("--db", default="api_benchmark", help="database name (dropped afterwards)")
+    parser.add_argument("--keep-data", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--alloc-samples", type=int, default=50, help="requests per scenario traced for allocations (0 skips)")
+    parser.add_argument("--only", help="regular expression selecting scenarios by name")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+    # One INFO line per request would be part of what is measured
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://localhost:27017"
+    os.environ["DB_NAME"] = args.db
+    # Every request comes from the same client: measure the endpoints, not the rate limit
+    os.environ.setdefault("RATE_LIMIT_RPS", "0")
+    import server
+
+    media_root = None
+    if args.in_memory:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db]
+        # GridFS needs a real server: keep media in a scratch directory instead
+        media_root = tempfile.mkdtemp(prefix="api_bench_media_")
+        server.MEDIA_STORE, server.MEDIA_ROOT = "disk", media_root
+
+    await server.app.router.startup()
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            selected = [
+                s for s in scenarios(await prepare(client, server))
+                if not args.only or re.search(args.only, s.name)
+            ]
+            results = {
+                "meta": {
+                    "commit": git_commit(),
+                    "backend": "in-memory" if args.in_memory else "mongod",
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "concurrency": args.concurrency,
+                    "requests": args.requests,
+                    "startedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                },
+                "scenarios": {},
+                "skipped": {},
+            }
+            print(f"{'scenario':32} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KiB':>9} {'errors':>6}")
+            for scenario in selected:
+                if scenario.needs_mongod and args.in_memory:
+                    results["skipped"][scenario.name] = "needs mongod"
+                    continue
+                result = await run_scenario(client, server.app, scenario, args.requests, args.concurrency, args.warmup)
+                if args.alloc_samples:
+                    offset = args.warmup + args.requests
+                    result["allocations"] = await measure_allocations(
+                        client, server.app, scenario, args.alloc_samples, offset,
+                    )
+                results["scenarios"][scenario.name] = result
+                latency, peak = result["latencyMs"], result.get("allocations", {}).get("peakKiB", "-")
+                print(f"{scenario.name:32} {result['rps']:9.1f} {latency['p50']:8.3f} {latency['p95']:8.3f} "
+                      f"{latency['p99']:8.3f} {peak:>9} {result['errors']:6}")
+            if results["skipped"]:
+                print(f"skipped: {', '.join(results['skipped'])}")
+    finally:
+        if not args.keep_data:
+            await server.client.drop_database(args.db)
+            if media_root:
+                shutil.rmtree(media_root, ignore_errors=True)
+        await server.app.router.shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(results, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
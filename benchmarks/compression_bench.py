@@ -0,0 +1,85 @@
+"""Size and CPU cost of compressing catalog responses.
+
+Compares gzip and brotli at the levels used for cached catalog bodies (compressed
+once per catalog version) and for on-the-fly responses. Covers the demo catalog
+and a synthetic catalog of N restaurants built from the demo ones. Run from the
+repository root:
+
+    python benchmarks/compression_bench.py [--restaurants 10000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from catalog_cache import CachedResponse  # noqa: E402
+from compression import CACHED_LEVELS, DYNAMIC_LEVELS, SUPPORTED_ENCODINGS, compress  # noqa: E402
+from fast_json import api_documents, dumps  # noqa: E402
+from server import RESTAURANT_PROJECTION, SUMMARY_PROJECTION, demo_restaurant_documents  # noqa: E402
+
+
+def synthetic_catalog(count: int):
+    demo = demo_restaurant_documents()
+    catalog = []
+    for i in range(count):
+        base = demo[i % len(demo)]
+        catalog.append({
+            **base,
+            "_id": ObjectId(),
+            "name": f"{base['name']} {i}",
+            "rating": round(3 + (i % 20) / 10, 1),
+            "latitude": base["latitude"] + (i % 100) * 1e-4,
+            "longitude": base["longitude"] - (i // 100 % 100) * 1e-4,
+        })
+    return catalog
+
+
+def project(docs, projection):
+    return api_documents([{k: v for k, v in d.items() if k == "_id" or k in projection} for d in docs])
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def report(name: str, body: bytes, repeat: int):
+    print(f"{name}: {len(body):,} bytes")
+    for label, levels in (("cached", CACHED_LEVELS), ("dynamic", DYNAMIC_LEVELS)):
+        for encoding in SUPPORTED_ENCODINGS:
+            level = levels[encoding]
+            size = len(compress(body, encoding, level))
+            ms = timed(lambda: compress(body, encoding, level), repeat)
+            print(f"  {label:>7} {encoding:>4}-{level:<2} {size:>12,} bytes ({size / len(body):6.1%})  {ms:9.2f} ms")
+    cached = CachedResponse(body)
+    for encoding in SUPPORTED_ENCODINGS:
+        cached.encoded(encoding)
+    hit_us = timed(lambda: cached.encoded(SUPPORTED_ENCODINGS[0]), 10000) * 1000
+    print(f"  cached hit: {hit_us:.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--restaurants", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    demo = [dict(d, _id=ObjectId()) for d in demo_restaurant_documents()]
+    report("demo /restaurants", dumps(project(demo, SUMMARY_PROJECTION)), args.repeat * 20)
+    report("demo /restaurants/{id}", dumps(project(demo[:1], RESTAURANT_PROJECTION)[0]), args.repeat * 20)
+
+    catalog = synthetic_catalog(args.restaurants)
+    report(f"{args.restaurants:,} restaurant summaries", dumps(project(catalog, SUMMARY_PROJECTION)), args.repeat)
+    report(f"{args.restaurants:,} restaurants with menus", dumps(project(catalog, RESTAURANT_PROJECTION)), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Bulk-load a reproducible synthetic dataset into the API's database.
+
+Restaurants and their floor plans, orders, reservations and the table claims of upcoming bookings
+are generated by ``backend/synthetic_data.py`` from ``--seed``. They are
+written with unordered ``insert_many`` batches, several in flight while the
+next ones are generated. Indexes are created after the load, which is faster
+than maintaining them during it. The order rollups are then rebuilt for the
+loaded days. Run from the repository root:
+
+    python benchmarks/generate_data.py --mongo-url mongodb://localhost:27017 --db foodapp_large --drop
+    python benchmarks/generate_data.py --restaurants 10000 --orders 200000 --reservations 100000
+
+Without ``--mongo-url``/``--db`` the API's own settings (``backend/.env``)
+are used. The same seed loaded twice into one database is refused; use
+``--drop`` (the API seeds its demo data again on its next start) or another
+seed. Expect roughly 100k restaurants, 2M orders and 1M reservations to take
+a few minutes against a local mongod.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+
+
+class AlreadyLoaded(Exception):
+    pass
+
+
+class Loader:
+    """Inserts batches into a collection, keeping up to ``concurrency`` of them in flight."""
+
+    def __init__(self, collection, concurrency: int):
+        self.collection = collection
+        self.inserted = 0
+        self.error: Optional[Exception] = None
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending = set()
+
+    async def add(self, docs: List[dict]) -> None:
+        await self._slots.acquire()
+        if self.error:
+            raise self.error
+        task = asyncio.ensure_future(self._insert(docs))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _insert(self, docs: List[dict]) -> None:
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+            self.inserted += len(docs)
+        except BulkWriteError as e:
+            if any(err["code"] == 11000 for err in e.details.get("writeErrors", [])):
+                self.error = AlreadyLoaded(
+                    f"{self.collection.name}: documents of this seed are already loaded; use --drop or another --seed"
+                )
+            else:
+                self.error = e
+        finally:
+            self._slots.release()
+
+    async def finish(self) -> int:
+        while self._pending:
+            await asyncio.gather(*self._pending)
+        if self.error:
+            raise self.error
+        return self.inserted
+
+
+def batches(docs: Iterable[dict], size: int) -> Iterable[List[dict]]:
+    docs = iter(docs)
+    while batch := list(islice(docs, size)):
+        yield batch
+
+
+def report(name: str, count: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    print(f"{name:14} {count:>10,} in {elapsed:6.1f}s ({count / elapsed if elapsed else 0:,.0f}/s)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-url", help="defaults to MONGO_URL")
+    parser.add_argument("--db", help="defaults to DB_NAME")
+    parser.add_argument("--drop", action="store_true", help="drop the database first")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--restaurants", type=int, default=100_000)
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--reservations", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365, help="history length")
+    parser.add_argument("--future-days", type=int, default=30, help="how far ahead reservations go")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many batches in flight")
+    args = parser.parse_args()
+    if args.mongo_url:
+        os.environ["MONGO_URL"] = args.mongo_url
+    if args.db:
+        os.environ["DB_NAME"] = args.db
+
+    import server
+    import synthetic_data
+    from rollups import backfill
+
+    db = server.db
+    if args.drop:
+        await server.client.drop_database(db.name)
+    # Fixed to the hour so a rerun on the same day produces the same documents
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    total = time.perf_counter()
+
+    started, profiles = time.perf_counter(), []
+    loader = Loader(db.restaurants, args.concurrency)
+    for batch in batches(synthetic_data.restaurants(args.restaurants, args.seed, now - timedelta(days=args.days)), args.batch_size):
+        profiles.extend(profile for _, profile in batch)
+        await loader.add([doc for doc, _ in batch])
+    report("restaurants", await loader.finish(), started)
+
+    started = time.perf_counter()
+    loader = Loader(db.floor_plans, args.concurrency)
+    for batch in batches(synthetic_data.floor_plans(profiles, now - timedelta(days=args.days)), args.batch_size):
+        await loader.add(batch)
+    report("floor plans", await loader.finish(), started)
+
+    started = time.perf_counter()
+    loader = Loader(db.orders, args.concurrency)
+    for batch in batches(synthetic_data.orders(profiles, args.orders, args.seed, now, args.days), args.batch_size):
+        await loader.add(batch)
+    report("orders", await loader.finish(), started)
+
+    started = time.perf_counter()
+    loader, claims = Loader(db.reservations, args.concurrency), Loader(db.table_claims, args.concurrency)
+    generated = synthetic_data.reservations(profiles, args.reservations, args.seed, now, args.days, args.future_days)
+    for batch in batches(generated, args.batch_size):
+        await loader.add([doc for doc, _ in batch])
+        batch_claims = [claim for _, doc_claims in batch for claim in doc_claims]
+        if batch_claims:
+            await claims.add(batch_claims)
+    report("reservations", await loader.finish(), started)
+    report("table claims", await claims.finish(), started)
+
+    started = time.perf_counter()
+    await server.ensure_indexes()
+    print(f"{'indexes':14} {'':>10} in {time.perf_counter() - started:6.1f}s")
+
+    started = time.perf_counter()
+    since, until = synthetic_data.order_days(now, args.days)
+    report("rollup buckets", await backfill(db.orders, db.order_rollups, since, until), started)
+    print(f"done in {time.perf_counter() - total:.1f}s")
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except AlreadyLoaded as e:
+        sys.exit(str(e))
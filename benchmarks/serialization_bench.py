@@ -0,0 +1,84 @@
+"""Compare the model-based response path with the orjson fast path.
+
+Run from the repository root:
+
+    python benchmarks/serialization_bench.py [--orders 1000] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from fast_json import api_documents, dumps  # noqa: E402
+from server import RESTAURANT_PROJECTION, Order, Restaurant, demo_restaurant_documents  # noqa: E402
+
+
+def model_path(model, docs):
+    """What the endpoints did before: build models, then validate and dump them again."""
+    adapter = TypeAdapter(List[model])
+    items = [model(id=str(doc["_id"]), **{k: v for k, v in doc.items() if k != "_id"}) for doc in docs]
+    payload = adapter.dump_python(adapter.validate_python(items, from_attributes=True), mode="json")
+    return json.dumps(payload).encode("utf-8")
+
+
+def fast_path(docs):
+    return dumps(api_documents(docs))
+
+
+def synthetic_orders(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "restaurantId": str(ObjectId()),
+            "restaurantName": f"Restaurant {i % 50}",
+            "items": [{"name": f"Dish {j}", "price": 9.5 + j, "quantity": 1 + j % 3, "image": ""} for j in range(3)],
+            "orderType": "delivery" if i % 2 else "pickup",
+            "status": "active",
+            "totalPrice": 42.5,
+            "deliveryAddress": "1 Main Street" if i % 2 else None,
+            "pickupTime": None,
+            "createdAt": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    # As loaded with the endpoint's projection
+    restaurants = [
+        dict({k: v for k, v in doc.items() if k in RESTAURANT_PROJECTION}, _id=ObjectId())
+        for doc in demo_restaurant_documents()
+    ]
+    cases = [("restaurants", Restaurant, restaurants), (f"{args.orders} orders", Order, synthetic_orders(args.orders))]
+    for name, model, docs in cases:
+        assert json.loads(model_path(model, docs)) == json.loads(fast_path(docs)), name
+        before = timed(lambda: model_path(model, docs), args.repeat)
+        after = timed(lambda: fast_path(docs), args.repeat)
+        print(f"{name:>14}: models {before:8.3f} ms  fast path {after:8.3f} ms  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
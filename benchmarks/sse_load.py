@@ -0,0 +1,105 @@
+"""Load test for the status event stream: many idle subscribers on one worker.
+
+Opens N concurrent ``GET /api/events`` streams against a running API worker,
+each subscribed to its own order. The script then reports the server's
+resident memory growth per subscriber (when ``--pid`` is given) and the
+heartbeat cost from ``/api/admin/events``. Finally it flips the status of a
+sample of the subscribed orders and measures the time from the status PATCH
+to the event arriving on the stream.
+Run a single worker, without the per-client rate limit (every subscriber
+connects from the same address), e.g.:
+
+    cd backend && RATE_LIMIT_RPS=0 uvicorn server:app --port 8001 --workers 1
+    python benchmarks/sse_load.py --url http://127.0.0.1:8001 --subscribers 5000 --pid <uvicorn pid>
+
+The client side needs ``httpx``, and one file descriptor per subscriber
+(``ulimit -n``).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+ORDER = {
+    "restaurantId": "load-test",
+    "restaurantName": "Load Test",
+    "items": [{"name": "Coffee", "price": 3.5, "quantity": 1}],
+    "orderType": "pickup",
+    "totalPrice": 3.5,
+}
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def subscribe(client: httpx.AsyncClient, order_id: str, ready: asyncio.Event, received: dict, connected: list):
+    async with client.stream("GET", "/api/events", params={"orders": order_id}) as response:
+        response.raise_for_status()
+        connected.append(order_id)
+        if len(connected) == received["expected"]:
+            ready.set()
+        async for line in response.aiter_lines():
+            if line.startswith("data:") and '"cancelled"' in line:
+                received[order_id] = time.perf_counter()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--publish", type=int, default=200, help="orders to cancel while everyone is subscribed")
+    parser.add_argument("--pid", type=int, help="server process id, to report its memory")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.subscribers + 10, max_keepalive_connections=0)
+    timeout = httpx.Timeout(30.0, read=None)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        order_ids = []
+        for i in range(0, args.subscribers, 500):
+            batch = [ORDER] * min(500, args.subscribers - i)
+            response = await client.post("/api/orders/batch", json=batch)
+            order_ids += [r["id"] for r in response.json()["results"]]
+        print(f"created {len(order_ids)} orders in {time.perf_counter() - started:.1f}s")
+
+        before = rss_kib(args.pid) if args.pid else 0
+        ready, received, connected = asyncio.Event(), {"expected": len(order_ids)}, []
+        started = time.perf_counter()
+        streams = [asyncio.create_task(subscribe(client, oid, ready, received, connected)) for oid in order_ids]
+        await asyncio.wait_for(ready.wait(), timeout=120)
+        print(f"{len(connected)} subscribers connected in {time.perf_counter() - started:.1f}s")
+
+        await asyncio.sleep(1)
+        stats = (await client.get("/api/admin/events")).json()
+        print(f"server: {stats['subscribers']} subscribers, {stats['topics']} topics")
+        if args.pid:
+            after = rss_kib(args.pid)
+            print(f"server RSS +{(after - before) / 1024:.1f} MiB, {(after - before) * 1024 / len(connected):.0f} bytes per subscriber")
+
+        sample = order_ids[: args.publish]
+        sent = {}
+        for oid in sample:
+            sent[oid] = time.perf_counter()
+            await client.patch(f"/api/orders/{oid}/status", json={"status": "cancelled"})
+        await asyncio.sleep(2)
+        latencies = sorted((received[oid] - sent[oid]) * 1000 for oid in sample if oid in received)
+        if latencies:
+            q = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+            print(f"delivered {len(latencies)}/{len(sample)} events: p50 {q[49]:.2f} ms, p99 {q[98]:.2f} ms")
+
+        stats = (await client.get("/api/admin/events")).json()
+        print(f"last heartbeat fan-out: {stats['lastHeartbeatMs']} ms; dropped subscribers: {stats['dropped']}")
+        for stream in streams:
+            stream.cancel()
+        await asyncio.gather(*streams, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -12,13 +12,13 @@ import {
 } from 'react-native';
 import { Ionicons } from '@expo/vector-icons';
 import { useRouter } from 'expo-router';
-import { api } from '../../utils/api';
-import { Restaurant } from '../../types';
+import { api, mediaUri } from '../../utils/api';
+import { RestaurantSummary } from '../../types';
 import { useStore } from '../../store/useStore';
 
 export default function HomeScreen() {
   const router = useRouter();
-  const [restaurants, setRestaurants] = useState<Restaurant[]>([]);
+  const [restaurants, setRestaurants] = useState<RestaurantSummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState('');
   const [selectedCuisine, setSelectedCuisine] = useState('all');
@@ -56,14 +56,14 @@ export default function HomeScreen() {
     </View>
   );
 
-  const renderRestaurant = ({ item }: { item: Restaurant }) => (
+  const renderRestaurant = ({ item }: { item: RestaurantSummary }) => (
     <TouchableOpacity
       style={styles.card}
       onPress={() => router.push(`/restaurant/${item.id}`)}
     >
       {item.logo ? (
         <Image 
-          source={{ uri: item.logo }} 
+          source={{ uri: mediaUri(item.logo, 480) }} 
           style={styles.cardImage}
           resizeMode="cover"
         />
@@ -10,14 +10,17 @@ import {
 import { Ionicons } from '@expo/vector-icons';
 import { useRouter } from 'expo-router';
 import { api } from '../../utils/api';
-import { Restaurant } from '../../types';
+import { RestaurantSummary } from '../../types';
 
 const { width, height } = Dimensions.get('window');
 
+// Viewport covered by the mock map, padded around the pin projection in renderPin
+const VIEWPORT = { south: 40.74, west: -74, north: 40.77, east: -73.96 };
+
 export default function MapScreen() {
   const router = useRouter();
-  const [restaurants, setRestaurants] = useState<Restaurant[]>([]);
-  const [selectedRestaurant, setSelectedRestaurant] = useState<Restaurant | null>(null);
+  const [restaurants, setRestaurants] = useState<RestaurantSummary[]>([]);
+  const [selectedRestaurant, setSelectedRestaurant] = useState<RestaurantSummary | null>(null);
 
   useEffect(() => {
     loadRestaurants();
@@ -25,14 +28,19 @@ export default function MapScreen() {
 
   const loadRestaurants = async () => {
     try {
-      const data = await api.getRestaurants();
+      const data = await api.getRestaurantsInViewport(
+        VIEWPORT.south,
+        VIEWPORT.west,
+        VIEWPORT.north,
+        VIEWPORT.east
+      );
       setRestaurants(data);
     } catch (error) {
       console.error('Error loading restaurants:', error);
     }
   };
 
-  const renderPin = (restaurant: Restaurant, index: number) => {
+  const renderPin = (restaurant: RestaurantSummary, index: number) => {
     // Simple positioning based on lat/long
     const x = ((restaurant.longitude + 74) * width) / 0.03;
     const y = ((40.76 - restaurant.latitude) * height) / 0.02;
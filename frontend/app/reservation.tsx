@@ -124,9 +124,9 @@ export default function ReservationScreen() {
         clearCart();
       }
       router.replace('/reservation-confirmation');
-    } catch (error) {
+    } catch (error: any) {
       console.error('Error creating reservation:', error);
-      Alert.alert('Error', 'Failed to create reservation. Please try again.');
+      Alert.alert('Error', error?.message || 'Failed to create reservation. Please try again.');
     } finally {
       setLoading(false);
     }
@@ -135,6 +135,9 @@ export default function ReservationScreen() {
   const renderTablesStep = () => (
     <FloorPlanSelector
       restaurantId={currentRestaurant?.id || ''}
+      date={selectedDate}
+      time={selectedTime}
+      duration={duration}
       onTablesSelected={(tables, capacity) => {
         setSelectedTables(tables);
         setTotalCapacity(capacity);
@@ -11,7 +11,7 @@ import {
 } from 'react-native';
 import { Ionicons } from '@expo/vector-icons';
 import { useLocalSearchParams, useRouter } from 'expo-router';
-import { api } from '../../utils/api';
+import { api, mediaUri } from '../../utils/api';
 import { Restaurant, MenuItem } from '../../types';
 import { useStore } from '../../store/useStore';
 
@@ -65,7 +65,7 @@ export default function RestaurantDetailScreen() {
     <View style={styles.menuItem}>
       {item.image ? (
         <Image 
-          source={{ uri: item.image }} 
+          source={{ uri: mediaUri(item.image, 160) }} 
           style={styles.menuItemImage}
           resizeMode="cover"
         />
@@ -23,6 +23,10 @@ interface Table {
 
 interface FloorPlanSelectorProps {
   restaurantId: string;
+  // The reservation's slot: tables booked over it are shown as unavailable
+  date: string;
+  time: string;
+  duration: number;
   onTablesSelected: (tables: Table[], totalCapacity: number) => void;
   selectedTables: Table[];
 }
@@ -40,6 +44,9 @@ const getTableSize = (capacity: number) => {
 
 export default function FloorPlanSelector({
   restaurantId,
+  date,
+  time,
+  duration,
   onTablesSelected,
   selectedTables,
 }: FloorPlanSelectorProps) {
@@ -48,14 +55,24 @@ export default function FloorPlanSelector({
 
   useEffect(() => {
     loadFloorPlan();
-  }, [restaurantId]);
+  }, [restaurantId, date, time, duration]);
 
   const loadFloorPlan = async () => {
     try {
       setLoading(true);
-      const response = await fetch(`${BACKEND_URL}/api/restaurants/${restaurantId}/floor-plan`);
+      const params = new URLSearchParams({ date, time, duration: String(duration) });
+      const response = await fetch(`${BACKEND_URL}/api/restaurants/${restaurantId}/floor-plan?${params}`);
       const data = await response.json();
-      setTables(data.tables || []);
+      const loaded: Table[] = data.tables || [];
+      setTables(loaded);
+
+      // Drop selected tables that are booked at the new slot
+      const stillFree = selectedTables.filter((s) =>
+        loaded.some((t) => t.tableNumber === s.tableNumber && t.available)
+      );
+      if (stillFree.length !== selectedTables.length) {
+        onTablesSelected(stillFree, stillFree.reduce((sum, t) => sum + t.capacity, 0));
+      }
     } catch (error) {
       console.error('Error loading floor plan:', error);
     } finally {
@@ -10,7 +10,7 @@ export interface MenuCategory {
   items: MenuItem[];
 }
 
-export interface Restaurant {
+export interface RestaurantSummary {
   id: string;
   name: string;
   logo?: string;
@@ -23,10 +23,13 @@ export interface Restaurant {
   deliveryTime: string;
   latitude: number;
   longitude: number;
-  menu: MenuCategory[];
   openingHours?: string;
 }
 
+export interface Restaurant extends RestaurantSummary {
+  menu: MenuCategory[];
+}
+
 export interface CartItem {
   name: string;
   price: number;
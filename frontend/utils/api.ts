@@ -1,26 +1,70 @@
 import Constants from 'expo-constants';
-import { Restaurant, Order, Reservation } from '../types';
+import { MenuCategory, Restaurant, RestaurantSummary, Order, Reservation } from '../types';
 
 const BACKEND_URL = Constants.expoConfig?.extra?.EXPO_PUBLIC_BACKEND_URL || process.env.EXPO_PUBLIC_BACKEND_URL || '';
 
 const API_BASE = `${BACKEND_URL}/api`;
 
+// Images stored by the API are referenced as /api/media/<hash>; `width` picks a thumbnail
+export const mediaUri = (uri: string, width?: number): string => {
+  if (!uri.startsWith('/api/media/')) return uri;
+  return `${BACKEND_URL}${uri}${width ? `?w=${width}` : ''}`;
+};
+
+// Last body and ETag seen per catalog URL; revalidated with If-None-Match
+const etagCache = new Map<string, { etag: string; data: any }>();
+
+const fetchCatalog = async (url: string): Promise<any> => {
+  const cached = etagCache.get(url);
+  const response = await fetch(url, cached ? { headers: { 'If-None-Match': cached.etag } } : undefined);
+  if (response.status === 304 && cached) {
+    return cached.data;
+  }
+  const data = await response.json();
+  const etag = response.headers.get('ETag');
+  if (response.ok && etag) {
+    etagCache.set(url, { etag, data });
+  }
+  return data;
+};
+
 export const api = {
   // Restaurants
-  getRestaurants: async (search?: string, cuisine?: string): Promise<Restaurant[]> => {
+  getRestaurants: async (search?: string, cuisine?: string): Promise<RestaurantSummary[]> => {
     const params = new URLSearchParams();
     if (search) params.append('search', search);
     if (cuisine) params.append('cuisine', cuisine);
     const url = `${API_BASE}/restaurants${params.toString() ? '?' + params.toString() : ''}`;
-    const response = await fetch(url);
+    return fetchCatalog(url);
+  },
+
+  getNearbyRestaurants: async (lat: number, lng: number, radius?: number): Promise<RestaurantSummary[]> => {
+    const params = new URLSearchParams({ lat: String(lat), lng: String(lng) });
+    if (radius) params.append('radius', String(radius));
+    const response = await fetch(`${API_BASE}/restaurants/nearby?${params.toString()}`);
     return response.json();
   },
 
-  getRestaurant: async (id: string): Promise<Restaurant> => {
-    const response = await fetch(`${API_BASE}/restaurants/${id}`);
+  getRestaurantsInViewport: async (south: number, west: number, north: number, east: number): Promise<RestaurantSummary[]> => {
+    const params = new URLSearchParams({
+      south: String(south),
+      west: String(west),
+      north: String(north),
+      east: String(east),
+    });
+    const response = await fetch(`${API_BASE}/restaurants/within?${params.toString()}`);
     return response.json();
   },
 
+  getRestaurant: async (id: string): Promise<Restaurant> => {
+    return fetchCatalog(`${API_BASE}/restaurants/${id}`);
+  },
+
+  getMenu: async (id: string, category?: string): Promise<MenuCategory[]> => {
+    const params = category ? `?${new URLSearchParams({ category }).toString()}` : '';
+    return fetchCatalog(`${API_BASE}/restaurants/${id}/menu${params}`);
+  },
+
   // Orders
   createOrder: async (orderData: any): Promise<Order> => {
     const response = await fetch(`${API_BASE}/orders`, {
@@ -43,7 +87,12 @@ export const api = {
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify(reservationData),
     });
-    return response.json();
+    const data = await response.json();
+    if (!response.ok) {
+      // 409: the tables were booked meanwhile; detail carries alternative tables and times
+      throw new Error(data.detail?.message || data.detail || 'Failed to create reservation');
+    }
+    return data;
   },
 
   getReservations: async (): Promise<Reservation[]> => {
@@ -0,0 +1,147 @@
+import asyncio
+
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from admission import (
+    CRITICAL, EXEMPT, LOW, NORMAL, AdmissionController, AdmissionMiddleware, Overloaded, Policy, TokenBuckets,
+)
+
+POLICIES = {
+    CRITICAL: Policy(max_queue=4, queue_budget=1.0, share=1.0, retry_after=1),
+    NORMAL: Policy(max_queue=4, queue_budget=1.0, share=1.0, retry_after=2),
+    LOW: Policy(max_queue=1, queue_budget=0.05, share=0.5, retry_after=5),
+}
+
+
+def test_token_bucket_allows_a_burst_then_refills_at_the_rate():
+    buckets = TokenBuckets(rate=2, burst=3)
+    assert [buckets.take("a", now=0) for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("a", now=0) == 0.5
+    assert buckets.take("b", now=0) == 0
+    assert buckets.take("a", now=0.5) == 0
+    assert buckets.take("a", now=0.5) == 0.5 and buckets.stats()["limited"] == 2
+
+
+def test_token_buckets_forget_the_least_recently_seen_client():
+    buckets = TokenBuckets(rate=1, burst=1, max_clients=2)
+    buckets.take("a", now=0)
+    buckets.take("b", now=0)
+    buckets.take("a", now=0)
+    buckets.take("c", now=0)
+    assert list(buckets._buckets) == ["a", "c"]
+
+
+def test_freed_slots_go_to_the_most_important_waiter():
+    async def scenario():
+        controller = AdmissionController(2, POLICIES)
+        await controller.acquire(NORMAL)
+        await controller.acquire(NORMAL)
+        order = []
+
+        async def request(cls):
+            await controller.acquire(cls)
+            order.append(cls)
+
+        waiting = [asyncio.ensure_future(request(cls)) for cls in (NORMAL, CRITICAL)]
+        await asyncio.sleep(0)
+        assert controller.stats()["classes"][CRITICAL]["waiting"] == 1
+        controller.release()
+        await asyncio.sleep(0)
+        assert order == [CRITICAL]
+        controller.release()
+        await asyncio.gather(*waiting)
+        assert order == [CRITICAL, NORMAL] and controller.in_flight == 2
+
+    asyncio.run(scenario())
+
+
+def test_low_priority_is_limited_to_its_share_and_shed_when_queued_too_long():
+    async def scenario():
+        controller = AdmissionController(2, POLICIES)
+        await controller.acquire(LOW)
+        queued = asyncio.ensure_future(controller.acquire(LOW))
+        await asyncio.sleep(0)
+        try:
+            await controller.acquire(LOW)
+        except Overloaded as e:
+            assert (e.reason, e.retry_after) == ("queue full", 5)
+        # A slot is still free for a more important request
+        await controller.acquire(CRITICAL)
+        try:
+            await queued
+        except Overloaded as e:
+            assert e.reason == "queue timeout"
+        assert controller.stats()["classes"][LOW]["rejected"] == {"queue full": 1, "queue timeout": 1}
+        assert controller.in_flight == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiters_leave_the_queue_and_granted_ones_give_their_slot_back():
+    async def scenario():
+        controller = AdmissionController(1, POLICIES)
+        await controller.acquire(NORMAL)
+        waiter = asyncio.ensure_future(controller.acquire(NORMAL))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert controller.stats()["classes"][NORMAL]["waiting"] == 0
+
+        granted = asyncio.ensure_future(controller.acquire(NORMAL))
+        await asyncio.sleep(0)
+        controller.release()
+        granted.cancel()
+        await asyncio.gather(granted, return_exceptions=True)
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def make_app(controller, rate_limiter=None, client_header=None):
+    app = FastAPI()
+
+    @app.post("/api/orders")
+    async def create_order():
+        return {"ok": True}
+
+    @app.get("/api/restaurants")
+    async def restaurants():
+        return []
+
+    @app.get("/api/metrics")
+    async def metrics():
+        return "ok"
+
+    app.add_middleware(
+        AdmissionMiddleware, router=app.router, controller=controller, rate_limiter=rate_limiter,
+        priorities={"POST /api/orders": CRITICAL, "GET /api/restaurants": LOW, "GET /api/metrics": EXEMPT},
+        unmetered={"GET /api/metrics"}, client_header=client_header,
+    )
+    return app
+
+
+def test_middleware_sheds_with_503_and_rate_limits_with_429():
+    controller = AdmissionController(2, {**POLICIES, LOW: Policy(max_queue=0, queue_budget=1, share=0.5, retry_after=5)})
+    controller.in_flight = 1  # the low class's only slot is taken
+    client = TestClient(make_app(controller, TokenBuckets(rate=0.5, burst=2)))
+
+    shed = client.get("/api/restaurants")
+    assert shed.status_code == 503 and shed.headers["retry-after"] == "5"
+    assert client.post("/api/orders").status_code == 200
+    limited = client.post("/api/orders")
+    assert limited.status_code == 429 and limited.headers["retry-after"] == "2"
+    # Exempt and unmetered routes are always served
+    controller.in_flight = 2
+    assert all(client.get("/api/metrics").status_code == 200 for _ in range(5))
+    assert controller.in_flight == 2
+
+
+def test_rate_limit_keys_on_the_trusted_client_header():
+    client = TestClient(make_app(None, TokenBuckets(rate=0.5, burst=1), client_header="X-Forwarded-For"))
+
+    # Same proxy address, different users: each has its own bucket
+    assert client.post("/api/orders", headers={"X-Forwarded-For": "203.0.113.7"}).status_code == 200
+    assert client.post("/api/orders", headers={"X-Forwarded-For": "203.0.113.8"}).status_code == 200
+    # A spoofed first entry does not buy a fresh bucket: the proxy's entry is last
+    assert client.post("/api/orders", headers={"X-Forwarded-For": "10.0.0.1, 203.0.113.7"}).status_code == 429
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+
+from availability import AvailabilityEngine, DaySchedule, day_slots, interval_mask, parse_time, slot_range
+
+
+def booking(start, duration, *tables, date="2026-10-17"):
+    return {"date": date, "time": start, "duration": duration, "selectedTables": [{"tableNumber": t} for t in tables]}
+
+
+def engine_with(reservations, **kwargs):
+    calls = []
+
+    async def loader(restaurant_id, dates):
+        calls.append((restaurant_id, dates))
+        await asyncio.sleep(0)
+        return [r for r in reservations if r["date"] in dates]
+
+    return AvailabilityEngine(loader, **kwargs), calls
+
+
+def test_slot_arithmetic():
+    assert parse_time("19:30") == 19 * 60 + 30
+    assert slot_range("19:00", 60) == (76, 80)
+    assert slot_range("19:10", 30) == (76, 79)  # partially used slots count as booked
+    for bad in ("25:00", "19:75", "7pm", ""):
+        with pytest.raises(ValueError):
+            parse_time(bad)
+    with pytest.raises(ValueError):
+        slot_range("19:00", 0)
+
+
+def test_adjacent_bookings_do_not_conflict():
+    schedule = DaySchedule()
+    schedule.book(["T1"], interval_mask("19:00", 60))
+    assert schedule.is_free("T1", interval_mask("20:00", 60))
+    assert schedule.is_free("T1", interval_mask("18:00", 60))
+    assert not schedule.is_free("T1", interval_mask("19:45", 30))
+    assert schedule.is_free("T2", interval_mask("19:00", 60))
+
+
+def test_free_tables_from_loaded_reservations():
+    engine, calls = engine_with([booking("19:00", 90, "T1", "T2"), booking("not a time", 60, "T3")])
+
+    async def scenario():
+        free = await asyncio.gather(*(
+            engine.free_tables("r1", "2026-10-17", "20:00", 60, ["T1", "T2", "T3"]) for _ in range(5)
+        ))
+        assert free == [{"T3"}] * 5
+        assert await engine.free_tables("r1", "2026-10-17", "20:30", 60, ["T1", "T2", "T3"]) == {"T1", "T2", "T3"}
+
+    asyncio.run(scenario())
+    assert calls == [("r1", ["2026-10-16", "2026-10-17"])]
+
+
+def test_bookings_past_midnight_roll_over_to_the_next_day():
+    assert day_slots("2026-10-21", "23:30", 120) == [("2026-10-21", 94, 96), ("2026-10-22", 0, 6)]
+    assert day_slots("2026-12-31", "22:00", 120) == [("2026-12-31", 88, 96)]
+    assert day_slots("2026-12-31", "23:45", 30) == [("2026-12-31", 95, 96), ("2027-01-01", 0, 1)]
+    engine, _ = engine_with([booking("23:30", 120, "T1", date="2026-10-21")])
+
+    async def scenario():
+        assert await engine.free_tables("r1", "2026-10-22", "00:15", 60, ["T1", "T2"]) == {"T2"}
+        assert await engine.free_tables("r1", "2026-10-22", "01:30", 60, ["T1", "T2"]) == {"T1", "T2"}
+        # An early booking on the next day blocks a late one running into it
+        engine.record("r1", "2026-10-22", "01:00", 60, ["T2"])
+        assert await engine.free_tables("r1", "2026-10-21", "22:00", 240, ["T2", "T3"]) == {"T3"}
+
+    asyncio.run(scenario())
+
+
+def test_record_updates_cached_and_loading_schedules():
+    engine, _ = engine_with([])
+
+    async def scenario():
+        loading = asyncio.ensure_future(engine.schedule("r1", "2026-10-17"))
+        await asyncio.sleep(0)
+        engine.record("r1", "2026-10-17", "19:00", 60, ["T1"])
+        await loading
+        assert await engine.free_tables("r1", "2026-10-17", "19:30", 30, ["T1", "T2"]) == {"T2"}
+        engine.record("r1", "2026-10-17", "19:00", 60, ["T2"])
+        assert await engine.free_tables("r1", "2026-10-17", "19:30", 30, ["T1", "T2"]) == set()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_a_shared_load():
+    engine, calls = engine_with([booking("19:00", 60, "T1")])
+
+    async def scenario():
+        first = asyncio.ensure_future(engine.schedule("r1", "2026-10-17"))
+        second = asyncio.ensure_future(engine.schedule("r1", "2026-10-17"))
+        await asyncio.sleep(0)
+        first.cancel()
+        schedule = await second
+        assert first.cancelled()
+        return schedule
+
+    schedule = asyncio.run(scenario())
+    assert schedule.free_tables(["T1", "T2"], interval_mask("19:30", 30)) == ["T2"]
+    assert len(calls) == 1
+
+
+def test_expired_schedules_are_reloaded():
+    engine, calls = engine_with([], ttl_seconds=0)
+
+    async def scenario():
+        await engine.schedule("r1", "2026-10-17")
+        await engine.schedule("r1", "2026-10-17")
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_busy_day_query_is_sub_millisecond():
+    tables = [f"T{i}" for i in range(200)]
+    schedule = DaySchedule()
+    for i in range(5000):
+        schedule.book([tables[i % len(tables)]], interval_mask(f"{11 + i % 11}:{(i % 4) * 15:02d}", 90))
+    mask = interval_mask("20:00", 60)
+
+    started = time.perf_counter()
+    for _ in range(100):
+        schedule.free_tables(tables, mask)
+    assert (time.perf_counter() - started) / 100 < 0.001
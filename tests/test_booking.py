@@ -0,0 +1,134 @@
+import asyncio
+import random
+from collections import defaultdict
+
+import pytest
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+import server
+
+from availability import slot_range
+from booking import TableConflict, claim_documents, claim_tables
+
+
+class FakeClaims:
+    """In-memory stand-in for the claims collection with a unique ``_id`` index.
+
+    Every write yields to the event loop, so concurrent bookings interleave at
+    each claim the way independent requests to Mongo would.
+    """
+
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_many(self, docs, ordered=True):
+        assert ordered
+        for index, doc in enumerate(docs):
+            await asyncio.sleep(0)
+            if doc["_id"] in self.docs:
+                raise BulkWriteError({
+                    "writeErrors": [{"index": index, "code": 11000, "errmsg": "E11000 duplicate key"}],
+                    "nInserted": index,
+                })
+            self.docs[doc["_id"]] = dict(doc)
+
+    async def delete_many(self, query):
+        await asyncio.sleep(0)
+        for key in [k for k, d in self.docs.items() if d["reservationId"] == query["reservationId"]]:
+            del self.docs[key]
+
+
+def test_claim_documents_cover_every_table_slot():
+    docs = claim_documents("res1", "r1", "2026-10-17", ["T2", "T1", "T2"], "19:00", 30)
+    assert [d["_id"] for d in docs] == [
+        "r1:2026-10-17:T1:76", "r1:2026-10-17:T1:77", "r1:2026-10-17:T2:76", "r1:2026-10-17:T2:77",
+    ]
+
+
+def test_claims_past_midnight_are_made_on_the_next_day():
+    docs = claim_documents("res1", "r1", "2026-10-21", ["T1"], "23:30", 45)
+    assert [(d["_id"], d["date"]) for d in docs] == [
+        ("r1:2026-10-21:T1:94", "2026-10-21"), ("r1:2026-10-21:T1:95", "2026-10-21"),
+        ("r1:2026-10-22:T1:0", "2026-10-22"),
+    ]
+    claims = FakeClaims()
+
+    async def scenario():
+        await claim_tables(claims, "a", "r1", "2026-10-21", ["T1"], "23:30", 120)
+        with pytest.raises(TableConflict):
+            await claim_tables(claims, "b", "r1", "2026-10-22", ["T1"], "00:15", 60)
+
+    asyncio.run(scenario())
+
+
+def test_claims_use_the_canonical_date():
+    # Two spellings of a day claim the same slots
+    assert [d["_id"] for d in claim_documents("a", "r1", "2026-1-7", ["T1"], "19:00", 15)] == ["r1:2026-01-07:T1:76"]
+    assert claim_documents("a", "r1", "2026-1-7", ["T1"], "19:00", 15)[0]["expiresAt"] is not None
+    for bad in ("07/01/2026", "2026-13-01", "tomorrow", ""):
+        with pytest.raises(ValueError):
+            claim_documents("a", "r1", bad, ["T1"], "19:00", 15)
+
+
+def test_reservation_date_and_time_are_validated_and_normalized():
+    fields = {"restaurantId": "r1", "restaurantName": "Bistro", "people": 2}
+    reservation = server.ReservationCreate(**fields, date="2026-1-7", time="7:05")
+    assert (reservation.date, reservation.time) == ("2026-01-07", "07:05")
+    suggestion = server.TableSuggestionRequest(people=2, date="2026-10-17", time="19:30")
+    assert (suggestion.date, suggestion.time) == ("2026-10-17", "19:30")
+    for bad in ({"date": "17.10.2026", "time": "19:00"}, {"date": "2026-10-17", "time": "25:00"},
+                {"date": "2026-10-17", "time": "7pm"}):
+        with pytest.raises(ValidationError):
+            server.ReservationCreate(**fields, **bad)
+        with pytest.raises(ValidationError):
+            server.TableSuggestionRequest(people=2, **bad)
+
+
+def test_conflicting_booking_is_rejected_without_leftover_claims():
+    claims = FakeClaims()
+
+    async def scenario():
+        await claim_tables(claims, "a", "r1", "2026-10-17", ["T1"], "19:00", 60)
+        with pytest.raises(TableConflict) as conflict:
+            await claim_tables(claims, "b", "r1", "2026-10-17", ["T2", "T1"], "19:45", 60)
+        assert conflict.value.tables == ["T1"]
+        await claim_tables(claims, "c", "r1", "2026-10-17", ["T1"], "20:00", 60)
+
+    asyncio.run(scenario())
+    assert {d["reservationId"] for d in claims.docs.values()} == {"a", "c"}
+
+
+def test_concurrent_booking_stress_never_double_books():
+    rng = random.Random(7)
+    tables = [f"T{i}" for i in range(12)]
+    times = [f"{h}:{m:02d}" for h in range(18, 22) for m in (0, 15, 30, 45)]
+    requests = [
+        (f"res{i}", rng.sample(tables, rng.randint(1, 3)), rng.choice(times), rng.choice([30, 60, 90, 120]))
+        for i in range(500)
+    ]
+    claims = FakeClaims()
+    booked = {}
+
+    async def book(reservation_id, wanted, start, duration):
+        try:
+            await claim_tables(claims, reservation_id, "r1", "2026-10-17", wanted, start, duration)
+        except TableConflict:
+            return
+        booked[reservation_id] = (wanted, slot_range(start, duration))
+
+    async def scenario():
+        await asyncio.gather(*(book(*request) for request in requests))
+
+    asyncio.run(scenario())
+
+    owners = defaultdict(set)
+    for reservation_id, (wanted, (first, last)) in booked.items():
+        for table in wanted:
+            for slot in range(first, last):
+                owners[(table, slot)].add(reservation_id)
+    assert booked
+    assert all(len(holders) == 1 for holders in owners.values())
+    # Rejected bookings left nothing behind, successful ones hold exactly their slots
+    assert {d["reservationId"] for d in claims.docs.values()} == set(booked)
+    assert len(claims.docs) == len(owners)
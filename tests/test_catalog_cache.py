@@ -0,0 +1,134 @@
+import asyncio
+import gzip
+
+import pytest
+
+from catalog_cache import CachedResponse, CatalogCache, etag_matches, serialize
+
+
+def test_hits_misses_and_single_flight_loading():
+    cache = CatalogCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"[]"
+
+    async def scenario():
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(10)))
+        assert results == [b"[]"] * 10
+        assert await cache.get_or_load("k", loader) == b"[]"
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 10
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_load():
+    cache = CatalogCache()
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return b"[]"
+
+    async def scenario():
+        leader = asyncio.ensure_future(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == b"[]"
+        assert leader.cancelled()
+        assert cache.get("k") == b"[]"
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_bump_version_invalidates_entries():
+    cache = CatalogCache()
+    cache.set("k", 1)
+    assert cache.bump_version() == 1
+    assert cache.get("k") is None
+
+
+def test_value_loaded_across_a_version_bump_is_not_cached():
+    cache = CatalogCache()
+
+    async def loader():
+        cache.bump_version()
+        return "stale"
+
+    assert asyncio.run(cache.get_or_load("k", loader)) == "stale"
+    assert cache.get("k") is None
+
+
+def test_lru_eviction_and_ttl():
+    cache = CatalogCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.evictions == 1
+
+    expired = CatalogCache(ttl_seconds=-1)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+
+
+def test_loader_errors_are_not_cached():
+    cache = CatalogCache()
+
+    async def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_load("k", failing))
+    assert len(cache) == 0
+
+
+def test_serialize_matches_fastapi_json_response():
+    assert serialize({"name": "Café", "tables": [1, 2]}) == '{"name":"Café","tables":[1,2]}'.encode()
+
+
+def test_cached_response_etag_is_a_content_hash():
+    first = CachedResponse(b'[{"name":"Bella Italia"}]')
+    assert first.etag == CachedResponse(b'[{"name":"Bella Italia"}]').etag
+    assert first.etag != CachedResponse(b'[{"name":"Sushi Master"}]').etag
+    assert first.etag.startswith('"') and first.etag.endswith('"')
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, False),
+        ("", False),
+        ("*", True),
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"xyz", "abc"', True),
+        ('"xyz"', False),
+        ("abc", False),
+    ],
+)
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
+
+
+def test_cached_response_compresses_each_encoding_once():
+    cached = CachedResponse(serialize([{"name": "Bella Italia", "logo": "https://example.com/logo.png"}] * 50))
+    gzipped = cached.encoded("gzip")
+    assert gzip.decompress(gzipped) == cached.body
+    assert cached.encoded("gzip") is gzipped
+    assert cached.encoded(None) is cached.body
+    assert cached.encoded_etag("gzip") == cached.etag[:-1] + '-gzip"'
+
+    small = CachedResponse(b"[]")
+    assert small.encoded("gzip") is small.body
+    assert small.encoded_etag("gzip") == small.etag
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import server
+
+
+class StandaloneRestaurants:
+    """A restaurants collection on a standalone mongod: no change streams."""
+
+    def __init__(self, *docs):
+        self.docs = list(docs)
+
+    def watch(self, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets", code=40573)
+
+    async def _iterate(self):
+        for doc in self.docs:
+            await asyncio.sleep(0)
+            yield doc
+
+    def find(self, query, projection):
+        return self._iterate()
+
+
+def test_without_a_change_stream_the_search_index_is_rebuilt(monkeypatch, caplog):
+    restaurants = StandaloneRestaurants({"_id": ObjectId(), "name": "Bella Italia", "cuisine": "Italian", "rating": 4.7})
+    monkeypatch.setattr(server, "db", SimpleNamespace(restaurants=restaurants))
+    monkeypatch.setattr(server, "search_index", server.RestaurantSearchIndex())
+    monkeypatch.setattr(server, "SEARCH_INDEX_REBUILD_SECONDS", 0.01)
+
+    async def scenario():
+        await server.build_search_index()
+        watcher = asyncio.ensure_future(server.watch_catalog_changes())
+        # Written by another process after startup
+        added = {"_id": ObjectId(), "name": "Sushi Master", "cuisine": "Japanese", "rating": 4.8}
+        restaurants.docs.append(added)
+        try:
+            for _ in range(100):
+                if server.search_index.search("sushi"):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            watcher.cancel()
+        return str(added["_id"])
+
+    with caplog.at_level(logging.WARNING):
+        added_id = asyncio.run(scenario())
+    assert server.search_index.search("sushi") == [added_id]
+    assert len(server.search_index) == 2
+    assert "change stream unavailable" in caplog.text
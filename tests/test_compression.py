@@ -0,0 +1,93 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from compression import CompressionMiddleware, compress, negotiate_encoding
+
+BODY = b'{"name":"Bella Italia","logo":"https://images.example.com/bella.png"}\n' * 100
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("*;q=0, gzip", "gzip"),
+        ("GZIP;Q=0.8", "gzip"),
+        ("gzip;q=abc", None),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header, supported=("br", "gzip")) == expected
+
+
+def test_compress_gzip_round_trip():
+    assert gzip.decompress(compress(BODY, "gzip")) == BODY
+    with pytest.raises(ValueError):
+        compress(BODY, "deflate")
+
+
+def test_compress_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    assert brotli.decompress(compress(BODY, "br")) == BODY
+
+
+def make_client():
+    async def chunks():
+        for _ in range(10):
+            yield BODY[:500]
+
+    routes = [
+        Route("/json", lambda request: Response(BODY, media_type="application/json")),
+        Route("/small", lambda request: Response(b"[]", media_type="application/json")),
+        Route("/image", lambda request: Response(BODY, media_type="image/png")),
+        Route("/stream", lambda request: StreamingResponse(chunks(), media_type="application/x-ndjson")),
+        Route("/events", lambda request: StreamingResponse(chunks(), media_type="text/event-stream")),
+        Route(
+            "/precompressed",
+            lambda request: Response(
+                compress(BODY, "gzip"), media_type="application/json", headers={"Content-Encoding": "gzip"}
+            ),
+        ),
+        Route("/text", lambda request: PlainTextResponse("plain " * 500)),
+    ]
+    return TestClient(CompressionMiddleware(Starlette(routes=routes)))
+
+
+def test_middleware_compresses_eligible_responses():
+    client = make_client()
+    response = client.get("/json", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BODY)
+    assert response.content == BODY
+
+    streamed = client.get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.content == BODY[:500] * 10
+
+    assert client.get("/text", headers={"Accept-Encoding": "gzip"}).headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.parametrize("path", ["/small", "/image", "/events"])
+def test_middleware_skips_small_binary_and_event_stream_responses(path):
+    response = make_client().get(path, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_middleware_leaves_identity_and_precompressed_responses_alone():
+    client = make_client()
+    assert "content-encoding" not in client.get("/json", headers={"Accept-Encoding": "identity"}).headers
+    response = client.get("/precompressed", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == BODY
@@ -0,0 +1,96 @@
+import asyncio
+
+from events import HEARTBEAT, EventHub
+
+
+async def take(stream, count):
+    return [await stream.__anext__() for _ in range(count)]
+
+
+def test_events_reach_only_subscribers_of_their_topic():
+    hub = EventHub()
+
+    async def scenario():
+        first, second = hub.stream(["order:1"]), hub.stream(["order:2"])
+        assert (await take(first, 1))[0].startswith(b"retry:")
+        await take(second, 1)
+        event_id = hub.publish("order:1", "order.status", {"id": "1", "status": "completed"})
+        frame = await first.__anext__()
+        assert frame == (
+            f"id: {event_id}\nevent: order.status\n".encode() + b'data: {"id":"1","status":"completed"}\n\n'
+        )
+        assert hub.stats()["delivered"] == 1
+        await first.aclose()
+        await second.aclose()
+
+    asyncio.run(scenario())
+    assert len(hub) == 0 and hub.stats()["topics"] == 0
+
+
+def test_reconnecting_with_last_event_id_replays_missed_events():
+    hub = EventHub()
+    seen = hub.publish("order:1", "order.status", {"status": "active"})
+    hub.publish("order:2", "order.status", {"status": "active"})
+    missed = hub.publish("order:1", "order.status", {"status": "completed"})
+
+    async def scenario():
+        stream = hub.stream(["order:1"], last_event_id=seen)
+        _, replayed = await take(stream, 2)
+        await stream.aclose()
+        return replayed
+
+    assert asyncio.run(scenario()).startswith(f"id: {missed}\n".encode())
+    assert hub.replay({"order:1"}, missed) == []
+
+
+def test_unknown_or_expired_event_ids_cannot_be_replayed():
+    hub = EventHub(history_size=2)
+    first = hub.publish("order:1", "order.status", {})
+    for _ in range(3):
+        hub.publish("order:1", "order.status", {})
+    assert hub.replay({"order:1"}, first) is None
+    assert hub.replay({"order:1"}, "otherepoch-4") is None
+    assert hub.replay({"order:1"}, f"{hub.epoch}-99") is None
+    assert hub.replay({"order:1"}, "garbage") is None
+    assert len(hub.replay({"order:1"}, f"{hub.epoch}-2")) == 2
+
+    async def scenario():
+        stream = hub.stream(["order:1"], last_event_id=first)
+        _, reset = await take(stream, 2)
+        await stream.aclose()
+        return reset
+
+    assert asyncio.run(scenario()).startswith(b"event: reset\n")
+
+
+def test_slow_subscriber_is_disconnected_with_a_reset():
+    hub = EventHub(queue_size=2)
+
+    async def scenario():
+        stream = hub.stream(["order:1"])
+        await take(stream, 1)
+        for _ in range(3):
+            hub.publish("order:1", "order.status", {})
+        assert len(hub) == 0
+        frames = [frame async for frame in stream]
+        return frames
+
+    frames = asyncio.run(scenario())
+    assert frames[-1].startswith(b"event: reset\n")
+    assert hub.stats()["dropped"] == 1
+
+
+def test_heartbeat_reaches_every_subscriber():
+    hub = EventHub()
+
+    async def scenario():
+        streams = [hub.stream([f"order:{i}"]) for i in range(3)]
+        for stream in streams:
+            await take(stream, 1)
+        await hub.heartbeat()
+        frames = [await stream.__anext__() for stream in streams]
+        for stream in streams:
+            await stream.aclose()
+        return frames
+
+    assert asyncio.run(scenario()) == [HEARTBEAT] * 3
@@ -0,0 +1,138 @@
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from starlette.testclient import TestClient
+
+import server
+from export import csv_chunks, export_chunks, export_filter, ndjson_chunks
+
+
+def orders(count):
+    return [
+        {
+            "_id": ObjectId(),
+            "createdAt": datetime(2024, 5, 1, 12, i % 60),
+            "restaurantName": "Bella, \"Italia\"",
+            "totalPrice": 10.5 + i,
+            "deliveryAddress": None,
+            "items": [{"name": "Pizza", "quantity": 2}],
+        }
+        for i in range(count)
+    ]
+
+
+async def aiter(docs):
+    for doc in docs:
+        yield doc
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_export_filter_is_half_open():
+    since, until = datetime(2024, 1, 1), datetime(2024, 2, 1)
+    assert export_filter() == {}
+    assert export_filter(since=since) == {"createdAt": {"$gte": since}}
+    assert export_filter(since, until) == {"createdAt": {"$gte": since, "$lt": until}}
+
+
+def test_export_filter_converts_bounds_to_naive_utc():
+    since = datetime(2024, 1, 1, 2, tzinfo=timezone(timedelta(hours=2)))
+    assert export_filter(since, datetime(2024, 2, 1)) == {
+        "createdAt": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)},
+    }
+
+
+def test_ndjson_yields_one_chunk_per_batch():
+    docs = orders(5)
+    chunks = asyncio.run(collect(ndjson_chunks(aiter(docs), batch_size=2)))
+    assert len(chunks) == 3
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [str(d["_id"]) for d in docs]
+    assert json.loads(lines[0])["createdAt"] == "2024-05-01T12:00:00"
+
+
+def test_csv_quotes_values_and_encodes_nested_fields_as_json():
+    docs = orders(3)
+    columns = ("id", "createdAt", "restaurantName", "deliveryAddress", "items")
+    chunks = asyncio.run(collect(csv_chunks(aiter(docs), columns, batch_size=10)))
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0] == list(columns)
+    assert rows[1] == [
+        str(docs[0]["_id"]), "2024-05-01T12:00:00", 'Bella, "Italia"', "", '[{"name":"Pizza","quantity":2}]',
+    ]
+    assert len(rows) == 4
+
+
+def test_csv_without_matches_is_just_the_header():
+    chunks = asyncio.run(collect(csv_chunks(aiter([]), ("id", "status"))))
+    assert b"".join(chunks) == b"id,status\r\n"
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+        self.closed = False
+        self.calls = {}
+
+    def sort(self, keys):
+        self.calls["sort"] = keys
+        return self
+
+    def batch_size(self, size):
+        self.calls["batch_size"] = size
+        return self
+
+    def __aiter__(self):
+        return aiter(self.docs)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.cursor = FakeCursor(docs)
+
+    def find(self, query, projection):
+        self.cursor.calls["find"] = (query, projection)
+        return self.cursor
+
+
+def test_export_chunks_configures_and_closes_the_cursor():
+    collection = FakeCollection(orders(4))
+    chunks = asyncio.run(collect(export_chunks(collection, {}, {"items": 1}, "ndjson", (), batch_size=3)))
+    assert len(chunks) == 2
+    assert collection.cursor.calls["sort"] == [("createdAt", 1), ("_id", 1)]
+    assert collection.cursor.calls["batch_size"] == 3
+    assert collection.cursor.closed
+
+
+def test_export_chunks_closes_the_cursor_when_the_client_disconnects():
+    collection = FakeCollection(orders(10))
+
+    async def scenario():
+        chunks = export_chunks(collection, {}, {}, "csv", ("id",), batch_size=2)
+        await chunks.__anext__()
+        await chunks.aclose()
+
+    asyncio.run(scenario())
+    assert collection.cursor.closed
+
+
+def test_export_endpoint_accepts_mixed_bounds(monkeypatch):
+    collection = FakeCollection([])
+    monkeypatch.setattr(server, "db", {"orders": collection})
+    client = TestClient(server.app)
+
+    response = client.get("/api/export/orders", params={"since": "2024-01-01T00:00:00Z", "until": "2024-02-01T00:00:00"})
+    assert response.status_code == 200
+    assert collection.cursor.calls["find"][0] == {"createdAt": {"$gte": datetime(2024, 1, 1), "$lt": datetime(2024, 2, 1)}}
+    # 01:00+02:00 is 23:00 UTC the day before: after until
+    inverted = {"since": "2024-01-01T01:00:00+02:00", "until": "2023-12-31T22:00:00"}
+    assert client.get("/api/export/orders", params=inverted).status_code == 400
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from typing import List, Optional
+
+import orjson
+import pytest
+from bson import ObjectId
+from pydantic import BaseModel, Field
+
+from fast_json import FastJSONResponse, api_document, api_documents, dumps, fill_defaults, model_projection
+
+
+class Item(BaseModel):
+    name: str
+    image: str = ""
+
+
+class Category(BaseModel):
+    category: str
+    items: List[Item]
+
+
+class Place(BaseModel):
+    id: Optional[str] = None
+    name: str
+    logo: str = ""
+    tags: List[str] = []
+    menu: List[Category] = []
+    featured: Optional[Item] = None
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+
+
+def test_model_projection_loads_the_model_fields_but_not_id():
+    assert model_projection(Place) == {"name": 1, "logo": 1, "tags": 1, "menu": 1, "featured": 1, "createdAt": 1}
+    assert model_projection(Item, "createdAt") == {"name": 1, "image": 1, "createdAt": 1}
+
+
+def test_api_document_renames_the_id_and_keeps_the_rest():
+    oid = ObjectId()
+    assert list(api_document({"name": "Bistro", "_id": oid, "logo": "x"})) == ["id", "name", "logo"]
+    assert api_document({"_id": oid, "name": "Bistro"}) == {"id": str(oid), "name": "Bistro"}
+    assert [d["id"] for d in api_documents([{"_id": oid}, {"_id": "plain"}])] == [str(oid), "plain"]
+
+
+def test_missing_fields_get_the_model_defaults_nested_ones_included():
+    created = datetime(2024, 5, 1, 12, 30)
+    doc = {
+        "_id": ObjectId(), "name": "Bistro", "createdAt": created,
+        "menu": [{"category": "Mains", "items": [{"name": "Soup"}, {"name": "Bread", "image": "/api/media/abc"}]}],
+        "featured": {"name": "Soup"},
+    }
+    out = api_document(doc, Place)
+    assert (out["logo"], out["tags"]) == ("", [])
+    assert out["menu"][0]["items"] == [{"name": "Soup", "image": ""}, {"name": "Bread", "image": "/api/media/abc"}]
+    assert out["featured"] == {"name": "Soup", "image": ""}
+    # Stored values win over defaults, and the result validates as the model did
+    assert out["createdAt"] == created
+    assert Place.model_validate(out).model_dump() == out
+    # Mutable defaults are not shared between documents
+    other = api_document({"_id": ObjectId(), "name": "Cafe"}, Place)
+    other["tags"].append("new")
+    assert out["tags"] == [] and Place.model_fields["tags"].default == []
+    assert isinstance(other["createdAt"], datetime)
+
+
+def test_fill_defaults_leaves_unexpected_shapes_alone():
+    doc = {"name": "Bistro", "menu": None, "featured": "not a dict"}
+    assert fill_defaults(doc, Place)["menu"] is None
+    assert doc["featured"] == "not a dict"
+
+
+def test_dumps_encodes_object_ids_datetimes_and_models():
+    oid = ObjectId()
+    body = json.loads(dumps({"id": oid, "at": datetime(2024, 5, 1, 12, 30, 5), "item": Item(name="Soup")}))
+    assert body == {"id": str(oid), "at": "2024-05-01T12:30:05", "item": {"name": "Soup", "image": ""}}
+    with pytest.raises(orjson.JSONEncodeError):
+        dumps({"unknown": object()})
+
+
+def test_fast_json_response_renders_documents():
+    oid = ObjectId()
+    response = FastJSONResponse(api_documents([{"_id": oid, "name": "Bistro"}], Place), headers={"X-Next-Cursor": "c"})
+    assert response.media_type == "application/json"
+    assert response.headers["x-next-cursor"] == "c"
+    assert json.loads(response.body)[0]["id"] == str(oid)
+    assert json.loads(response.body)[0]["logo"] == ""
@@ -0,0 +1,92 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from starlette.testclient import TestClient
+
+import server
+from floor_plans import FLOOR_PLAN_TEMPLATES, FloorPlanStore, validate_rooms
+
+
+def plan_doc(restaurant_id, version, *rooms):
+    return {"_id": restaurant_id, "version": version, "rooms": list(rooms)}
+
+
+def room(room_id, *tables):
+    return {"id": room_id, "name": room_id.title(), "tables": [
+        {"tableNumber": t, "capacity": 4, "x": 0, "y": 0, "available": True} for t in tables
+    ]}
+
+
+def test_templates_have_unique_table_numbers():
+    for rooms in FLOOR_PLAN_TEMPLATES.values():
+        validate_rooms(rooms)
+    with pytest.raises(ValueError):
+        validate_rooms([room("main", "T1"), room("patio", "T1")])
+
+
+def test_stored_plan_is_flattened_with_precomputed_response():
+    store = FloorPlanStore()
+    plan = store.put(plan_doc("r1", 3, room("main", "T1", "T2"), room("patio", "P1")))
+    assert store.get("r1") is plan
+    assert [(t["tableNumber"], t["room"]) for t in plan.tables] == [("T1", "main"), ("T2", "main"), ("P1", "patio")]
+    body = json.loads(plan.response.body)
+    assert body["version"] == 3
+    assert body["rooms"] == [{"id": "main", "name": "Main"}, {"id": "patio", "name": "Patio"}]
+
+
+def test_older_versions_do_not_replace_newer_ones():
+    store = FloorPlanStore()
+    store.put(plan_doc("r1", 2, room("main", "T1")))
+    store.put(plan_doc("r1", 1, room("main", "OLD")))
+    assert [t["tableNumber"] for t in store.get("r1").tables] == ["T1"]
+    store.put(plan_doc("r1", 3, room("main", "NEW")))
+    assert [t["tableNumber"] for t in store.get("r1").tables] == ["NEW"]
+
+
+class FakePlans:
+    def __init__(self, *docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.reads = 0
+
+    async def find_one(self, query):
+        self.reads += 1
+        return self.docs.get(query["_id"])
+
+
+def test_restaurants_without_a_plan_have_none():
+    store = FloorPlanStore()
+    assert store.get("unknown") is None
+    assert asyncio.run(store.fetch(FakePlans(), "unknown")) is None
+    assert store.get("unknown") is None
+
+
+def test_plan_stored_by_another_worker_is_fetched_once():
+    store, plans = FloorPlanStore(), FakePlans(plan_doc("r1", 1, room("main", "T1")))
+    first = asyncio.run(store.fetch(plans, "r1"))
+    assert [t["tableNumber"] for t in first.tables] == ["T1"]
+    assert asyncio.run(store.fetch(plans, "r1")) is first
+    assert plans.reads == 1
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "db", SimpleNamespace(floor_plans=FakePlans()))
+    monkeypatch.setattr(server, "floor_plan_store", FloorPlanStore())
+    # Without the context manager the startup handlers (and Mongo) are skipped
+    return TestClient(server.app)
+
+
+def test_unknown_restaurants_have_no_floor_plan_to_show_or_book(client):
+    unknown = str(ObjectId())
+    assert client.get(f"/api/restaurants/{unknown}/floor-plan").status_code == 404
+    assert client.get("/api/restaurants/not-an-id/floor-plan").status_code == 400
+    suggestion = {"people": 2, "date": "2026-10-17", "time": "19:00"}
+    assert client.post(f"/api/restaurants/{unknown}/table-suggestions", json=suggestion).status_code == 404
+    reservation = {
+        "restaurantId": unknown, "restaurantName": "Bella Italia", "date": "2026-10-17", "time": "19:00",
+        "people": 2, "selectedTables": [{"tableNumber": "T1", "capacity": 2}],
+    }
+    assert client.post("/api/reservations", json=reservation).status_code == 404
@@ -0,0 +1,123 @@
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from starlette.testclient import TestClient
+
+import server
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeRestaurants:
+    """Records the geo queries sent to Mongo and answers them with ``docs``."""
+
+    def __init__(self, docs=()):
+        self.docs = list(docs)
+        self.pipelines = []
+        self.finds = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return FakeCursor(self.docs)
+
+    def find(self, query, projection=None):
+        self.finds.append((query, projection))
+        return FakeCursor(self.docs)
+
+
+def summary(**overrides):
+    return {
+        "_id": ObjectId(), "name": "Bistro", "cuisine": "French", "rating": 4.5, "priceRange": "$$",
+        "address": "Main St 1", "city": "Bucharest", "deliveryTime": "30 min",
+        "latitude": 44.43, "longitude": 26.1, **overrides,
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(restaurants):
+        monkeypatch.setattr(server, "db", SimpleNamespace(restaurants=restaurants))
+        # Without the context manager the startup handlers (and Mongo) are skipped
+        return TestClient(server.app)
+    return install
+
+
+def test_viewport_polygon_is_a_closed_ring_in_geojson_order():
+    polygon = server.viewport_polygon(south=44.0, west=26.0, north=45.0, east=27.0)
+    assert polygon["type"] == "Polygon"
+    ring, = polygon["coordinates"]
+    assert ring == [[26.0, 44.0], [27.0, 44.0], [27.0, 45.0], [26.0, 45.0], [26.0, 44.0]]
+    assert ring[0] == ring[-1]
+
+
+def test_nearby_builds_a_geo_near_pipeline(client):
+    restaurants = FakeRestaurants([summary(distance=120.5)])
+
+    response = client(restaurants).get(
+        "/api/restaurants/nearby", params={"lat": 44.43, "lng": 26.1, "radius": 2000, "limit": 10, "cuisine": "French"},
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["distance"] == 120.5
+    pipeline, = restaurants.pipelines
+    assert pipeline[0] == {"$geoNear": {
+        "near": {"type": "Point", "coordinates": [26.1, 44.43]},
+        "distanceField": "distance", "maxDistance": 2000, "spherical": True, "query": {"cuisine": "French"},
+    }}
+    assert pipeline[1] == {"$limit": 10}
+    assert pipeline[2]["$project"] == {**server.SUMMARY_PROJECTION, "distance": 1}
+
+
+def test_nearby_without_cuisine_has_no_query(client):
+    restaurants = FakeRestaurants()
+    for cuisine in (None, "all"):
+        params = {"lat": 44.43, "lng": 26.1, **({"cuisine": cuisine} if cuisine else {})}
+        assert client(restaurants).get("/api/restaurants/nearby", params=params).json() == []
+    assert all("query" not in pipeline[0]["$geoNear"] for pipeline in restaurants.pipelines)
+    assert restaurants.pipelines[0][0]["$geoNear"]["maxDistance"] == 5000
+
+
+def test_within_builds_a_geo_within_query(client):
+    restaurants = FakeRestaurants([summary()])
+    viewport = {"south": 44.0, "west": 26.0, "north": 45.0, "east": 27.0}
+
+    response = client(restaurants).get("/api/restaurants/within", params={**viewport, "cuisine": "French"})
+    assert response.status_code == 200
+    assert [r["name"] for r in response.json()] == ["Bistro"]
+    (query, projection), = restaurants.finds
+    assert query == {
+        "location": {"$geoWithin": {"$geometry": server.viewport_polygon(**viewport)}},
+        "cuisine": "French",
+    }
+    assert projection == server.SUMMARY_PROJECTION
+
+
+@pytest.mark.parametrize("viewport", [
+    {"south": 45.0, "west": 26.0, "north": 44.0, "east": 27.0},  # south of north
+    {"south": 44.0, "west": 27.0, "north": 45.0, "east": 26.0},  # west of east
+    {"south": 44.0, "west": 26.0, "north": 44.0, "east": 27.0},  # empty
+])
+def test_inverted_bounding_box_is_refused(client, viewport):
+    restaurants = FakeRestaurants()
+    response = client(restaurants).get("/api/restaurants/within", params=viewport)
+    assert response.status_code == 400
+    assert restaurants.finds == []
+
+
+@pytest.mark.parametrize("path,params", [
+    ("/api/restaurants/within", {"south": -91, "west": 26.0, "north": 45.0, "east": 27.0}),
+    ("/api/restaurants/within", {"south": 44.0, "west": 26.0, "north": 45.0, "east": 181}),
+    ("/api/restaurants/within", {"south": 44.0, "west": 26.0, "north": 45.0}),
+    ("/api/restaurants/nearby", {"lat": 44.43, "lng": 26.1, "radius": 0}),
+    ("/api/restaurants/nearby", {"lat": 91, "lng": 26.1}),
+])
+def test_out_of_range_coordinates_are_refused(client, path, params):
+    restaurants = FakeRestaurants()
+    assert client(restaurants).get(path, params=params).status_code == 422
+    assert restaurants.finds == restaurants.pipelines == []
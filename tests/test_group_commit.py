@@ -0,0 +1,84 @@
+import asyncio
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from group_commit import GroupCommitWriter
+
+
+class FakeCollection:
+    def __init__(self, fail_ids=(), error=None):
+        self.batches = []
+        self.fail_ids = set(fail_ids)
+        self.error = error
+
+    async def insert_many(self, docs, ordered=True):
+        assert not ordered
+        await asyncio.sleep(0.001)
+        if self.error:
+            raise self.error
+        self.batches.append([d["_id"] for d in docs])
+        errors = [
+            {"index": i, "code": 11000, "errmsg": "E11000 duplicate key"}
+            for i, d in enumerate(docs) if d["_id"] in self.fail_ids
+        ]
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+
+def test_concurrent_inserts_are_coalesced():
+    collection = FakeCollection()
+    writer = GroupCommitWriter(collection, max_batch=100, max_linger_ms=5)
+
+    async def scenario():
+        return await asyncio.gather(*(writer.insert({"n": i}) for i in range(50)))
+
+    ids = asyncio.run(scenario())
+    assert collection.batches == [ids]
+    assert writer.stats()["batches"] == 1
+    assert writer.stats()["avgBatchSize"] == 50
+
+
+def test_full_batches_are_written_without_waiting_for_linger():
+    collection = FakeCollection()
+    writer = GroupCommitWriter(collection, max_batch=10, max_linger_ms=10_000)
+
+    async def scenario():
+        await asyncio.wait_for(asyncio.gather(*(writer.insert({"n": i}) for i in range(30))), timeout=1)
+
+    asyncio.run(scenario())
+    assert [len(b) for b in collection.batches] == [10, 10, 10]
+
+
+def test_each_caller_gets_its_own_error():
+    collection = FakeCollection(fail_ids={"b"})
+    writer = GroupCommitWriter(collection, max_batch=100, max_linger_ms=1)
+
+    async def scenario():
+        return await asyncio.gather(*(writer.insert({"_id": i}) for i in "abc"), return_exceptions=True)
+
+    a, b, c = asyncio.run(scenario())
+    assert (a, c) == ("a", "c")
+    assert isinstance(b, DuplicateKeyError)
+    assert writer.stats()["failedDocuments"] == 1
+
+
+def test_batch_failure_reaches_every_caller():
+    writer = GroupCommitWriter(FakeCollection(error=ConnectionError("down")), max_linger_ms=1)
+
+    async def scenario():
+        return await asyncio.gather(*(writer.insert({}) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, ConnectionError) for r in asyncio.run(scenario()))
+
+
+def test_flush_writes_pending_documents():
+    collection = FakeCollection()
+    writer = GroupCommitWriter(collection, max_linger_ms=10_000)
+
+    async def scenario():
+        pending = asyncio.ensure_future(writer.insert({"_id": "x"}))
+        await asyncio.sleep(0)
+        await writer.flush()
+        assert await pending == "x"
+
+    asyncio.run(scenario())
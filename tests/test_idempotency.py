@@ -0,0 +1,170 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+import idempotency
+from idempotency import IdempotencyStore, KeyInProgress, KeyReused, StoredResponse
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the idempotency records."""
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _matches(doc, query):
+        return all(doc.get(field) == value for field, value in query.items())
+
+    async def find_one(self, query):
+        await asyncio.sleep(0)
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(0)
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate key")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc and self._matches(doc, query):
+            doc.update(update["$set"])
+            return dict(doc)
+        return None
+
+    async def update_one(self, query, update):
+        doc = self.docs[query["_id"]]
+        doc.update(update["$set"])
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+
+    async def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc and self._matches(doc, query):
+            del self.docs[query["_id"]]
+
+
+def counting_handler(calls, status=200, delay=0.0):
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return StoredResponse(status, b'{"id":"%d"}' % len(calls))
+    return handler
+
+
+def test_retry_is_replayed_without_running_again():
+    store, calls = IdempotencyStore(FakeCollection()), []
+
+    async def scenario():
+        first = await store.execute("order", "k1", "f1", counting_handler(calls))
+        second = await store.execute("order", "k1", "f1", counting_handler(calls))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == (StoredResponse(200, b'{"id":"1"}'), False)
+    assert second == (StoredResponse(200, b'{"id":"1"}'), True)
+    assert calls == [1]
+    assert store.collection.docs["order:k1"]["status"] == "done"
+    assert "lockedUntil" not in store.collection.docs["order:k1"]
+
+
+def test_concurrent_requests_share_one_execution():
+    store, calls = IdempotencyStore(FakeCollection()), []
+
+    async def scenario():
+        return await asyncio.gather(*(
+            store.execute("order", "k1", "f1", counting_handler(calls, delay=0.01)) for _ in range(5)
+        ))
+
+    results = asyncio.run(scenario())
+    assert calls == [1]
+    assert {response for response, _ in results} == {StoredResponse(200, b'{"id":"1"}')}
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 4
+
+
+def test_key_reused_with_another_request_is_refused():
+    store, calls = IdempotencyStore(FakeCollection()), []
+
+    async def scenario():
+        await store.execute("order", "k1", "f1", counting_handler(calls))
+        with pytest.raises(KeyReused):
+            await store.execute("order", "k1", "f2", counting_handler(calls))
+        # Scopes keep keys apart
+        return await store.execute("reservation", "k1", "f2", counting_handler(calls))
+
+    assert asyncio.run(scenario())[1] is False
+    assert calls == [1, 1]
+
+
+def test_other_worker_replays_from_the_database():
+    collection, calls = FakeCollection(), []
+
+    async def scenario():
+        await IdempotencyStore(collection).execute("order", "k1", "f1", counting_handler(calls, status=409))
+        return await IdempotencyStore(collection).execute("order", "k1", "f1", counting_handler(calls))
+
+    assert asyncio.run(scenario()) == (StoredResponse(409, b'{"id":"1"}'), True)
+    assert calls == [1]
+
+
+def test_pending_key_elsewhere_is_waited_for(monkeypatch):
+    monkeypatch.setattr(idempotency, "POLL_INTERVAL_SECONDS", 0.001)
+    collection, calls = FakeCollection(), []
+
+    async def scenario():
+        running = asyncio.ensure_future(
+            IdempotencyStore(collection).execute("order", "k1", "f1", counting_handler(calls, delay=0.02))
+        )
+        await asyncio.sleep(0.005)
+        waited = await IdempotencyStore(collection).execute("order", "k1", "f1", counting_handler(calls))
+        await running
+        return waited
+
+    assert asyncio.run(scenario())[1] is True
+    assert calls == [1]
+
+    async def stuck():
+        now = datetime.utcnow()
+        collection.docs["order:k2"] = {
+            "_id": "order:k2", "fingerprint": "f1", "status": "pending",
+            "lockedUntil": now + timedelta(seconds=30), "expiresAt": now + timedelta(hours=1),
+        }
+        await IdempotencyStore(collection, wait_seconds=0.01).execute("order", "k2", "f1", counting_handler(calls))
+
+    with pytest.raises(KeyInProgress):
+        asyncio.run(stuck())
+    assert calls == [1]
+
+
+def test_failed_request_releases_its_key():
+    store, calls = IdempotencyStore(FakeCollection()), []
+
+    async def failing():
+        raise RuntimeError("database unavailable")
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await store.execute("order", "k1", "f1", failing)
+        assert store.collection.docs == {}
+        return await store.execute("order", "k1", "f1", counting_handler(calls))
+
+    assert asyncio.run(scenario())[1] is False
+    assert calls == [1]
+
+
+def test_expired_lease_is_taken_over():
+    collection, calls = FakeCollection(), []
+    now = datetime.utcnow()
+    collection.docs["order:k1"] = {
+        "_id": "order:k1", "fingerprint": "f1", "status": "pending",
+        "lockedUntil": now - timedelta(seconds=1), "expiresAt": now + timedelta(hours=1),
+    }
+
+    response, replayed = asyncio.run(IdempotencyStore(collection).execute("order", "k1", "f1", counting_handler(calls)))
+    assert not replayed
+    assert calls == [1]
+    assert collection.docs["order:k1"]["status"] == "done"
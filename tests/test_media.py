@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import io
+import re
+
+import pytest
+
+from media import (
+    INLINE_PATTERN, DiskBlobStore, MediaStore, RangeNotSatisfiable, decode_inline, parse_range, reference,
+)
+
+PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the media records."""
+
+    def __init__(self):
+        self.docs = {}
+        self.reads = 0
+
+    async def find_one(self, query):
+        await asyncio.sleep(0)
+        self.reads += 1
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    async def update_one(self, query, update, upsert=False):
+        if query["_id"] not in self.docs:
+            self.docs[query["_id"]] = {"_id": query["_id"], **update["$setOnInsert"]}
+
+
+def read_all(store, record, start=0, end=None):
+    async def collect():
+        return b"".join([chunk async for chunk in store.read(record, start, record.length if end is None else end)])
+    return asyncio.run(collect())
+
+
+def test_decode_inline_accepts_data_uris_and_bare_base64_images():
+    encoded = base64.b64encode(PNG).decode()
+    assert decode_inline(f"data:image/png;base64,{encoded}") == (PNG, "image/png")
+    assert decode_inline(encoded) == (PNG, "image/png")
+    # URLs, references, short strings and base64 of something else stay as they are
+    assert decode_inline("https://images.example.com/photo-1517248135467-4c7edcad34c4?w=400&q=80&fit=crop") is None
+    assert decode_inline(reference("a" * 64)) is None
+    assert decode_inline("") is None
+    assert decode_inline(base64.b64encode(b"plain text, not an image" * 4).decode()) is None
+
+
+def test_inline_pattern_skips_urls_and_references():
+    pattern = re.compile(INLINE_PATTERN)
+    assert pattern.match("data:image/png;base64,AAAA")
+    assert pattern.match(base64.b64encode(b"\xff\xd8\xff" + bytes(64)).decode())
+    assert not pattern.match(reference("a" * 64))
+    assert not pattern.match("https://images.example.com/" + "a" * 64)
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, None),
+    ("bytes=0-9", (0, 10)),
+    ("bytes=90-", (90, 100)),
+    ("bytes=-10", (90, 100)),
+    ("bytes=95-200", (95, 100)),
+    ("bytes=0-1,5-9", None),
+    ("items=0-9", None),
+    ("bytes=a-b", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=9-5", "bytes=-0"])
+def test_parse_range_outside_body(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 100)
+
+
+def test_externalize_replaces_inline_images_with_references(tmp_path):
+    store = MediaStore(FakeCollection(), DiskBlobStore(tmp_path), thumbnail_widths=())
+    encoded = base64.b64encode(PNG).decode()
+    restaurant = {
+        "logo": f"data:image/png;base64,{encoded}",
+        "heroImage": "https://images.example.com/hero.jpg",
+        "menu": [{"category": "Mains", "items": [{"name": "Soup", "image": encoded}, {"name": "Bread", "image": ""}]}],
+    }
+
+    assert asyncio.run(store.externalize(restaurant)) == 2
+    digest = restaurant["logo"].rsplit("/", 1)[1]
+    assert restaurant["menu"][0]["items"][0]["image"] == restaurant["logo"]
+    assert restaurant["heroImage"] == "https://images.example.com/hero.jpg"
+    assert restaurant["menu"][0]["items"][1]["image"] == ""
+    # Stored once, and a second pass finds nothing left to move
+    assert list(store.collection.docs) == [digest]
+    assert asyncio.run(store.externalize(restaurant)) == 0
+
+    record = asyncio.run(store.get(digest))
+    assert (record.content_type, record.length) == ("image/png", len(PNG))
+    assert read_all(store, record) == PNG
+    assert read_all(store, record, 8, 16) == PNG[8:16]
+
+
+def test_records_are_cached():
+    collection = FakeCollection()
+    store = MediaStore(collection, blobs=None)
+    collection.docs["d1"] = {"_id": "d1", "contentType": "image/png", "length": 3, "thumbnails": {}}
+
+    async def scenario():
+        return [await store.get("d1") for _ in range(3)]
+
+    first, *rest = asyncio.run(scenario())
+    assert all(record is first for record in rest)
+    assert collection.reads == 1
+
+
+def test_thumbnails_are_rendered_and_picked_by_width(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    out = io.BytesIO()
+    Image.new("RGB", (600, 300), (200, 40, 40)).save(out, "JPEG")
+    original = out.getvalue()
+    store = MediaStore(FakeCollection(), DiskBlobStore(tmp_path), thumbnail_widths=(160, 480, 800))
+
+    async def scenario():
+        record = await store.get(await store.put(original, "image/jpeg"))
+        return record, [await store.variant(record, width) for width in (None, 100, 160, 300, 600)]
+
+    record, variants = asyncio.run(scenario())
+    # Wider than the image: no 800 thumbnail
+    assert sorted(record.thumbnails) == [160, 480]
+    assert [v.digest for v in variants] == [
+        record.digest, record.thumbnails[160], record.thumbnails[160], record.thumbnails[480], record.digest,
+    ]
+    thumbnail = Image.open(io.BytesIO(read_all(store, variants[1])))
+    assert (thumbnail.format, thumbnail.size) == ("JPEG", (160, 80))
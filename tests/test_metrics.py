@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from fastapi import FastAPI
+from pymongo import monitoring
+from starlette.testclient import TestClient
+
+from metrics import (
+    Counter, Histogram, MetricsMiddleware, MongoCommandListener, MongoPoolListener, RouteResolver, http_in_flight,
+    http_requests, mongo_duration, mongo_failures, pool_checked_out, pool_checkout_failures, pool_connections,
+)
+
+ADDRESS = ("db.internal", 27017)
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/a")
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4',
+    ]
+
+
+def test_counter_escapes_label_values():
+    counter = Counter("things_total", "Things.", ("name",))
+    counter.inc('say "hi"\n')
+    counter.inc('say "hi"\n', amount=2)
+    assert counter.render() == [
+        "# HELP things_total Things.",
+        "# TYPE things_total counter",
+        'things_total{name="say \\"hi\\"\\n"} 3',
+    ]
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/api/orders/{order_id}")
+    async def get_order(order_id: str):
+        assert http_in_flight.value("GET", "/api/orders/{order_id}") == 1
+        return {"id": order_id}
+
+    @app.get("/api/orders/recent")
+    async def recent():
+        return []
+
+    app.add_middleware(MetricsMiddleware, router=app.router)
+    return app
+
+
+def test_route_resolver_uses_templates_not_raw_paths():
+    resolver = RouteResolver(make_app().router.routes)
+    scope = lambda method, path: {"type": "http", "method": method, "path": path, "root_path": ""}
+    assert resolver.resolve(scope("GET", "/api/orders/recent")) == "/api/orders/recent"
+    assert resolver.resolve(scope("GET", "/api/orders/abc")) == "/api/orders/{order_id}"
+    assert resolver.resolve(scope("DELETE", "/api/orders/abc")) == "/api/orders/{order_id}"
+    assert resolver.resolve(scope("GET", "/wp-admin")) == RouteResolver.UNMATCHED
+
+
+def test_middleware_counts_requests_per_route_and_status():
+    route = "/api/orders/{order_id}"
+    before = http_requests.value("GET", route, "200")
+    client = TestClient(make_app())
+    for order_id in ("a", "b", "c"):
+        assert client.get(f"/api/orders/{order_id}").status_code == 200
+    assert client.get("/nope").status_code == 404
+    assert http_requests.value("GET", route, "200") == before + 3
+    assert http_requests.value("GET", "unmatched", "404") >= 1
+    assert http_in_flight.value("GET", route) == 0
+
+
+def test_command_listener_times_commands_per_collection():
+    listener = MongoCommandListener()
+    before = mongo_duration.count("orders", "find")
+    listener.started(monitoring.CommandStartedEvent({"find": "orders", "filter": {}}, "app", 1, ADDRESS, 1))
+    listener.succeeded(monitoring.CommandSucceededEvent(timedelta(milliseconds=3), {}, "find", 1, ADDRESS, 1))
+    assert mongo_duration.count("orders", "find") == before + 1
+
+    listener.started(monitoring.CommandStartedEvent({"getMore": 42, "collection": "orders"}, "app", 2, ADDRESS, 2))
+    listener.failed(monitoring.CommandFailedEvent(timedelta(milliseconds=1), {}, "getMore", 2, ADDRESS, 2))
+    assert mongo_failures.value("orders", "getMore") >= 1
+
+    # Driver heartbeats are not recorded, and nothing is left behind
+    listener.started(monitoring.CommandStartedEvent({"hello": 1}, "admin", 3, ADDRESS, 3))
+    listener.succeeded(monitoring.CommandSucceededEvent(timedelta(milliseconds=1), {}, "hello", 3, ADDRESS, 3))
+    assert mongo_duration.count("", "hello") == 0
+    assert listener._collections == {}
+
+
+def test_pool_listener_tracks_open_and_checked_out_connections():
+    listener = MongoPoolListener()
+    address = "db.internal:27017"
+    listener.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {}))
+    for connection_id in (1, 2):
+        listener.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, connection_id))
+    listener.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1))
+    assert (pool_connections.value(address), pool_checked_out.value(address)) == (2, 1)
+    listener.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+    listener.connection_closed(monitoring.ConnectionClosedEvent(ADDRESS, 2, "idle"))
+    listener.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, "timeout"))
+    assert (pool_connections.value(address), pool_checked_out.value(address)) == (1, 0)
+    assert pool_checkout_failures.value(address, "timeout") == 1
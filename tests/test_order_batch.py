@@ -0,0 +1,95 @@
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import BulkWriteError
+from starlette.testclient import TestClient
+
+import server
+
+
+class FakeOrders:
+    """insert_many that fails the documents at ``failing`` positions, like an unordered bulk write."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.docs = []
+
+    async def insert_many(self, docs, ordered=True):
+        assert not ordered
+        errors = []
+        for index, doc in enumerate(docs):
+            if index in self.failing:
+                errors.append({"index": index, "code": 11000, "errmsg": f"E11000 duplicate key {index}"})
+            else:
+                self.docs.append(doc)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+
+class FakeRollups:
+    def __init__(self):
+        self.recorded = []
+
+    async def record(self, docs):
+        self.recorded.extend(docs)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    def install(orders):
+        monkeypatch.setattr(server, "db", SimpleNamespace(orders=orders))
+        monkeypatch.setattr(server, "rollup_writer", FakeRollups())
+        # Without the context manager the startup handlers (and Mongo) are skipped
+        return TestClient(server.app)
+    return install
+
+
+def order(name="Coffee", **overrides):
+    return {
+        "restaurantId": "r1", "restaurantName": "Bistro", "orderType": "pickup", "totalPrice": 3.5,
+        "items": [{"name": name, "price": 3.5, "quantity": 1}], **overrides,
+    }
+
+
+def test_batch_reports_invalid_items_and_creates_the_rest(app):
+    orders = FakeOrders()
+    client = app(orders)
+    invalid = {"restaurantId": "r1", "items": "none"}
+
+    response = client.post("/api/orders/batch", json=[order("A"), invalid, order("B"), "not an order"])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (2, 2)
+    assert [r["status"] for r in body["results"]] == ["created", "invalid", "created", "invalid"]
+    assert [r["index"] for r in body["results"]] == [0, 1, 2, 3]
+    assert any(e.startswith("restaurantName:") for e in body["results"][1]["errors"])
+    assert body["results"][3]["errors"]
+    assert [doc["items"][0]["name"] for doc in orders.docs] == ["A", "B"]
+    assert [r["id"] for r in body["results"] if r["id"]] == [str(doc["_id"]) for doc in orders.docs]
+    assert len(server.rollup_writer.recorded) == 2
+
+
+def test_write_errors_map_back_to_request_positions(app):
+    # Write positions 1 and 2 are request positions 2 and 4, past an invalid item at 1 and 3
+    orders = FakeOrders(failing={1, 2})
+    client = app(orders)
+
+    body = client.post("/api/orders/batch", json=[order("A"), {}, order("B"), {}, order("C")]).json()
+    assert [r["status"] for r in body["results"]] == ["created", "invalid", "failed", "invalid", "failed"]
+    assert body["results"][2]["errors"] == ["E11000 duplicate key 1"]
+    assert body["results"][4]["errors"] == ["E11000 duplicate key 2"]
+    assert body["results"][0]["id"] == str(orders.docs[0]["_id"])
+    assert body["results"][2]["id"] is None
+    assert (body["created"], body["failed"]) == (1, 4)
+    # Only the stored order is counted in the rollups
+    assert [doc["items"][0]["name"] for doc in server.rollup_writer.recorded] == ["A"]
+
+
+def test_oversized_batch_is_refused(app):
+    orders = FakeOrders()
+    client = app(orders)
+
+    response = client.post("/api/orders/batch", json=[order()] * (server.MAX_ORDER_BATCH + 1))
+    assert response.status_code == 413
+    assert orders.docs == []
+    assert client.post("/api/orders/batch", json=[order()] * server.MAX_ORDER_BATCH).json()["created"] == server.MAX_ORDER_BATCH
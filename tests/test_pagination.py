@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from pagination import decode_cursor, encode_cursor, keyset_filter, next_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, 15, 123000)
+    doc_id = ObjectId()
+    assert decode_cursor(encode_cursor(created_at, doc_id)) == (created_at, doc_id)
+
+
+@pytest.mark.parametrize("token", ["", "not-a-cursor", "WyJ4IiwieSJd", "bnVsbA"])
+def test_malformed_cursor_is_rejected(token):
+    with pytest.raises(ValueError):
+        decode_cursor(token)
+
+
+def test_keyset_filter_breaks_ties_on_id():
+    created_at = datetime(2026, 3, 1)
+    doc_id = ObjectId()
+    assert keyset_filter(None) == {}
+    assert keyset_filter(encode_cursor(created_at, doc_id)) == {
+        "$or": [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "_id": {"$lt": doc_id}},
+        ]
+    }
+
+
+def test_next_cursor_trims_the_lookahead_document():
+    page = [{"_id": ObjectId(), "createdAt": datetime(2026, 3, d)} for d in (3, 2, 1)]
+    token = next_cursor(page, 2)
+    assert len(page) == 2
+    assert decode_cursor(token) == (page[-1]["createdAt"], page[-1]["_id"])
+    assert next_cursor(page, 2) is None
@@ -0,0 +1,114 @@
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from starlette.testclient import TestClient
+
+import server
+from catalog_cache import CatalogCache
+
+MENU = [
+    {"category": "Mains", "items": [{"name": "Steak", "description": "Grilled", "price": 30.0, "image": ""}]},
+    {"category": "Desserts", "items": [{"name": "Tiramisu", "description": "Classic", "price": 8.0, "image": ""}]},
+]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeRestaurants:
+    """Applies inclusion projections (and a menu ``$elemMatch``) the way Mongo does."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    @staticmethod
+    def _project(doc, projection):
+        out = {} if projection.get("_id", 1) == 0 else {"_id": doc["_id"]}
+        for field, spec in projection.items():
+            if field == "_id" or field not in doc:
+                continue
+            if isinstance(spec, dict):
+                wanted = spec["$elemMatch"]
+                out[field] = [e for e in doc[field] if all(e.get(k) == v for k, v in wanted.items())][:1]
+            else:
+                out[field] = doc[field]
+        return out
+
+    def find(self, query, projection):
+        return FakeCursor([self._project(doc, projection) for doc in self.docs])
+
+    async def find_one(self, query, projection):
+        for doc in self.docs:
+            if doc["_id"] == query["_id"]:
+                return self._project(doc, projection)
+        return None
+
+
+def restaurant(**overrides):
+    return {
+        "_id": ObjectId(), "name": "Bistro", "cuisine": "French", "rating": 4.5, "priceRange": "$$",
+        "address": "Main St 1", "city": "Bucharest", "deliveryTime": "30 min", "latitude": 44.43,
+        "longitude": 26.1, "menu": MENU, "location": {"type": "Point", "coordinates": [26.1, 44.43]},
+        "slug": "bistro", **overrides,
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(*docs):
+        monkeypatch.setattr(server, "db", SimpleNamespace(restaurants=FakeRestaurants(list(docs))))
+        # A fresh cache, so nothing loaded by another test is served
+        monkeypatch.setattr(server, "catalog_cache", CatalogCache())
+        # Without the context manager the startup handlers (and Mongo) are skipped
+        return TestClient(server.app)
+    return install
+
+
+def test_summary_projection_leaves_out_heavy_fields():
+    assert "menu" not in server.SUMMARY_PROJECTION
+    assert "location" not in server.SUMMARY_PROJECTION
+    assert {"name", "cuisine", "logo", "latitude", "longitude"} <= set(server.SUMMARY_PROJECTION)
+
+
+def test_list_returns_summaries_without_menus(client):
+    doc = restaurant()
+    response = client(doc).get("/api/restaurants")
+    assert response.status_code == 200
+    summary, = response.json()
+    assert summary["id"] == str(doc["_id"])
+    assert summary["name"] == "Bistro"
+    assert not {"menu", "location", "slug"} & set(summary)
+
+
+def test_menu_returns_the_full_menu(client):
+    doc = restaurant()
+    http = client(doc)
+
+    response = http.get(f"/api/restaurants/{doc['_id']}/menu")
+    assert response.status_code == 200
+    assert response.json() == MENU
+    desserts = http.get(f"/api/restaurants/{doc['_id']}/menu", params={"category": "Desserts"}).json()
+    assert desserts == [MENU[1]]
+
+
+def test_menu_of_unknown_restaurant(client):
+    http = client(restaurant())
+    assert http.get(f"/api/restaurants/{ObjectId()}/menu").status_code == 404
+    assert http.get("/api/restaurants/not-an-id/menu").status_code == 400
+
+
+def test_fields_missing_from_stored_documents_get_their_defaults(client):
+    # Stored before logo, openingHours and menu images existed
+    doc = restaurant(menu=[{"category": "Mains", "items": [{"name": "Steak", "description": "Grilled", "price": 30.0}]}])
+    http = client(doc)
+
+    summary, = http.get("/api/restaurants").json()
+    assert (summary["logo"], summary["openingHours"]) == ("", server.RestaurantSummary.model_fields["openingHours"].default)
+    assert http.get(f"/api/restaurants/{doc['_id']}").json()["menu"][0]["items"][0]["image"] == ""
+    assert http.get(f"/api/restaurants/{doc['_id']}/menu").json()[0]["items"][0]["image"] == ""
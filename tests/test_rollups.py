@@ -0,0 +1,134 @@
+import asyncio
+from datetime import date, datetime
+
+from rollups import RollupWriter, backfill, bucket_id, increment_requests, order_increments, summarize
+
+
+def order(restaurant="r1", order_type="pickup", price=10.1, created=datetime(2024, 5, 1, 23, 59), quantities=(2, 1)):
+    return {
+        "restaurantId": restaurant,
+        "orderType": order_type,
+        "totalPrice": price,
+        "createdAt": created,
+        "items": [{"name": f"dish {q}", "quantity": q} for q in quantities],
+    }
+
+
+def test_increments_are_grouped_per_restaurant_day_and_type_in_cents():
+    increments = order_increments([
+        order(price=0.1), order(price=0.2), order(order_type="delivery"), order(created=datetime(2024, 5, 2)),
+    ])
+    assert increments[("r1", "2024-05-01", "pickup")] == {"orders": 2, "revenueCents": 30, "items": 6}
+    assert increments[("r1", "2024-05-01", "delivery")] == {"orders": 1, "revenueCents": 1010, "items": 3}
+    assert len(increments) == 3
+
+    (request,) = increment_requests({("r1", "2024-05-01", "pickup"): {"orders": 1}})
+    assert request._filter == {"_id": "r1:2024-05-01:pickup"}
+    assert request._doc["$setOnInsert"] == {"restaurantId": "r1", "day": "2024-05-01", "orderType": "pickup"}
+    assert request._upsert
+
+
+class FakeRollups:
+    def __init__(self):
+        self.writes = []
+        self.deletes = []
+
+    async def bulk_write(self, requests, ordered=True):
+        assert not ordered
+        self.writes.append(requests)
+
+    async def delete_many(self, query):
+        self.deletes.append(query)
+
+
+def test_writer_without_linger_applies_each_record_immediately():
+    rollups = FakeRollups()
+    writer = RollupWriter(rollups)
+    asyncio.run(writer.record([order(), order()]))
+    assert len(rollups.writes) == 1
+    assert rollups.writes[0][0]._doc["$inc"] == {"orders": 2, "revenueCents": 2020, "items": 6}
+
+
+def test_writer_with_linger_merges_concurrent_records_per_bucket():
+    rollups = FakeRollups()
+    writer = RollupWriter(rollups, max_linger_ms=5)
+
+    async def scenario():
+        await asyncio.gather(*(writer.record([order(price=1)]) for _ in range(20)))
+        await writer.record([order(order_type="delivery")])
+        await writer.flush()
+
+    asyncio.run(scenario())
+    (requests,) = rollups.writes
+    incs = {r._filter["_id"]: r._doc["$inc"] for r in requests}
+    assert incs[bucket_id("r1", "2024-05-01", "pickup")] == {"orders": 20, "revenueCents": 2000, "items": 60}
+    assert incs[bucket_id("r1", "2024-05-01", "delivery")]["orders"] == 1
+
+
+def test_writer_logs_and_swallows_write_failures(caplog):
+    class Failing(FakeRollups):
+        async def bulk_write(self, requests, ordered=True):
+            raise RuntimeError("primary stepped down")
+
+    asyncio.run(RollupWriter(Failing()).record([order()]))
+    assert "rollup" in caplog.text
+
+
+class FakeOrders:
+    def __init__(self, groups):
+        self.groups = groups
+        self.pipeline = None
+
+    async def _iterate(self):
+        for group in self.groups:
+            yield group
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        self.pipeline = pipeline
+        return self._iterate()
+
+
+def group(restaurant, day, order_type, orders, revenue, items):
+    return {
+        "_id": {"restaurantId": restaurant, "day": day, "orderType": order_type},
+        "orders": orders, "revenue": revenue, "items": items,
+    }
+
+
+def test_backfill_replaces_buckets_day_by_day_and_clears_stale_ones():
+    orders = FakeOrders([
+        group("r1", "2024-05-01", "pickup", 2, 0.30000000000000004, 4),
+        group("r2", "2024-05-01", "delivery", 1, 5.0, 1),
+        group("r1", "2024-05-02", "pickup", 1, 10.1, 2),
+    ])
+    rollups = FakeRollups()
+    written = asyncio.run(backfill(orders, rollups, since=date(2024, 5, 1), until=date(2024, 5, 8)))
+
+    assert written == 3
+    assert orders.pipeline[0] == {"$match": {"createdAt": {"$gte": datetime(2024, 5, 1), "$lt": datetime(2024, 5, 8)}}}
+    first_day, second_day = rollups.writes
+    assert [r._filter["_id"] for r in first_day] == ["r1:2024-05-01:pickup", "r2:2024-05-01:delivery"]
+    assert first_day[0]._doc == {
+        "restaurantId": "r1", "day": "2024-05-01", "orderType": "pickup", "orders": 2, "revenueCents": 30, "items": 4,
+    }
+    assert rollups.deletes == [
+        {"day": "2024-05-01", "_id": {"$nin": ["r1:2024-05-01:pickup", "r2:2024-05-01:delivery"]}},
+        {"day": "2024-05-02", "_id": {"$nin": ["r1:2024-05-02:pickup"]}},
+        {"day": {"$nin": ["2024-05-01", "2024-05-02"], "$gte": "2024-05-01", "$lt": "2024-05-08"}},
+    ]
+
+
+def test_summarize_fills_every_day_and_totals_per_type():
+    buckets = [
+        {"day": "2024-05-01", "orderType": "pickup", "orders": 2, "revenueCents": 1550, "items": 5},
+        {"day": "2024-05-03", "orderType": "delivery", "orders": 1, "revenueCents": 1000, "items": 2},
+        {"day": "2024-06-01", "orderType": "pickup", "orders": 9, "revenueCents": 9, "items": 9},
+    ]
+    summary = summarize(buckets, date(2024, 5, 1), date(2024, 5, 3))
+    assert summary["totals"] == {"orders": 3, "revenue": 25.5, "items": 7, "averageOrderValue": 8.5}
+    assert summary["byOrderType"]["pickup"] == {"orders": 2, "revenue": 15.5, "items": 5, "averageOrderValue": 7.75}
+    assert [d["date"] for d in summary["days"]] == ["2024-05-01", "2024-05-02", "2024-05-03"]
+    assert summary["days"][1]["totals"]["orders"] == 0
+    assert summary["days"][2]["byOrderType"] == {
+        "delivery": {"orders": 1, "revenue": 10.0, "items": 2, "averageOrderValue": 10.0},
+    }
@@ -0,0 +1,97 @@
+import random
+import string
+import time
+
+from search_index import RestaurantSearchIndex, bounded_edit_distance
+
+CATALOG = [
+    ("1", "Bella Italia", "Italian", 4.7),
+    ("2", "Sushi Master", "Japanese", 4.8),
+    ("3", "Burger Junction", "American", 4.5),
+    ("4", "Green Bowl", "Healthy", 4.6),
+    ("5", "Sushi Express", "Japanese", 4.1),
+]
+
+# Average per-query latency we promise for a catalog of SYNTHETIC_SIZE restaurants
+SEARCH_LATENCY_BUDGET_MS = 5.0
+SYNTHETIC_SIZE = 20000
+
+
+def build_index(catalog=CATALOG):
+    index = RestaurantSearchIndex()
+    for doc_id, name, cuisine, rating in catalog:
+        index.add(doc_id, name, cuisine, rating)
+    return index
+
+
+def test_exact_and_prefix_matches():
+    index = build_index()
+    assert index.search("sushi") == ["2", "5"]  # ties broken by rating
+    assert index.search("bur") == ["3"]
+    assert index.search("ital") == ["1"]
+
+
+def test_name_match_outranks_cuisine_match():
+    index = build_index(CATALOG + [("6", "Japanese Garden", "Fusion", 3.0)])
+    assert index.search("japanese")[0] == "6"
+
+
+def test_typo_tolerance():
+    index = build_index()
+    assert index.search("burgr") == ["3"]
+    assert index.search("sushii master") == ["2"]
+    assert index.search("itallian") == ["1"]
+
+
+def test_all_query_tokens_must_match():
+    index = build_index()
+    assert index.search("sushi express") == ["5"]
+    assert index.search("sushi burger") == []
+
+
+def test_user_input_is_not_a_pattern():
+    index = build_index()
+    assert index.search(".*") == []
+    assert index.search("(sushi") == ["2", "5"]
+
+
+def test_incremental_updates():
+    index = build_index()
+    index.add("3", "Taco Town", "Mexican", 4.0)
+    assert index.search("burger") == []
+    assert index.search("taco") == ["3"]
+    index.remove("3")
+    assert index.search("taco") == []
+    assert len(index) == 4
+
+
+def test_cuisine_filter_applies_before_the_limit():
+    index = build_index(CATALOG + [("6", "Sushi Bar", "Fusion", 3.0)])
+    # The Fusion restaurant ranks last, but is not cut off by the Japanese ones
+    assert index.search("sushi", limit=1) == ["2"]
+    assert index.search("sushi", limit=1, cuisine="Fusion") == ["6"]
+    assert index.search("sushi", cuisine="Italian") == []
+
+
+def test_bounded_edit_distance():
+    assert bounded_edit_distance("sushi", "sushi", 1) == 0
+    assert bounded_edit_distance("sushi", "susi", 1) == 1
+    assert bounded_edit_distance("sushi", "pizza", 2) is None
+
+
+def test_search_latency_budget():
+    rng = random.Random(42)
+    words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(4, 9))) for _ in range(3000)]
+    cuisines = ["Italian", "Japanese", "American", "Healthy", "Mexican", "Thai", "Indian"]
+    catalog = [
+        (str(i), " ".join(rng.sample(words, 2)), rng.choice(cuisines), rng.uniform(3, 5))
+        for i in range(SYNTHETIC_SIZE)
+    ]
+    index = build_index(catalog)
+    queries = [rng.choice(words)[:rng.randint(2, 6)] for _ in range(200)]
+
+    started = time.perf_counter()
+    for query in queries:
+        index.search(query)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    assert elapsed_ms < SEARCH_LATENCY_BUDGET_MS
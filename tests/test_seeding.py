@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from pymongo.errors import DuplicateKeyError
+
+import seeding
+from seeding import content_hash, run_once
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the lock and migration records."""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        await asyncio.sleep(0)
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(0)
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate key")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc and doc["expiresAt"] < query["expiresAt"]["$lt"]:
+            doc.update(update["$set"])
+            return doc
+        return None
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None and upsert:
+            doc = self.docs[query["_id"]] = {"_id": query["_id"]}
+        if doc is None or doc.get("owner", query.get("owner")) != query.get("owner"):
+            return SimpleNamespace(matched_count=0)
+        doc.update(update["$set"])
+        return SimpleNamespace(matched_count=1)
+
+    async def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc and doc["owner"] == query["owner"]:
+            del self.docs[query["_id"]]
+
+
+def fake_db():
+    return SimpleNamespace(locks=FakeCollection(), migrations=FakeCollection())
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash([{"a": 1, "b": 2}]) == content_hash([{"b": 2, "a": 1}])
+    assert content_hash([{"a": 1}]) != content_hash([{"a": 2}])
+
+
+def test_concurrent_workers_apply_once(monkeypatch):
+    monkeypatch.setattr(seeding, "POLL_INTERVAL_SECONDS", 0.001)
+    db = fake_db()
+    applied = []
+
+    async def apply():
+        applied.append(1)
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        return await asyncio.gather(*(run_once(db, "seed", "h1", apply) for _ in range(8)))
+
+    assert sorted(asyncio.run(scenario())) == [False] * 7 + [True]
+    assert applied == [1]
+    assert db.locks.docs == {}
+
+
+def test_changed_data_is_applied_again():
+    db = fake_db()
+    applied = []
+
+    async def apply():
+        applied.append(1)
+
+    async def scenario():
+        assert await run_once(db, "seed", "h1", apply)
+        assert not await run_once(db, "seed", "h1", apply)
+        assert await run_once(db, "seed", "h2", apply)
+
+    asyncio.run(scenario())
+    assert len(applied) == 2
+
+
+def test_long_migration_keeps_its_lease(monkeypatch):
+    monkeypatch.setattr(seeding, "POLL_INTERVAL_SECONDS", 0.001)
+    monkeypatch.setattr(seeding, "LOCK_TTL", timedelta(milliseconds=50))
+    monkeypatch.setattr(seeding, "RENEW_INTERVAL_SECONDS", 0.01)
+    db = fake_db()
+    running, overlaps = [], []
+
+    async def apply():
+        overlaps.append(len(running))
+        running.append(1)
+        await asyncio.sleep(0.2)  # several times the lease
+        running.pop()
+
+    async def scenario():
+        first = asyncio.ensure_future(run_once(db, "seed", "h1", apply))
+        await asyncio.sleep(0.005)
+        return await asyncio.gather(first, run_once(db, "seed", "h1", apply))
+
+    # The second worker waits for the first instead of taking its lease over
+    assert asyncio.run(scenario()) == [True, False]
+    assert overlaps == [0]
+
+
+def test_waiting_can_be_bounded(monkeypatch):
+    monkeypatch.setattr(seeding, "POLL_INTERVAL_SECONDS", 0.001)
+    db = fake_db()
+    db.locks.docs["seed"] = {"_id": "seed", "owner": "other", "expiresAt": datetime.utcnow() + timedelta(minutes=1)}
+    applied = []
+
+    async def apply():
+        applied.append(1)
+
+    assert not asyncio.run(run_once(db, "seed", "h1", apply, wait_timeout=0.01))
+    assert applied == []
@@ -0,0 +1,159 @@
+import asyncio
+from datetime import timedelta
+
+from bson import MaxKey, MinKey
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+from starlette.testclient import TestClient
+
+import server
+
+from slow_queries import SlowQueryListener, command_shape, explain, query_shape, summarize_explain
+
+ADDRESS = ("db.internal", 27017)
+
+
+def run_command(listener, request_id, command, ms, reply=None, failure=None):
+    name = next(iter(command))
+    listener.started(monitoring.CommandStartedEvent(
+        {**command, "$db": "app", "lsid": {"id": 1}}, "app", request_id, ADDRESS, request_id,
+    ))
+    if failure is not None:
+        listener.failed(monitoring.CommandFailedEvent(timedelta(milliseconds=ms), failure, name, request_id, ADDRESS, 1))
+    else:
+        listener.succeeded(monitoring.CommandSucceededEvent(
+            timedelta(milliseconds=ms), reply or {}, name, request_id, ADDRESS, request_id,
+        ))
+
+
+def test_query_shape_hides_literals_but_keeps_structure():
+    shape = query_shape({"status": "active", "createdAt": {"$lt": 5}, "$or": [{"a": 1}, {"b": [1, 2]}]})
+    assert shape == {"status": "?", "createdAt": {"$lt": "?"}, "$or": [{"a": "?"}, {"b": "?"}]}
+    assert command_shape("update", {"update": "orders", "updates": [{"q": {"_id": 1}, "u": {"$set": {"x": 1}}}]}) == {
+        "q": [{"_id": "?"}],
+    }
+    assert command_shape("aggregate", {"pipeline": [{"$match": {"restaurantId": "r1"}}, {"$limit": 5}]}) == {
+        "pipeline": [{"$match": {"restaurantId": "?"}}, {"$limit": "?"}],
+    }
+
+
+def test_only_commands_over_the_threshold_are_recorded():
+    listener = SlowQueryListener(threshold_ms=50)
+    run_command(listener, 1, {"find": "orders", "filter": {"status": "active"}}, 10)
+    run_command(
+        listener, 2, {"find": "orders", "filter": {"status": "active"}, "sort": {"createdAt": -1}}, 120,
+        reply={"cursor": {"firstBatch": [{}, {}, {}], "id": 0}},
+    )
+    run_command(listener, 3, {"count": "reservations", "query": {}}, 80, failure={"errmsg": "interrupted"})
+
+    failed, slow = listener.records()
+    assert slow["command"] == "find" and slow["collection"] == "orders"
+    assert slow["shape"] == {"filter": {"status": "?"}, "sort": {"createdAt": "?"}}
+    assert slow["docsReturned"] == 3
+    assert "_command" not in slow
+    assert failed["error"] == "interrupted"
+    assert listener.get(slow["id"])["_command"] == {
+        "find": "orders", "filter": {"status": "active"}, "sort": {"createdAt": -1},
+    }
+    assert listener.stats()["recorded"] == 2
+    assert listener._started == {}
+
+
+def test_only_explainable_commands_are_kept():
+    listener = SlowQueryListener(threshold_ms=0)
+    run_command(listener, 1, {"insert": "media_blobs.chunks", "documents": [{"data": b"\xff" * 1024}]}, 5)
+
+    record, = listener.records()
+    assert (record["command"], record["explainable"]) == ("insert", False)
+    assert listener.get(record["id"])["_command"] is None
+
+
+def test_ring_buffer_is_bounded_and_sampling_skips_commands():
+    listener = SlowQueryListener(threshold_ms=0, capacity=3)
+    for i in range(10):
+        run_command(listener, i, {"find": "orders", "filter": {}}, 1)
+    assert [r["id"] for r in listener.records()] == [10, 9, 8]
+
+    unsampled = SlowQueryListener(threshold_ms=0, sample_rate=0.0)
+    run_command(unsampled, 1, {"find": "orders", "filter": {}}, 500)
+    assert unsampled.records() == [] and unsampled.stats()["sampled"] == 0
+
+
+FIND_EXPLAIN = {
+    "queryPlanner": {"winningPlan": {
+        "stage": "FETCH",
+        "inputStage": {"stage": "IXSCAN", "indexName": "createdAt_-1__id_-1", "indexBounds": {"createdAt": [MinKey(), MaxKey()]}},
+    }},
+    "executionStats": {"nReturned": 100, "totalDocsExamined": 100, "totalKeysExamined": 100, "executionTimeMillis": 3},
+}
+AGGREGATE_EXPLAIN = {
+    "stages": [
+        {"$cursor": {
+            "queryPlanner": {"winningPlan": {"queryPlan": {"stage": "COLLSCAN"}}},
+            "executionStats": {"nReturned": 4, "totalDocsExamined": 50000, "totalKeysExamined": 0, "executionTimeMillis": 210},
+        }},
+        {"$group": {}},
+    ],
+}
+
+
+def test_summarize_explain_for_find_and_aggregate():
+    find = summarize_explain(FIND_EXPLAIN)
+    assert find["stages"] == ["FETCH", "IXSCAN"] and find["indexes"] == ["createdAt_-1__id_-1"]
+    assert not find["collectionScan"] and find["docsExamined"] == 100
+    assert find["winningPlan"]["inputStage"]["indexBounds"] == {"createdAt": [{"$minKey": 1}, {"$maxKey": 1}]}
+
+    aggregate = summarize_explain(AGGREGATE_EXPLAIN)
+    assert aggregate["collectionScan"]
+    assert (aggregate["docsExamined"], aggregate["docsReturned"]) == (50000, 4)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.commands = []
+
+    async def command(self, command):
+        self.commands.append(command)
+        return FIND_EXPLAIN
+
+
+def test_explain_runs_once_per_record_without_session_metadata():
+    database = FakeDatabase()
+    client = {"app": database}
+    listener = SlowQueryListener(threshold_ms=0)
+    run_command(listener, 1, {"find": "orders", "filter": {"status": "active"}}, 5)
+    run_command(listener, 2, {"getMore": 7, "collection": "orders"}, 5)
+    find_id, get_more_id = listener.records()[1]["id"], listener.records()[0]["id"]
+
+    async def scenario():
+        first = await explain(client, listener, find_id)
+        assert await explain(client, listener, find_id) is first
+        assert await explain(client, listener, 999) is None
+        try:
+            await explain(client, listener, get_more_id)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("getMore is not explainable")
+
+    asyncio.run(scenario())
+    assert database.commands == [
+        {"explain": {"find": "orders", "filter": {"status": "active"}}, "verbosity": "executionStats"},
+    ]
+    assert listener.records()[1]["explain"]["indexes"] == ["createdAt_-1__id_-1"]
+
+
+class FailingDatabase:
+    async def command(self, command):
+        raise OperationFailure("ns does not exist", code=26)
+
+
+def test_failed_explain_is_a_client_error(monkeypatch):
+    listener = SlowQueryListener(threshold_ms=0)
+    run_command(listener, 1, {"find": "orders", "filter": {"status": "active"}}, 5)
+    monkeypatch.setattr(server, "slow_query_log", listener)
+    monkeypatch.setattr(server, "client", {"app": FailingDatabase()})
+
+    response = TestClient(server.app).post(f"/api/admin/slow-queries/{listener.records()[0]['id']}/explain")
+    assert response.status_code == 422
+    assert "ns does not exist" in response.json()["detail"]
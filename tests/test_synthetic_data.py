@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from availability import slot_range
+from synthetic_data import DISHES, floor_plans, menu, order_days, orders, reservations, restaurants
+
+NOW = datetime(2024, 6, 1, 12)
+
+
+def catalog(count=300, seed=7):
+    return list(restaurants(count, seed, NOW - timedelta(days=90)))
+
+
+def test_same_seed_gives_the_same_documents_and_another_seed_does_not():
+    first, again, other = catalog(), catalog(), catalog(seed=8)
+    assert [doc for doc, _ in first] == [doc for doc, _ in again]
+    assert first[0][0]["_id"] != other[0][0]["_id"]
+    assert {doc["slug"] for doc, _ in first}.isdisjoint(doc["slug"] for doc, _ in other)
+
+    profiles = [profile for _, profile in first]
+    assert list(orders(profiles, 500, 7, NOW, 30)) == list(orders(profiles, 500, 7, NOW, 30))
+    # A prefix does not depend on how many documents are generated after it
+    assert list(orders(profiles, 100, 7, NOW, 30)) == list(orders(profiles, 500, 7, NOW, 30))[:100]
+
+
+def test_restaurants_look_like_the_demo_data():
+    docs = catalog()
+    doc, profile = docs[0]
+    assert doc["location"] == {"type": "Point", "coordinates": [doc["longitude"], doc["latitude"]]}
+    assert doc["menu"] == menu(profile) and doc["menu"][0]["items"][0].keys() == {"name", "description", "price", "image"}
+    assert len({d["slug"] for d, _ in docs}) == len(docs)
+    assert all(-90 <= d["latitude"] <= 90 and -180 <= d["longitude"] <= 180 for d, _ in docs)
+    assert len({d["city"] for d, _ in docs}) > 10 and len({d["cuisine"] for d, _ in docs}) == len(DISHES)
+
+
+def test_orders_come_from_the_restaurants_menu_within_the_window():
+    profiles = [profile for _, profile in catalog()]
+    by_id = {p.id: p for p in profiles}
+    generated = list(orders(profiles, 3000, 7, NOW, 30))
+    since, until = order_days(NOW, 30)
+    for order in generated:
+        assert since <= order["createdAt"].date() < until and order["createdAt"] <= NOW
+        dishes = {item["name"]: item["price"] for category in menu(by_id[order["restaurantId"]]) for item in category["items"]}
+        assert all(dishes[item["name"]] == item["price"] for item in order["items"])
+        assert order["totalPrice"] == round(sum(i["price"] * i["quantity"] for i in order["items"]), 2)
+        assert (order["deliveryAddress"] is not None) == (order["orderType"] == "delivery")
+    # Popularity is long-tailed: the busiest tenth of restaurants takes far more than a tenth of orders
+    counts = sorted((sum(o["restaurantId"] == p.id for o in generated) for p in profiles), reverse=True)
+    assert sum(counts[:30]) > 0.3 * len(generated)
+
+
+def test_reservations_book_tables_of_the_generated_floor_plans():
+    profiles = [profile for _, profile in catalog(count=20)]
+    plans = {plan["_id"]: plan for plan in floor_plans(profiles, NOW)}
+    assert list(plans) == [p.id for p in profiles]
+    for doc, _ in reservations(profiles, 500, 7, NOW, 30, future_days=7):
+        tables = {t["tableNumber"] for room in plans[doc["restaurantId"]]["rooms"] for t in room["tables"]}
+        assert {t["tableNumber"] for t in doc["selectedTables"]} <= tables
+
+
+def test_upcoming_reservations_hold_non_overlapping_claims():
+    profiles = [profile for _, profile in catalog(count=20)]
+    generated = list(reservations(profiles, 3000, 7, NOW, 30, future_days=7))
+    upcoming = [(doc, claims) for doc, claims in generated if doc["status"] == "upcoming"]
+    assert upcoming and all(doc["date"] > NOW.date().isoformat() for doc, _ in upcoming)
+    assert all(not claims for doc, claims in generated if doc["status"] != "upcoming")
+
+    claim_ids = [claim["_id"] for _, claims in upcoming for claim in claims]
+    assert len(claim_ids) == len(set(claim_ids))
+    for doc, claims in upcoming:
+        first, last = slot_range(doc["time"], doc["duration"])
+        assert len(claims) == last - first and claims[0]["reservationId"] == doc["_id"]
+
+
+def test_the_latest_orders_are_still_active():
+    profiles = [profile for _, profile in catalog(count=20)]
+    generated = list(orders(profiles, 5000, 7, NOW, 7))
+    active = [o for o in generated if o["status"] == "active"]
+    assert active and all(NOW - o["createdAt"] < timedelta(hours=2) for o in active)
@@ -0,0 +1,68 @@
+import random
+import time
+
+from table_assignment import best_capacity_mixes, suggest_tables
+
+
+def table(number, capacity, x=0, y=0, room="main"):
+    return {"tableNumber": number, "capacity": capacity, "x": x, "y": y, "room": room}
+
+
+LAYOUT = [
+    table("T1", 2, 15, 15), table("T2", 2, 15, 50), table("T3", 4, 55, 15), table("T4", 4, 55, 50),
+    table("T5", 6, 15, 85), table("T7", 8, 35, 120),
+]
+
+
+def numbers(suggestion):
+    return sorted(t["tableNumber"] for t in suggestion["tables"])
+
+
+def test_exact_fit_single_table_first():
+    suggestions = suggest_tables(LAYOUT, 4)
+    assert suggestions[0]["wastedSeats"] == 0
+    assert len(suggestions[0]["tables"]) == 1
+    assert suggestions[0]["tables"][0]["capacity"] == 4
+    # Two 2-tops also seat four without waste, but need more tables
+    assert numbers(suggestions[1]) == ["T1", "T2"]
+
+
+def test_large_party_combines_tables():
+    suggestions = suggest_tables(LAYOUT, 12, k=2)
+    assert [s["wastedSeats"] for s in suggestions] == [0, 0]
+    assert all(s["totalCapacity"] == 12 for s in suggestions)
+    assert len(suggestions[0]["tables"]) == 2
+
+
+def test_prefers_tables_close_together_in_one_room():
+    layout = [
+        table("A", 4, 0, 0), table("B", 4, 10, 0), table("C", 4, 500, 500),
+        table("D", 4, 1, 1, room="patio"),
+    ]
+    assert numbers(suggest_tables(layout, 8, k=1)[0]) == ["A", "B"]
+
+
+def test_no_suggestion_when_party_cannot_be_seated():
+    assert suggest_tables(LAYOUT, 100) == []
+    assert suggest_tables(LAYOUT, 0) == []
+    assert suggest_tables([], 2) == []
+
+
+def test_capacity_mixes_are_ranked_by_waste_then_table_count():
+    mixes = best_capacity_mixes(((6, 1), (4, 2), (2, 2)), 6, 4, 5)
+    assert mixes[0] == (0, 1, ((6, 1),))
+    assert [waste for waste, _, _ in mixes] == sorted(waste for waste, _, _ in mixes)
+
+
+def test_large_floor_plan_is_fast():
+    rng = random.Random(3)
+    layout = [
+        table(f"T{i}", rng.choice([2, 2, 4, 4, 6, 8, 10]), rng.uniform(0, 1000), rng.uniform(0, 1000), f"room{i % 5}")
+        for i in range(500)
+    ]
+    best_capacity_mixes.cache_clear()
+    started = time.perf_counter()
+    suggestions = suggest_tables(layout, 23, k=5)
+    assert time.perf_counter() - started < 0.5
+    assert len(suggestions) == 5
+    assert all(s["totalCapacity"] >= 23 for s in suggestions)